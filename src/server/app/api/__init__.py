@@ -1,3 +1,4 @@
+from .endpoints import metrics_router
 from .routes import router
 
-__all__ = ["router"]
+__all__ = ["metrics_router", "router"]
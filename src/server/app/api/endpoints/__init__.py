@@ -1,7 +1,9 @@
 from .health import router as health_router
 from .inference import router as inference_router
+from .metrics import router as metrics_router
 
 __all__ = [
     'health_router',
     'inference_router',
+    'metrics_router',
 ]
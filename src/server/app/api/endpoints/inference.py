@@ -1,82 +1,515 @@
-import pickle
+import asyncio
 import uuid
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
 
 from aio_pika import Message
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, status
-from PIL import Image
+from fastapi import (APIRouter, Depends, HTTPException, Query, Response,
+                     status)
+from fastapi.responses import StreamingResponse
+from opentelemetry import trace
+from starlette.concurrency import run_in_threadpool
 
-from app.models.enums import Status
-from app.models.schemas import InferenceProcess, InferenceResult
-from app.services import rabbitmq_client, redis_client
-from app.validators import upload_image_validator
+from app.configs import BatchSettings, ResultSettings
+from app.cores import strings, trace_headers, tracer
+from app.models.enums import Priority, Status
+from app.models.schemas import BatchProcess, InferenceProcess, InferenceResult
+from app.serializers import (BATCH_ID_HEADER, MODEL_HEADER, REQUEST_IDS_HEADER,
+                             frame_batch, image_serializer, scheduling_headers)
+from app.services import (BrokerUnavailableError, content_cache,
+                          rabbitmq_client, redis_client, result_notifier,
+                          result_store)
+from app.services.results import ResultStore
+from app.validators import (UploadedImage, batch_upload_validator,
+                            deadline_validator, upload_image_validator,
+                            wait_validator)
 
 router = APIRouter()
+priority_query = Query(
+    Priority.NORMAL,
+    description="Lane of the request, higher ones are inferred first.")
+model_query = Query(
+    None,
+    max_length=64,
+    pattern=r'^[\w.-]+$',
+    description="Name of the worker model to use, the default one if "
+    "omitted.")
+result_settings = ResultSettings()
+batch_settings = BatchSettings()
 
 
 @router.post(
     "/requests",
     status_code=status.HTTP_202_ACCEPTED,
     response_model=InferenceProcess,
+    response_model_exclude_none=True,
 )
 async def inference(
-    image: UploadFile,
-    _=Depends(upload_image_validator),
+    response: Response,
+    image: UploadedImage = Depends(upload_image_validator),
+    model: Optional[str] = model_query,
+    priority: Priority = priority_query,
+    deadline: Optional[float] = Depends(deadline_validator),
 ):
     """
     Perform inference on the given image.
 
+    An image already submitted for the current revision of the model is
+    not inferred again: the earlier request is returned instead, with its
+    result when it is completed.
+
     Args:
-        image (UploadFile): The image file to perform inference on.
+        image (UploadedImage): The uploaded image file, validated from its
+            header only. It is decoded by the workers.
+        model (Optional[str]): The model to use, the workers' default
+            one when None.
+        priority (Priority): The lane of the request.
+        deadline (Optional[float]): When the workers should give up on
+            the request, as a Unix timestamp.
 
     Returns:
         InferenceProcess: An object representing the inference process,
             including the status and inference ID.
     """
     request_id = str(uuid.uuid4())
-    x = Image.open(image.file).convert('RGB')
+    trace.get_current_span().set_attribute('request_id', request_id)
+    [digest], [cached] = await claim([image], [request_id], model)
+    if cached is not None:
+        if cached.status == Status.COMPLETED.value:
+            response.status_code = status.HTTP_200_OK
+        return cached
+
+    async with released_on_error([(digest, request_id)]):
+        [(body, headers)] = await serialize([image.data])
 
-    message = Message(pickle.dumps(x))
+        message = Message(body, priority=priority.level)
 
-    message.headers = {
-        "request_id": request_id,
-    }
+        message.headers = {
+            "request_id": request_id,
+            **headers,
+            **model_headers(model),
+            **scheduling_headers(deadline),
+            # The workers continue the trace of the request.
+            **trace_headers(),
+        }
 
-    await rabbitmq_client.publish_message(message)
+        await publish(message)
 
     return InferenceProcess(
         status=Status.PROCESSING.value,
-        request_id=request_id
+        request_id=request_id,
+        model=model,
+    )
+
+
+def model_headers(model: Optional[str]) -> Dict:
+    return {} if model is None else {MODEL_HEADER: model}
+
+
+async def claim(
+    images: List[UploadedImage],
+    request_ids: List[str],
+    model: Optional[str],
+) -> Tuple[List[str], List[Optional[InferenceProcess]]]:
+    """
+    Record new requests as processing and claim their images in the
+    content cache, see `ContentCache.claim_many`, for the current
+    revision of the model. Earlier requests that failed for good,
+    expired or were inferred by another revision do not count: their
+    claim is replaced so that the image is inferred again. The records of
+    the new requests that are not needed are discarded.
+
+    Returns:
+        Tuple[List[str], List[Optional[InferenceProcess]]]: The cache
+            digest of each image, and the earlier request for the same
+            content, or None if its new request was registered.
+    """
+    with tracer.start_as_current_span('cache.claim'):
+        # Recorded first, so that a concurrent request for the same image
+        # never finds a claim without its record.
+        _, revision = await asyncio.gather(
+            result_store.create(request_ids, model),
+            content_cache.revision(model),
+        )
+        digests = [
+            content_cache.digest(image.digest, model, revision)
+            for image in images
+        ]
+        cached = await read_claims(
+            await content_cache.claim_many(digests, request_ids))
+
+        for i, process in enumerate(cached):
+            if process is not None and is_stale(process, revision):
+                await content_cache.release(digests[i], process.request_id)
+                [cached[i]] = await read_claims(
+                    [await content_cache.claim(digests[i], request_ids[i])])
+
+        await result_store.discard([
+            request_id for request_id, process in zip(request_ids, cached)
+            if process is not None
+        ])
+    return digests, cached
+
+
+def is_stale(process: InferenceProcess, revision: Optional[str]) -> bool:
+    """
+    Whether the image of a cached request should be inferred again: the
+    request failed for good or expired, or another revision of the model
+    than the current one inferred it, while a reload rolls out over the
+    workers.
+    """
+    if process.status == Status.FAILED.value:
+        return True
+    return None not in (revision, process.model_version) and \
+        process.model_version != revision
+
+
+async def read_claims(
+    cached_ids: List[Optional[str]],
+) -> List[Optional[InferenceProcess]]:
+    """
+    Read the earlier requests holding claims. An expired one is reported
+    as failed, so that its claim is replaced.
+    """
+    claimed = [cached_id for cached_id in cached_ids if cached_id is not None]
+    processes = iter(await result_store.read(claimed))
+    return [
+        None if cached_id is None else next(processes) or expired(cached_id)
+        for cached_id in cached_ids
+    ]
+
+
+def expired(request_id: str) -> InferenceProcess:
+    return InferenceProcess(
+        status=Status.FAILED.value,
+        request_id=request_id,
+        error=strings.RESULT_NOT_FOUND,
+    )
+
+
+@asynccontextmanager
+async def released_on_error(claims: List[Tuple[str, str]]):
+    """
+    Submit claimed images to the workers. If anything fails before they
+    are published, e.g. an image that cannot be serialized or a broker
+    that does not accept the message, the records of their requests are
+    deleted and their content cache claims released, so that they can be
+    submitted again.
+
+    Args:
+        claims (List[Tuple[str, str]]): The digest and request ID of each
+            image.
+    """
+    try:
+        yield
+    except BaseException:
+        # The requests will never complete, nobody must wait for them.
+        await result_store.discard([request_id for _, request_id in claims])
+        for digest, request_id in claims:
+            await content_cache.release(digest, request_id)
+        raise
+
+
+async def publish(message: Message):
+    """
+    Publish a message to the workers.
+
+    Raises:
+        HTTPException: 503 if the broker is unavailable or overloaded.
+    """
+    try:
+        await rabbitmq_client.publish_message(message)
+    except BrokerUnavailableError as e:
+        raise HTTPException(
+            status.HTTP_503_SERVICE_UNAVAILABLE,
+            strings.BROKER_UNAVAILABLE,
+            headers={"Retry-After": "1"},
+        ) from e
+
+
+async def serialize(images: List[bytes]) -> List[Tuple[bytes, Dict]]:
+    """
+    Serialize images into message payloads, off the event loop when the
+    serializer decodes them.
+    """
+    with tracer.start_as_current_span(
+            'payload.serialize', attributes={'images': len(images)}):
+        if image_serializer.blocking:
+            return await run_in_threadpool(
+                list, map(image_serializer.serialize, images))
+        return [image_serializer.serialize(data) for data in images]
+
+
+def batch_key(batch_id: str) -> str:
+    return f"batch:{batch_id}"
+
+
+def batch_process(
+    batch_id: str,
+    requests: List[InferenceProcess],
+) -> BatchProcess:
+    # A batch is over once each of its requests is completed or failed.
+    completed = all(
+        request.status != Status.PROCESSING.value for request in requests)
+
+    return BatchProcess(
+        status=(Status.COMPLETED if completed else Status.PROCESSING).value,
+        batch_id=batch_id,
+        requests=requests,
     )
 
 
+async def read_batch(batch_id: str, request_ids: List[str]) -> BatchProcess:
+    """
+    The state of a batch. Requests whose record expired are reported as
+    failed.
+    """
+    processes = await result_store.read(request_ids)
+    return batch_process(batch_id, [
+        process or expired(request_id)
+        for request_id, process in zip(request_ids, processes)
+    ])
+
+
+@router.post(
+    "/batches",
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=BatchProcess,
+    response_model_exclude_none=True,
+)
+async def inference_batch(
+    response: Response,
+    images: List[UploadedImage] = Depends(batch_upload_validator),
+    model: Optional[str] = model_query,
+    priority: Priority = priority_query,
+    deadline: Optional[float] = Depends(deadline_validator),
+):
+    """
+    Perform inference on a batch of images.
+
+    Accepts several `images` files, zip or tar archives of images, or a
+    mix of both. The images that were not submitted before are sent to
+    the workers as a single message, inferred together and can be
+    followed one by one or as a batch.
+
+    Args:
+        images (List[UploadedImage]): The images of the batch.
+        model (Optional[str]): The model to use, the workers' default
+            one when None.
+        priority (Priority): The lane of the batch.
+        deadline (Optional[float]): When the workers should give up on
+            the batch, as a Unix timestamp.
+
+    Returns:
+        BatchProcess: The batch ID along with the request of each image,
+            in upload order.
+    """
+    batch_id = str(uuid.uuid4())
+    trace.get_current_span().set_attribute('batch_id', batch_id)
+    new_ids = [str(uuid.uuid4()) for _ in images]
+    digests, cached = await claim(images, new_ids, model)
+
+    request_ids = [
+        new_id if process is None else process.request_id
+        for process, new_id in zip(cached, new_ids)
+    ]
+    pending = [
+        (image, digest, new_id)
+        for image, digest, new_id, process in zip(
+            images, digests, new_ids, cached)
+        if process is None
+    ]
+
+    if pending:
+        async with released_on_error([
+            (digest, request_id) for _, digest, request_id in pending
+        ]):
+            body, headers = frame_batch(
+                await serialize([image.data for image, _, _ in pending]))
+
+            message = Message(body, priority=priority.level)
+
+            message.headers = {
+                BATCH_ID_HEADER: batch_id,
+                REQUEST_IDS_HEADER: [
+                    request_id for _, _, request_id in pending],
+                **headers,
+                **model_headers(model),
+                **scheduling_headers(deadline),
+                **trace_headers(),
+            }
+
+            await publish(message)
+
+    pipeline = redis_client.client.pipeline(transaction=False)
+    pipeline.rpush(batch_key(batch_id), *request_ids)
+    pipeline.expire(batch_key(batch_id), batch_settings.BATCH_RECORD_TTL)
+    await pipeline.execute()
+
+    batch = await read_batch(batch_id, request_ids)
+    if batch.status == Status.COMPLETED.value:
+        response.status_code = status.HTTP_200_OK
+    return batch
+
+
+@router.get(
+    "/batches/{batch_id}/result",
+    status_code=status.HTTP_200_OK,
+    response_model=BatchProcess,
+    response_model_exclude_none=True,
+)
+async def inference_batch_result(
+    batch_id: str,
+):
+    """
+    Get the results of a batch by its ID.
+
+    Parameters:
+    - batch_id (str): The ID of the batch.
+
+    Returns:
+    - BatchProcess: The request of each image of the batch, completed
+      ones with their result and failed ones with their error. The batch
+      is completed once none of them is processing anymore.
+
+    Raises:
+    - HTTPException: If the batch ID is not found.
+    """
+    request_ids = [
+        request_id.decode()
+        for request_id in await redis_client.client.lrange(
+            batch_key(batch_id), 0, -1)
+    ]
+
+    if not request_ids:
+        raise HTTPException(status_code=404)
+
+    return await read_batch(batch_id, request_ids)
+
+
+async def get_result(
+    request_id: str,
+    timeout: float = 0,
+) -> Optional[InferenceResult]:
+    """
+    Read the result of an inference, waiting up to `timeout` seconds for
+    a worker to complete it.
+
+    Returns:
+        Optional[InferenceResult]: The result, still processing if it is
+            not available yet, or None if the request is unknown or
+            expired.
+    """
+    # Polls are traced on their own, the ID ties them to the submission.
+    trace.get_current_span().set_attribute('request_id', request_id)
+    with result_notifier.subscribe(request_id) as completed:
+        [process] = await result_store.read([request_id])
+
+        if process is None:
+            return None
+
+        if process.status == Status.PROCESSING.value and timeout > 0:
+            try:
+                process = ResultStore.from_event(
+                    await asyncio.wait_for(completed, timeout), process)
+            except asyncio.TimeoutError:
+                pass
+
+    return InferenceResult(**process.model_dump(exclude={'request_id'}))
+
+
 @router.get(
     "/requests/{request_id}/result",
     status_code=status.HTTP_200_OK,
     response_model=InferenceResult,
+    response_model_exclude_none=True,
 )
 async def inference_result(
     request_id: str,
+    timeout: float = Depends(wait_validator),
 ):
     """
     Get the result of an inference by its ID.
 
+    With `?wait=30s`, the request is held open until the inference
+    completes or the duration elapses (long polling).
+
     Parameters:
     - request_id (str): The ID of the inference.
+    - wait (str): How long to wait for the result, e.g. `30s` or `500ms`.
 
     Returns:
-    - InferenceResult: The result of the inference.
+    - InferenceResult: The result of the inference, or its error if it
+      failed for good after all retries. A request still processing is
+      answered with its `processing` status.
 
     Raises:
-    - HTTPException: If the inference ID is not found.
+    - HTTPException: If the inference ID is unknown or its result
+      expired.
     """
+    result = await get_result(request_id, timeout)
 
-    if not redis_client.exists(request_id):
+    if result is None:
         raise HTTPException(status_code=404)
 
-    result = redis_client.get(request_id)
+    return result
 
-    if result is None:
-        return InferenceResult(status=Status.PROCESSING.value)
 
-    return InferenceResult(
-        status=Status.COMPLETED.value, inference_class=result)
+@router.get(
+    "/requests/{request_id}/events",
+    status_code=status.HTTP_200_OK,
+    response_class=StreamingResponse,
+)
+async def inference_events(
+    request_id: str,
+):
+    """
+    Stream the result of an inference as Server-Sent Events.
+
+    A `result` event carrying the `InferenceResult` is sent as soon as
+    the inference completes, then the stream ends. Comment lines keep the
+    connection alive meanwhile, and a `timeout` event ends the stream if
+    no result arrives in time.
+
+    Parameters:
+    - request_id (str): The ID of the inference.
+
+    Raises:
+    - HTTPException: If the inference ID is unknown or its result
+      expired.
+    """
+    [process] = await result_store.read([request_id])
+    if process is None:
+        raise HTTPException(status_code=404)
+
+    async def events():
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + result_settings.RESULT_STREAM_TIMEOUT
+
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                yield "event: timeout\ndata: {}\n\n"
+                return
+
+            result = await get_result(
+                request_id,
+                min(remaining, result_settings.RESULT_STREAM_HEARTBEAT),
+            )
+            if result is None:
+                # Expired while streaming.
+                result = InferenceResult(
+                    status=Status.FAILED.value,
+                    error=strings.RESULT_NOT_FOUND,
+                )
+            if result.status != Status.PROCESSING.value:
+                data = result.model_dump_json(exclude_none=True)
+                yield f"event: result\ndata: {data}\n\n"
+                return
+            yield ": keep-alive\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from app.cores import metrics_registry
+
+router = APIRouter()
+
+
+@router.get(
+    "/metrics",
+    include_in_schema=False,
+)
+def metrics():
+    """
+    Metrics of the API in the Prometheus text format, of every server
+    process.
+    """
+    return Response(
+        generate_latest(metrics_registry()), media_type=CONTENT_TYPE_LATEST)
@@ -1,3 +1,21 @@
+from .batch import BatchSettings
+from .cache import CacheSettings
 from .config import Settings
+from .payload import PayloadSettings
+from .rabbitmq import RabbitMQSettings
+from .redis import RedisSettings
+from .results import ResultSettings
+from .scheduling import SchedulingSettings
+from .tracing import TracingSettings
 
-__all__ = ["Settings"]
+__all__ = [
+    "BatchSettings",
+    "CacheSettings",
+    "PayloadSettings",
+    "RabbitMQSettings",
+    "RedisSettings",
+    "ResultSettings",
+    "SchedulingSettings",
+    "Settings",
+    "TracingSettings",
+]
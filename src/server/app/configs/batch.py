@@ -0,0 +1,7 @@
+from pydantic_settings import BaseSettings
+
+
+class BatchSettings(BaseSettings):
+
+    BATCH_MAX_IMAGES: int = 100
+    BATCH_RECORD_TTL: int = 24 * 60 * 60
@@ -0,0 +1,8 @@
+from pydantic_settings import BaseSettings
+
+
+class CacheSettings(BaseSettings):
+
+    CONTENT_CACHE_ENABLED: bool = True
+    CONTENT_CACHE_TTL: int = 24 * 60 * 60
+    MODEL_VERSION: str = 'EfficientNet_B0_NS_320'
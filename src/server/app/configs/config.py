@@ -1,10 +1,25 @@
 from typing import List
 
+from .batch import BatchSettings
+from .cache import CacheSettings
+from .payload import PayloadSettings
 from .rabbitmq import RabbitMQSettings
 from .redis import RedisSettings
+from .results import ResultSettings
+from .scheduling import SchedulingSettings
+from .tracing import TracingSettings
 
 
-class Settings(RabbitMQSettings, RedisSettings):
+class Settings(
+    RabbitMQSettings,
+    RedisSettings,
+    PayloadSettings,
+    CacheSettings,
+    ResultSettings,
+    BatchSettings,
+    SchedulingSettings,
+    TracingSettings,
+):
 
     APP_NAME: str
     BACKEND_CORS_ORIGINS: List[str]
@@ -0,0 +1,7 @@
+from pydantic_settings import BaseSettings
+
+
+class PayloadSettings(BaseSettings):
+
+    PAYLOAD_FORMAT: str = 'encoded'
+    PAYLOAD_DTYPE: str = 'uint8'
@@ -4,3 +4,6 @@ from pydantic_settings import BaseSettings
 class RabbitMQSettings(BaseSettings):
 
     AMQP_URL: str
+    RABBITMQ_CHANNEL_POOL_SIZE: int = 4
+    RABBITMQ_MAX_PENDING_PUBLISHES: int = 1024
+    RABBITMQ_PUBLISH_TIMEOUT: float = 5.0
@@ -3,5 +3,8 @@ from pydantic_settings import BaseSettings
 
 class RedisSettings(BaseSettings):
 
-    REDIS_HOST: str
-    REDIS_PORT: int
+    REDIS_HOST: str = 'localhost'
+    REDIS_PORT: int = 6379
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_POOL_TIMEOUT: float = 5.0
+    REDIS_RESULT_CHANNEL: str = 'inference:results'
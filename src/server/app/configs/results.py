@@ -0,0 +1,9 @@
+from pydantic_settings import BaseSettings
+
+
+class ResultSettings(BaseSettings):
+
+    RESULT_TTL: int = 24 * 60 * 60
+    RESULT_MAX_WAIT: float = 60.0
+    RESULT_STREAM_TIMEOUT: float = 300.0
+    RESULT_STREAM_HEARTBEAT: float = 15.0
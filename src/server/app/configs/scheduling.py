@@ -0,0 +1,6 @@
+from pydantic_settings import BaseSettings
+
+
+class SchedulingSettings(BaseSettings):
+
+    MAX_DEADLINE: float = 24 * 60 * 60
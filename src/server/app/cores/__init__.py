@@ -1,3 +1,19 @@
+from .metrics import (HTTP_LATENCY, HTTP_REQUESTS, PUBLISH_LATENCY,
+                      MetricsMiddleware, metrics_registry)
 from .singleton import singleton
+from .tracing import (TracingMiddleware, create_exporter, setup_tracing,
+                      trace_headers, tracer)
 
-__all__ = ["singleton"]
+__all__ = [
+    "HTTP_LATENCY",
+    "HTTP_REQUESTS",
+    "MetricsMiddleware",
+    "PUBLISH_LATENCY",
+    "TracingMiddleware",
+    "create_exporter",
+    "metrics_registry",
+    "setup_tracing",
+    "singleton",
+    "trace_headers",
+    "tracer",
+]
@@ -0,0 +1,83 @@
+import os
+import time
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Histogram
+from prometheus_client.multiprocess import MultiProcessCollector
+
+# Long polling and event streams hold requests open for up to a minute.
+LATENCY_BUCKETS = (
+    .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60)
+
+HTTP_REQUESTS = Counter(
+    'http_requests_total',
+    'HTTP requests answered by the API.',
+    ['method', 'route', 'status'],
+)
+HTTP_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'Time to answer HTTP requests.',
+    ['method', 'route'],
+    buckets=LATENCY_BUCKETS,
+)
+PUBLISH_LATENCY = Histogram(
+    'rabbitmq_publish_duration_seconds',
+    'Time for RabbitMQ to confirm a published message.',
+    ['outcome'],
+)
+
+
+def metrics_registry() -> CollectorRegistry:
+    """
+    The metrics to expose, summed over every server process.
+
+    With several processes, `PROMETHEUS_MULTIPROC_DIR` must point to an
+    empty directory shared by all of them, where each one writes its
+    metrics. A scrape answered by any process then reports the metrics
+    of all of them, those of exited processes included, so that counters
+    never go back.
+
+    Returns:
+        CollectorRegistry: The registry of this process when the variable
+            is not set.
+    """
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+
+    registry = CollectorRegistry()
+    MultiProcessCollector(registry)
+    return registry
+
+
+class MetricsMiddleware():
+    """Count the HTTP requests and time them.
+
+    Requests are labeled with the path template of their route, e.g.
+    `/api/inference/requests/{request_id}/result`, so that the number of
+    series does not grow with the number of requests.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_status(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            # The router sets the matched route in the scope.
+            route = getattr(scope.get('route'), 'path', 'unmatched')
+            HTTP_LATENCY.labels(scope['method'], route).observe(
+                time.perf_counter() - start)
+            HTTP_REQUESTS.labels(scope['method'], route, status_code).inc()
@@ -1,2 +1,11 @@
 INVALID_CONTENT_TYPE = 'Invalid content type.'
 EXCEED_MAX_SIZE = 'Exceed maximum size.'
+INVALID_WAIT = 'Invalid wait duration, e.g. 30s or 500ms.'
+INVALID_DEADLINE = 'Invalid deadline duration, e.g. 30s or 500ms.'
+EXCEED_MAX_IMAGES = 'Exceed maximum number of images.'
+EMPTY_BATCH = 'No images found in the batch.'
+INVALID_ARCHIVE = 'Invalid archive, expected a zip or tar file.'
+INVALID_IMAGE = 'Invalid or unsupported image.'
+EXCEED_MAX_PIXELS = 'Exceed maximum image dimensions.'
+BROKER_UNAVAILABLE = 'The inference queue is unavailable, retry later.'
+RESULT_NOT_FOUND = 'The result is unknown or expired.'
@@ -0,0 +1,119 @@
+import logging
+from typing import Dict, Optional
+
+from opentelemetry import propagate, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import (BatchSpanProcessor,
+                                            ConsoleSpanExporter, SpanExporter)
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+logging.basicConfig(level=logging.INFO)
+
+EXPORTERS = ('none', 'console', 'otlp')
+
+tracer = trace.get_tracer('inference-api')
+
+
+def create_exporter(name: str) -> Optional[SpanExporter]:
+    """
+    Args:
+        name (str): `none`, `console` or `otlp`. The OTLP exporter is an
+            optional dependency, configured by the standard `OTEL_EXPORTER_
+            OTLP_*` environment variables.
+
+    Returns:
+        Optional[SpanExporter]: The exporter, None for `none`.
+    """
+    if name not in EXPORTERS:
+        raise ValueError(f"Invalid tracing exporter: {name}")
+    if name == 'console':
+        return ConsoleSpanExporter()
+    if name == 'otlp':
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import \
+            OTLPSpanExporter
+        return OTLPSpanExporter()
+    return None
+
+
+def setup_tracing(
+    service_name: str,
+    sample_ratio: float,
+    exporter: Optional[SpanExporter],
+) -> Optional[TracerProvider]:
+    """
+    Record and export the spans of a ratio of the traces.
+
+    Without an exporter, tracing stays disabled: spans are no-ops and no
+    trace context is sent to the workers.
+
+    Args:
+        service_name (str): The name of the service in the traces.
+        sample_ratio (float): The ratio of the traces started here to
+            record, the others follow the decision of their caller.
+        exporter (Optional[SpanExporter]): Where spans are sent.
+
+    Returns:
+        Optional[TracerProvider]: The provider of the tracers, None when
+            tracing is disabled.
+    """
+    if exporter is None:
+        return None
+
+    provider = TracerProvider(
+        resource=Resource.create({'service.name': service_name}),
+        sampler=ParentBased(TraceIdRatioBased(sample_ratio)),
+    )
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    logging.info(f"Tracing {sample_ratio:.0%} of the requests")
+    return provider
+
+
+def trace_headers() -> Dict:
+    """
+    Returns:
+        Dict: The W3C `traceparent` header of the current span, to carry
+            its trace over to the workers. Empty when it is not sampled.
+    """
+    headers: Dict[str, str] = {}
+    propagate.inject(headers)
+    return headers
+
+
+class TracingMiddleware():
+    """Run every HTTP request in a span, named after its route.
+
+    The trace of a caller sending a `traceparent` header is continued,
+    otherwise a new one is started.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        carrier = {
+            key.decode('latin-1'): value.decode('latin-1')
+            for key, value in scope['headers']
+        }
+        with tracer.start_as_current_span(
+            scope['method'],
+            context=propagate.extract(carrier),
+            kind=trace.SpanKind.SERVER,
+        ) as span:
+            async def send_status(message):
+                if message['type'] == 'http.response.start':
+                    span.set_attribute(
+                        'http.response.status_code', message['status'])
+                await send(message)
+
+            await self.app(scope, receive, send_status)
+
+            route = getattr(scope.get('route'), 'path', None)
+            if route is not None and span.is_recording():
+                span.update_name(f"{scope['method']} {route}")
+                span.set_attribute('http.route', route)
@@ -1,9 +1,53 @@
-from app.api import router
+import logging
+from contextlib import asynccontextmanager
+
+from app.api import metrics_router, router
 from app.configs import Settings
-from app.services import rabbitmq_client
+from app.cores import (MetricsMiddleware, TracingMiddleware, create_exporter,
+                       setup_tracing)
+from app.services import rabbitmq_client, redis_client, result_notifier
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+logging.basicConfig(level=logging.INFO)
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    """
+    Open the connections of a server process, and close them once it has
+    drained.
+
+    Every process started by `uvicorn --workers` imports the application
+    on its own and runs this hook, so each one gets its own RabbitMQ
+    connection, Redis pool and result subscription. Nothing is connected
+    at import time.
+
+    On shutdown the server first stops accepting connections and waits
+    for the requests in flight, up to `--timeout-graceful-shutdown`
+    seconds, so that accepted images are confirmed by RabbitMQ before its
+    connection is closed.
+    """
+    settings = Settings()
+    _app.state.tracer_provider = setup_tracing(
+        'inference-api',
+        settings.TRACING_SAMPLE_RATIO,
+        create_exporter(settings.TRACING_EXPORTER),
+    )
+    await redis_client.connect()
+    await result_notifier.start()
+    await rabbitmq_client.connect()
+
+    yield
+
+    logging.info("Requests drained, closing connections")
+    await rabbitmq_client.close()
+    await result_notifier.stop()
+    await redis_client.close()
+    if _app.state.tracer_provider is not None:
+        # Export the spans still buffered.
+        _app.state.tracer_provider.shutdown()
+
 
 def get_application():
     settings = Settings()
@@ -14,9 +58,12 @@ def get_application():
         openapi_url=f"{settings.API_PREFIX}/api/openapi.json",
         docs_url=f'{settings.API_PREFIX}/docs',
         redoc_url=f'{settings.API_PREFIX}/redoc',
+        lifespan=lifespan,
     )
 
     _app.include_router(router, prefix=settings.API_PREFIX)
+    # Where Prometheus scrapes by default, outside of the API prefix.
+    _app.include_router(metrics_router)
 
     _app.add_middleware(
         CORSMiddleware,
@@ -27,18 +74,10 @@ def get_application():
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    _app.add_middleware(MetricsMiddleware)
+    _app.add_middleware(TracingMiddleware)
 
     return _app
 
 
 app = get_application()
-
-
-@app.on_event("startup")
-async def startup_event():
-    await rabbitmq_client.connect()
-
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    await rabbitmq_client.close()
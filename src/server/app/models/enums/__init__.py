@@ -1,3 +1,4 @@
+from .priority import Priority
 from .status import Status
 
-__all__ = ['Status']
+__all__ = ['Priority', 'Status']
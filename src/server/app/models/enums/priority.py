@@ -0,0 +1,12 @@
+from enum import Enum
+
+
+class Priority(Enum):
+    LOW = "low"
+    NORMAL = "normal"
+    HIGH = "high"
+
+    @property
+    def level(self) -> int:
+        """The AMQP message priority of the lane, higher is more urgent."""
+        return list(Priority).index(self)
@@ -5,3 +5,4 @@ class Status(Enum):
     OK = "ok"
     PROCESSING = "processing"
     COMPLETED = "completed"
+    FAILED = "failed"
@@ -1,5 +1,5 @@
 from .health import Health
-from .inference import InferenceProcess, InferenceResult
+from .inference import BatchProcess, InferenceProcess, InferenceResult
 
 
-__all__ = ["Health", "InferenceProcess", "InferenceResult"]
+__all__ = ["BatchProcess", "Health", "InferenceProcess", "InferenceResult"]
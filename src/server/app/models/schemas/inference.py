@@ -1,11 +1,27 @@
-from pydantic import Field
+from typing import Dict, List, Optional
+
+from pydantic import ConfigDict, Field
 
 from app.models.domains import Status
 
 
-class InferenceProcess(Status):
+class InferenceResult(Status):
+    # `model_version` is a field, not a pydantic method.
+    model_config = ConfigDict(protected_namespaces=())
+
+    inference_class: Optional[str] = Field(None)
+    probabilities: Optional[Dict[str, float]] = Field(None)
+    model: Optional[str] = Field(None)
+    model_version: Optional[str] = Field(None)
+    submitted_at: Optional[int] = Field(None)
+    completed_at: Optional[int] = Field(None)
+    error: Optional[str] = Field(None)
+
+
+class InferenceProcess(InferenceResult):
     request_id: str = Field(...)
 
 
-class InferenceResult(Status):
-    inference_class: str = Field('')
+class BatchProcess(Status):
+    batch_id: str = Field(...)
+    requests: List[InferenceProcess] = Field(...)
@@ -0,0 +1,34 @@
+from app.configs import PayloadSettings
+
+from .batch import (BATCH_ID_HEADER, PAYLOAD_SIZES_HEADER, REQUEST_IDS_HEADER,
+                    frame_batch)
+from .image import (MODEL_HEADER, PAYLOAD_DTYPE_HEADER, PAYLOAD_FORMAT_HEADER,
+                    PAYLOAD_SHAPE_HEADER, EncodedImageSerializer,
+                    ImageSerializer, RawImageSerializer, get_image_serializer)
+from .scheduling import (DEADLINE_HEADER, SUBMITTED_AT_HEADER,
+                         scheduling_headers)
+
+_settings = PayloadSettings()
+
+image_serializer = get_image_serializer(
+    _settings.PAYLOAD_FORMAT, _settings.PAYLOAD_DTYPE)
+
+
+__all__ = [
+    'BATCH_ID_HEADER',
+    'DEADLINE_HEADER',
+    'MODEL_HEADER',
+    'PAYLOAD_DTYPE_HEADER',
+    'PAYLOAD_FORMAT_HEADER',
+    'PAYLOAD_SHAPE_HEADER',
+    'PAYLOAD_SIZES_HEADER',
+    'REQUEST_IDS_HEADER',
+    'SUBMITTED_AT_HEADER',
+    'EncodedImageSerializer',
+    'ImageSerializer',
+    'RawImageSerializer',
+    'frame_batch',
+    'get_image_serializer',
+    'image_serializer',
+    'scheduling_headers',
+]
@@ -0,0 +1,38 @@
+from typing import Dict, List, Tuple
+
+PAYLOAD_SIZES_HEADER = 'payload-sizes'
+REQUEST_IDS_HEADER = 'request_ids'
+BATCH_ID_HEADER = 'batch_id'
+
+
+def frame_batch(payloads: List[Tuple[bytes, Dict]]) -> Tuple[bytes, Dict]:
+    """
+    Pack serialized images into the body of a single message.
+
+    The bodies are concatenated and their sizes are listed in the
+    `payload-sizes` header, so the worker can split them without copying
+    more than the images themselves.
+
+    Args:
+        payloads (List[Tuple[bytes, Dict]]): The body and headers of each
+            image, as returned by an `ImageSerializer`. The headers must be
+            the same for every image.
+
+    Returns:
+        Tuple[bytes, Dict]: The body and headers of the batch message.
+
+    Raises:
+        ValueError: If the payloads are empty or have different headers.
+    """
+    if not payloads:
+        raise ValueError("Empty batch")
+
+    headers = payloads[0][1]
+    if any(payload_headers != headers for _, payload_headers in payloads):
+        raise ValueError("Images of a batch must share the same headers")
+
+    body = b''.join(body for body, _ in payloads)
+    return body, {
+        **headers,
+        PAYLOAD_SIZES_HEADER: [len(body) for body, _ in payloads],
+    }
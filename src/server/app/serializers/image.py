@@ -0,0 +1,117 @@
+import io
+from abc import ABC, abstractmethod
+from typing import Dict, Tuple
+
+import numpy as np
+from PIL import Image
+
+PAYLOAD_FORMAT_HEADER = 'payload-format'
+PAYLOAD_DTYPE_HEADER = 'payload-dtype'
+PAYLOAD_SHAPE_HEADER = 'payload-shape'
+# Name of the worker model a payload is inferred with.
+MODEL_HEADER = 'x-model'
+
+
+class ImageSerializer(ABC):
+    """Turn an uploaded image into an AMQP message body and headers.
+
+    The worker picks the matching deserializer from the
+    `payload-format` header. Serializers that decode the image are
+    CPU-bound and set `blocking`, the API then runs them in a thread pool.
+    """
+
+    format: str
+    blocking: bool = False
+
+    @abstractmethod
+    def serialize(self, data: bytes) -> Tuple[bytes, Dict]:
+        raise NotImplementedError()
+
+
+class EncodedImageSerializer(ImageSerializer):
+    """Forward the original encoded (JPEG, PNG, ...) bytes untouched."""
+
+    format = 'encoded'
+
+    def serialize(self, data: bytes) -> Tuple[bytes, Dict]:
+        return data, {PAYLOAD_FORMAT_HEADER: self.format}
+
+
+class RawImageSerializer(ImageSerializer):
+    """Send a resized and center-cropped NCHW pixel buffer.
+
+    With `uint8` the worker only has to normalize the pixels, with
+    `float16` the buffer is already normalized.
+    """
+
+    format = 'raw'
+    blocking = True
+
+    DTYPES = ['uint8', 'float16']
+    RESIZE = 256
+    CROP = 224
+    MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+    STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+    def __init__(self, dtype: str = 'uint8'):
+        if dtype not in self.DTYPES:
+            raise ValueError(f"Invalid payload dtype: {dtype}")
+        self.dtype = dtype
+
+    def serialize(self, data: bytes) -> Tuple[bytes, Dict]:
+        image = Image.open(io.BytesIO(data)).convert('RGB')
+        pixels = np.asarray(self.resize_and_crop(image))
+        array = pixels.transpose(2, 0, 1)[np.newaxis]
+
+        if self.dtype == 'float16':
+            mean = self.MEAN.reshape(1, 3, 1, 1)
+            std = self.STD.reshape(1, 3, 1, 1)
+            array = ((array / np.float32(255) - mean) / std).astype(np.float16)
+
+        array = np.ascontiguousarray(array)
+        return array.tobytes(), {
+            PAYLOAD_FORMAT_HEADER: self.format,
+            PAYLOAD_DTYPE_HEADER: self.dtype,
+            PAYLOAD_SHAPE_HEADER: list(array.shape),
+        }
+
+    def resize_and_crop(self, image: Image.Image) -> Image.Image:
+        """
+        Resize the shorter side to `RESIZE` and take the center `CROP`
+        square, the same way the worker's torchvision pipeline does.
+        """
+        width, height = image.size
+        if width <= height:
+            size = (self.RESIZE, int(self.RESIZE * height / width))
+        else:
+            size = (int(self.RESIZE * width / height), self.RESIZE)
+        image = image.resize(size, Image.BILINEAR)
+
+        left = int(round((size[0] - self.CROP) / 2.0))
+        top = int(round((size[1] - self.CROP) / 2.0))
+        return image.crop((left, top, left + self.CROP, top + self.CROP))
+
+
+def get_image_serializer(
+    payload_format: str,
+    dtype: str = 'uint8',
+) -> ImageSerializer:
+    """
+    Create the serializer of the given wire format.
+
+    Args:
+        payload_format (str): `encoded` or `raw`.
+        dtype (str): Pixel type of the `raw` format.
+
+    Returns:
+        ImageSerializer: The serializer of the format.
+
+    Raises:
+        ValueError: If an invalid payload format is provided.
+    """
+    if payload_format == EncodedImageSerializer.format:
+        return EncodedImageSerializer()
+    elif payload_format == RawImageSerializer.format:
+        return RawImageSerializer(dtype)
+    else:
+        raise ValueError(f"Invalid payload format: {payload_format}")
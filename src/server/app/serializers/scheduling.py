@@ -0,0 +1,23 @@
+import time
+from typing import Dict, Optional
+
+DEADLINE_HEADER = 'x-deadline'
+SUBMITTED_AT_HEADER = 'x-submitted-at'
+
+
+def scheduling_headers(deadline: Optional[float] = None) -> Dict:
+    """
+    Headers the workers schedule a message with: its submission time,
+    from which they measure the latency of each priority lane, and its
+    deadline if any. Both are Unix timestamps in milliseconds.
+
+    Args:
+        deadline (Optional[float]): The deadline, as a Unix timestamp.
+
+    Returns:
+        Dict: The message headers.
+    """
+    headers = {SUBMITTED_AT_HEADER: int(time.time() * 1000)}
+    if deadline is not None:
+        headers[DEADLINE_HEADER] = int(deadline * 1000)
+    return headers
@@ -1,5 +1,15 @@
-from .rabbitmq import rabbitmq_client
+from .cache import content_cache
+from .notifier import result_notifier
+from .rabbitmq import BrokerUnavailableError, rabbitmq_client
 from .redis import redis_client
+from .results import result_store
 
 
-__all__ = ["rabbitmq_client", "redis_client"]
+__all__ = [
+    "BrokerUnavailableError",
+    "content_cache",
+    "rabbitmq_client",
+    "redis_client",
+    "result_notifier",
+    "result_store",
+]
@@ -0,0 +1,167 @@
+from typing import List, Optional
+
+from app.configs import CacheSettings
+
+from .redis import redis_client
+
+# Published by the workers: the revision of each model, and under an
+# empty name the revision of the default one.
+MODEL_REVISIONS_KEY = 'models:revisions'
+# Delete a key only if it still holds the given value, atomically.
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class ContentCache():
+    """Map uploaded image content to the request that classified it.
+
+    Keys combine the model and its revision, as published by the workers
+    whenever they load it, with the SHA-256 digest of the uploaded bytes.
+    A reloaded model thus infers images again instead of the results of
+    the previous one being served, and the keys of the previous revision
+    are no longer hit. Until the workers published any revision,
+    `model_version` stands in for it.
+
+    Keys expire after `ttl` seconds; every hit extends the expiry so that
+    frequently re-submitted images stay cached. With Redis'
+    `volatile-lru` policy, keys with a TTL are the ones evicted first
+    under memory pressure.
+    """
+
+    def __init__(self, redis, ttl: int, model_version: str, enabled: bool):
+        self.redis = redis
+        self.ttl = ttl
+        self.model_version = model_version
+        self.enabled = enabled
+
+    def key(self, digest: str) -> str:
+        return f"content:{digest}"
+
+    async def revision(self, model: Optional[str]) -> Optional[str]:
+        """
+        Args:
+            model (Optional[str]): The requested model, None for the
+                workers' default one.
+
+        Returns:
+            Optional[str]: The revision of the model the workers currently
+                serve, None if they did not publish it.
+        """
+        if not self.enabled:
+            return None
+        revision = await self.redis.client.hget(
+            MODEL_REVISIONS_KEY, model or '')
+        return None if revision is None else revision.decode()
+
+    def digest(
+        self,
+        image_digest: str,
+        model: Optional[str],
+        revision: Optional[str],
+    ) -> str:
+        """
+        Digest of an image in the cache, scoped to the model serving it
+        and to its revision.
+        """
+        return f"{revision or self.model_version}:{model or ''}:{image_digest}"
+
+    async def claim(self, digest: str, request_id: str) -> Optional[str]:
+        """
+        Register `request_id` as the request classifying the image of
+        `digest`, unless another request already does.
+
+        Args:
+            digest (str): The SHA-256 digest of the uploaded image.
+            request_id (str): The ID of the new request.
+
+        Returns:
+            Optional[str]: The ID of the earlier request for the same
+                content, or None if `request_id` was registered.
+        """
+        if not self.enabled:
+            return None
+
+        key = self.key(digest)
+        for _ in range(2):
+            # One round-trip: claim the key, or read and refresh the
+            # request that already holds it.
+            pipeline = self.redis.client.pipeline(transaction=False)
+            pipeline.set(key, request_id, nx=True, ex=self.ttl)
+            pipeline.get(key)
+            pipeline.expire(key, self.ttl)
+            claimed, cached_id, _ = await pipeline.execute()
+
+            if claimed:
+                return None
+            if cached_id is not None:
+                return cached_id.decode()
+            # The entry expired between both commands, claim it again.
+
+        return None
+
+    async def claim_many(
+        self,
+        digests: List[str],
+        request_ids: List[str],
+    ) -> List[Optional[str]]:
+        """
+        Claim the content of every image of a batch in one round-trip.
+
+        Args:
+            digests (List[str]): The SHA-256 digests of the uploaded
+                images.
+            request_ids (List[str]): The ID of the new request of each
+                image.
+
+        Returns:
+            List[Optional[str]]: For each image, the ID of the earlier
+                request for the same content, or None if its new request
+                was registered.
+        """
+        if not self.enabled:
+            return [None] * len(digests)
+
+        pipeline = self.redis.client.pipeline(transaction=False)
+        for digest, request_id in zip(digests, request_ids):
+            key = self.key(digest)
+            pipeline.set(key, request_id, nx=True, ex=self.ttl)
+            pipeline.get(key)
+            pipeline.expire(key, self.ttl)
+        replies = await pipeline.execute()
+
+        cached_ids: List[Optional[str]] = []
+        for i, (digest, request_id) in enumerate(zip(digests, request_ids)):
+            claimed, cached_id, _ = replies[3 * i:3 * i + 3]
+            if claimed:
+                cached_ids.append(None)
+            elif cached_id is not None:
+                cached_ids.append(cached_id.decode())
+            else:
+                cached_ids.append(await self.claim(digest, request_id))
+        return cached_ids
+
+    async def release(self, digest: str, request_id: str):
+        """
+        Forget `request_id` for the image of `digest`, e.g. when it could
+        not be queued. The claim of another request is kept, even one
+        taken in the meantime.
+        """
+        if not self.enabled:
+            return
+
+        await self.redis.client.eval(
+            RELEASE_SCRIPT, 1, self.key(digest), request_id)
+
+
+_settings = CacheSettings()
+
+content_cache = ContentCache(
+    redis_client,
+    ttl=_settings.CONTENT_CACHE_TTL,
+    model_version=_settings.MODEL_VERSION,
+    enabled=_settings.CONTENT_CACHE_ENABLED,
+)
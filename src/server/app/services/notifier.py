@@ -0,0 +1,100 @@
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Optional, Set
+
+from app.configs import RedisSettings
+from app.cores import singleton
+
+from .redis import redis_client
+
+logging.basicConfig(level=logging.INFO)
+
+
+@singleton
+class ResultNotifier():
+    """Fan out completion events published by the workers.
+
+    A single Redis pub/sub subscription per process listens on the result
+    channel and resolves the futures of every client waiting for the
+    completed request, so waiting clients cost no Redis traffic at all.
+    """
+
+    def __init__(self):
+        self.channel = None
+        self.pubsub = None
+        self.task: Optional[asyncio.Task] = None
+        self.waiters: Dict[str, Set[asyncio.Future]] = defaultdict(set)
+        self.reconnect_delay = 1
+
+    async def start(self):
+        self.channel = RedisSettings().REDIS_RESULT_CHANNEL
+        self.task = asyncio.get_event_loop().create_task(self.listen())
+
+    async def stop(self):
+        if self.task is None:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+
+    async def listen(self):
+        while True:
+            self.pubsub = redis_client.client.pubsub(
+                ignore_subscribe_messages=True)
+            try:
+                await self.pubsub.subscribe(self.channel)
+                logging.info(f"Listening for results on {self.channel}")
+                async for message in self.pubsub.listen():
+                    self.notify(json.loads(message['data']))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(
+                    f"Result subscription failed: {e}. "
+                    f"Retrying in {self.reconnect_delay} seconds...")
+                await asyncio.sleep(self.reconnect_delay)
+            finally:
+                await self.pubsub.aclose()
+
+    def notify(self, event: Dict):
+        request_id = event.get('request_id')
+        if request_id is None:
+            logging.warning(f"Ignoring result event without request ID: {event}")
+            return
+        for future in self.waiters.pop(request_id, ()):
+            if not future.done():
+                future.set_result(event)
+
+    @contextmanager
+    def subscribe(self, request_id: str):
+        """
+        Register interest in the completion of a request.
+
+        Subscribe before reading the current result from Redis, so that a
+        completion happening in between is not missed.
+
+        Args:
+            request_id (str): The ID of the request.
+
+        Yields:
+            asyncio.Future: Resolved with the completion event.
+        """
+        future = asyncio.get_event_loop().create_future()
+        self.waiters[request_id].add(future)
+        try:
+            yield future
+        finally:
+            waiters = self.waiters.get(request_id)
+            if waiters is not None:
+                waiters.discard(future)
+                if not waiters:
+                    del self.waiters[request_id]
+
+
+result_notifier = ResultNotifier()
@@ -1,7 +1,42 @@
-import os
-import redis
+import logging
 
-redis_client = redis.Redis(
-    host=os.getenv('REDIS_HOST', 'localhost'),
-    port=os.getenv('REDIS_PORT', '6379'),
-)
+import redis.asyncio as redis
+from app.configs import RedisSettings
+from app.cores import singleton
+
+logging.basicConfig(level=logging.INFO)
+
+
+@singleton
+class RedisClient():
+    """asyncio Redis client backed by a bounded connection pool.
+
+    The pool is opened by `connect` and closed by `close`, which the
+    application calls from its startup and shutdown hooks. Requests wait
+    up to `REDIS_POOL_TIMEOUT` seconds for a free connection once
+    `REDIS_MAX_CONNECTIONS` are in use.
+    """
+
+    def __init__(self):
+        self.pool = None
+        self.client = None
+
+    async def connect(self):
+        settings = RedisSettings()
+        self.pool = redis.BlockingConnectionPool(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            timeout=settings.REDIS_POOL_TIMEOUT,
+        )
+        self.client = redis.Redis(connection_pool=self.pool)
+        await self.client.ping()
+        logging.info("Connected to Redis")
+
+    async def close(self):
+        await self.client.aclose()
+        await self.pool.disconnect()
+        logging.info("Disconnected from Redis")
+
+
+redis_client = RedisClient()
@@ -0,0 +1,123 @@
+import json
+import time
+from typing import Dict, List, Optional
+
+from app.configs import ResultSettings
+from app.models.enums import Status
+from app.models.schemas import InferenceProcess
+
+from .redis import redis_client
+
+
+class ResultStore():
+    """Keep the state of inference requests in Redis.
+
+    Every request owns a single hash under `result:<ID>`, created as
+    `processing` when it is submitted and completed by the worker with
+    its outcome: the class, top-k probabilities, model and version of a
+    completed request, or the error of one that failed for good, plus
+    submission and completion times in epoch milliseconds. Each write
+    sets the expiry of the record to `ttl` seconds, so the memory used by
+    results is bounded by the request rate over the TTL.
+
+    A missing record therefore means an unknown or expired request, and
+    a single `HGETALL` tells it apart from a request still processing.
+    """
+
+    def __init__(self, redis, ttl: int):
+        self.redis = redis
+        self.ttl = ttl
+
+    @staticmethod
+    def key(request_id: str) -> str:
+        return f"result:{request_id}"
+
+    async def create(
+        self,
+        request_ids: List[str],
+        model: Optional[str] = None,
+    ):
+        """
+        Record new requests as processing, in one round-trip.
+
+        Args:
+            request_ids (List[str]): The IDs of the requests.
+            model (Optional[str]): The model they were sent to, None for
+                the workers' default one.
+        """
+        record = {
+            'status': Status.PROCESSING.value,
+            'submitted_at': int(time.time() * 1000),
+        }
+        if model is not None:
+            record['model'] = model
+
+        pipeline = self.redis.client.pipeline(transaction=False)
+        for request_id in request_ids:
+            pipeline.hset(self.key(request_id), mapping=record)
+            pipeline.expire(self.key(request_id), self.ttl)
+        await pipeline.execute()
+
+    async def discard(self, request_ids: List[str]):
+        """
+        Delete the records of requests that were never sent, e.g. when
+        the image was already submitted or the broker rejected it.
+        """
+        if request_ids:
+            await self.redis.client.delete(
+                *[self.key(request_id) for request_id in request_ids])
+
+    async def read(
+        self,
+        request_ids: List[str],
+    ) -> List[Optional[InferenceProcess]]:
+        """
+        Read the state of several requests in one round-trip.
+
+        Args:
+            request_ids (List[str]): The IDs of the requests.
+
+        Returns:
+            List[Optional[InferenceProcess]]: The state of each request,
+                in order, None for unknown or expired ones.
+        """
+        if not request_ids:
+            return []
+
+        pipeline = self.redis.client.pipeline(transaction=False)
+        for request_id in request_ids:
+            pipeline.hgetall(self.key(request_id))
+        records = await pipeline.execute()
+
+        return [
+            self.process(request_id, record)
+            for request_id, record in zip(request_ids, records)
+        ]
+
+    @staticmethod
+    def process(
+        request_id: str,
+        record: Dict[bytes, bytes],
+    ) -> Optional[InferenceProcess]:
+        if not record:
+            return None
+
+        fields = {
+            field.decode(): value.decode() for field, value in record.items()
+        }
+        if 'probabilities' in fields:
+            fields['probabilities'] = json.loads(fields['probabilities'])
+        return InferenceProcess(request_id=request_id, **fields)
+
+    @staticmethod
+    def from_event(event: Dict, process: InferenceProcess) -> InferenceProcess:
+        """
+        The state of a request announced by a worker on the result
+        channel, completing its `process` read before.
+        """
+        return InferenceProcess(**{**process.model_dump(), **event})
+
+
+_settings = ResultSettings()
+
+result_store = ResultStore(redis_client, ttl=_settings.RESULT_TTL)
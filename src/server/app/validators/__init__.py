@@ -1,9 +1,21 @@
-from .upload import UploadImageValidator
+from app.configs import BatchSettings, ResultSettings, SchedulingSettings
 
+from .batch import BatchUploadValidator
+from .deadline import DeadlineValidator
+from .upload import UploadedImage, UploadImageValidator
+from .wait import WaitValidator
 
 upload_image_validator = UploadImageValidator()
+batch_upload_validator = BatchUploadValidator(
+    BatchSettings().BATCH_MAX_IMAGES)
+wait_validator = WaitValidator(ResultSettings().RESULT_MAX_WAIT)
+deadline_validator = DeadlineValidator(SchedulingSettings().MAX_DEADLINE)
 
 
 __all__ = [
+    'UploadedImage',
+    'batch_upload_validator',
+    'deadline_validator',
     'upload_image_validator',
+    'wait_validator',
 ]
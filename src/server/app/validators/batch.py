@@ -0,0 +1,150 @@
+import io
+import mimetypes
+import os
+import tarfile
+import zipfile
+from typing import List
+
+from fastapi import File, HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from app.cores import strings
+
+from .upload import UploadedImage, UploadImageValidator
+
+
+class BatchUploadValidator:
+    """Validate the files of a batch, expanding zip and tar archives.
+
+    Every image is checked like a single upload, see
+    `UploadImageValidator`, archives are read and hashed in a thread pool.
+
+    Returns the content and digest of every image of the batch, in upload
+    order and in archive order for archives.
+
+    Raises:
+        HTTPException: If a file is not an image or an archive, an archive
+            cannot be read, the batch is empty, has more than `max_images`
+            images or exceeds `max_size` bytes in total.
+    """
+
+    ARCHIVE_TYPES = [
+        'application/zip',
+        'application/x-zip-compressed',
+        'application/x-tar',
+        'application/gzip',
+        'application/x-gzip',
+        'application/x-gtar',
+    ]
+
+    def __init__(
+        self,
+        max_images: int,
+        media_allowed_types: List[str] = (
+            UploadImageValidator.MEDIA_ALLOWED_TYPES),
+        max_size: int = UploadImageValidator.MAX_SIZE,
+    ):
+        self.max_images = max_images
+        self.media_allowed_types = media_allowed_types
+        self.max_size = max_size
+        self.image_validator = UploadImageValidator(
+            media_allowed_types, max_size)
+
+    async def __call__(
+        self,
+        images: List[UploadFile] = File(...),
+    ) -> List[UploadedImage]:
+        if sum(image.size or 0 for image in images) > self.max_size:
+            raise HTTPException(400, strings.EXCEED_MAX_SIZE)
+
+        contents: List[UploadedImage] = []
+        for image in images:
+            content_type = (image.content_type or '').split(';')[0].strip()
+
+            if content_type in self.ARCHIVE_TYPES:
+                contents.extend(await run_in_threadpool(
+                    self.read_archive,
+                    await image.read(),
+                    self.max_images - len(contents),
+                ))
+            elif content_type.split('/')[0] in self.media_allowed_types:
+                contents.append(await self.image_validator.read(image))
+            else:
+                raise HTTPException(400, strings.INVALID_CONTENT_TYPE)
+
+            if len(contents) > self.max_images:
+                raise HTTPException(400, strings.EXCEED_MAX_IMAGES)
+
+        if not contents:
+            raise HTTPException(400, strings.EMPTY_BATCH)
+
+        return contents
+
+    def read_archive(
+        self,
+        data: bytes,
+        max_images: int,
+    ) -> List[UploadedImage]:
+        """
+        Read the images of a zip or tar (optionally compressed) archive.
+
+        Files that are not images by their extension and hidden files are
+        skipped. Reading stops as soon as the archive holds more than
+        `max_images` images or `max_size` uncompressed bytes.
+        """
+        try:
+            if zipfile.is_zipfile(io.BytesIO(data)):
+                return self.read_zip(data, max_images)
+            return self.read_tar(data, max_images)
+        except (zipfile.BadZipFile, tarfile.TarError):
+            raise HTTPException(400, strings.INVALID_ARCHIVE)
+
+    def read_zip(
+        self,
+        data: bytes,
+        max_images: int,
+    ) -> List[UploadedImage]:
+        images: List[UploadedImage] = []
+        size = 0
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            for member in archive.infolist():
+                if member.is_dir() or not self.is_image(member.filename):
+                    continue
+                size += member.file_size
+                self.check_limits(len(images) + 1, size, max_images)
+                images.append(
+                    self.image_validator.inspect(archive.read(member)))
+        return images
+
+    def read_tar(
+        self,
+        data: bytes,
+        max_images: int,
+    ) -> List[UploadedImage]:
+        images: List[UploadedImage] = []
+        size = 0
+        with tarfile.open(fileobj=io.BytesIO(data), mode='r:*') as archive:
+            for member in archive:
+                if not member.isfile() or not self.is_image(member.name):
+                    continue
+                # Links, directories and devices have no content.
+                content = archive.extractfile(member)
+                if content is None:
+                    continue
+                size += member.size
+                self.check_limits(len(images) + 1, size, max_images)
+                images.append(self.image_validator.inspect(content.read()))
+        return images
+
+    def check_limits(self, count: int, size: int, max_images: int):
+        if count > max_images:
+            raise HTTPException(400, strings.EXCEED_MAX_IMAGES)
+        if size > self.max_size:
+            raise HTTPException(400, strings.EXCEED_MAX_SIZE)
+
+    def is_image(self, name: str) -> bool:
+        if any(part.startswith(('.', '__MACOSX')) for part in name.split('/')):
+            return False
+        media_type, _ = mimetypes.guess_type(os.path.basename(name))
+        return media_type is not None and \
+            media_type.split('/')[0] in self.media_allowed_types
@@ -0,0 +1,43 @@
+import time
+from typing import Optional
+
+from fastapi import HTTPException, Query
+
+from app.cores import strings
+
+from .wait import WaitValidator
+
+
+class DeadlineValidator:
+    """Parse the `deadline` query parameter of the inference endpoints.
+
+    The deadline is a duration from now, in the same format as `wait`,
+    capped at `max_deadline` seconds. Requests still queued when it
+    passes are failed by the workers instead of being inferred.
+
+    Raises:
+        HTTPException: If the duration cannot be parsed.
+    """
+
+    def __init__(self, max_deadline: float):
+        self.max_deadline = max_deadline
+
+    def __call__(
+        self,
+        deadline: Optional[str] = Query(
+            None,
+            description="Give up on the request if it is not inferred "
+            "within this duration, e.g. 30s."),
+    ) -> Optional[float]:
+        """
+        Returns:
+            Optional[float]: The deadline as a Unix timestamp, or None
+                without a deadline.
+        """
+        if deadline is None:
+            return None
+
+        seconds = WaitValidator.parse(deadline)
+        if seconds is None:
+            raise HTTPException(400, strings.INVALID_DEADLINE)
+        return time.time() + min(seconds, self.max_deadline)
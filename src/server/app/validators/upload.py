@@ -1,35 +1,128 @@
+import hashlib
+import io
 import re
-from typing import List
+from typing import List, NamedTuple
 
 from fastapi import HTTPException, UploadFile
+from PIL import Image, UnidentifiedImageError
+from starlette.concurrency import run_in_threadpool
 
-from app.cores import strings
+from app.cores import strings, tracer
+
+
+class UploadedImage(NamedTuple):
+    data: bytes
+    digest: str
 
 
 class UploadImageValidator:
     """Validate the file to be uploaded.
 
+    The file is read in chunks, hashing it on the way, and only its header
+    is inspected: the magic bytes must match a supported image format and
+    the dimensions, read by PIL without decoding the pixels, must not
+    exceed `max_pixels`. Decoding is left to the workers.
+
+    Returns the content of the file along with its SHA-256 digest.
+
     Raises:
-        HTTPException: If the file is not in allowed types
-            or exceeds the maximum size.
+        HTTPException: If the file is not in allowed types, is not a
+            supported image, exceeds the maximum size or dimensions.
     """
 
     MEDIA_ALLOWED_TYPES = ['image']
     MAX_SIZE = 100 * 1024 * 1024  # 100mb
+    MAX_PIXELS = Image.MAX_IMAGE_PIXELS
+    CHUNK_SIZE = 1024 * 1024
+
+    IMAGE_SIGNATURES = {
+        'JPEG': [b'\xff\xd8\xff'],
+        'PNG': [b'\x89PNG\r\n\x1a\n'],
+        'GIF': [b'GIF87a', b'GIF89a'],
+        'BMP': [b'BM'],
+        'TIFF': [b'II*\x00', b'MM\x00*'],
+        'WEBP': [b'RIFF'],
+    }
 
     def __init__(
         self,
         media_allowed_types: List[str] = MEDIA_ALLOWED_TYPES,
-        max_size: int = MAX_SIZE
+        max_size: int = MAX_SIZE,
+        max_pixels: int = MAX_PIXELS,
     ):
         self.media_allowed_types = media_allowed_types
         self.max_size = max_size
+        self.max_pixels = max_pixels
 
-    def __call__(self, image: UploadFile):
+    async def __call__(self, image: UploadFile) -> UploadedImage:
 
-        content_type = re.search(r'^([\w]+)/', image.content_type).group(1)
-        if content_type not in self.media_allowed_types:
+        content_type = re.search(r'^([\w]+)/', image.content_type or '')
+        if content_type is None or \
+                content_type.group(1) not in self.media_allowed_types:
             raise HTTPException(400, strings.INVALID_CONTENT_TYPE)
 
-        if image.size > self.max_size:
+        with tracer.start_as_current_span('upload.read'):
+            return await self.read(image)
+
+    async def read(self, image: UploadFile) -> UploadedImage:
+        """
+        Read an uploaded image in chunks, checking its header first and
+        its size as it goes.
+        """
+        if image.size is not None and image.size > self.max_size:
             raise HTTPException(400, strings.EXCEED_MAX_SIZE)
+
+        chunks: List[bytes] = []
+        size = 0
+        digest = hashlib.sha256()
+        while True:
+            chunk = await image.read(self.CHUNK_SIZE)
+            if not chunk:
+                break
+            if not chunks:
+                self.check_signature(chunk)
+            size += len(chunk)
+            if size > self.max_size:
+                raise HTTPException(400, strings.EXCEED_MAX_SIZE)
+            # Hashing a chunk at a time keeps the event loop responsive.
+            digest.update(chunk)
+            chunks.append(chunk)
+
+        data = b''.join(chunks)
+        await run_in_threadpool(self.check_header, data)
+        return UploadedImage(data, digest.hexdigest())
+
+    def inspect(self, data: bytes) -> UploadedImage:
+        """
+        Check an image already in memory, e.g. read from an archive, and
+        hash it. Blocking, meant to run in a thread pool.
+        """
+        self.check_signature(data)
+        self.check_header(data)
+        return UploadedImage(data, hashlib.sha256(data).hexdigest())
+
+    def check_signature(self, header: bytes):
+        """
+        Check that `header` starts with the magic bytes of a supported
+        image format.
+        """
+        for signatures in self.IMAGE_SIGNATURES.values():
+            if header.startswith(tuple(signatures)):
+                return
+        raise HTTPException(400, strings.INVALID_IMAGE)
+
+    def check_header(self, data: bytes):
+        """
+        Check the format and dimensions of an image. PIL only parses the
+        header when opening an image, the pixels are never decoded.
+        """
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                format, (width, height) = image.format, image.size
+        except (UnidentifiedImageError, Image.DecompressionBombError):
+            raise HTTPException(400, strings.INVALID_IMAGE)
+
+        if format not in self.IMAGE_SIGNATURES:
+            raise HTTPException(400, strings.INVALID_IMAGE)
+        if width * height > self.max_pixels:
+            raise HTTPException(400, strings.EXCEED_MAX_PIXELS)
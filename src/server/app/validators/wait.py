@@ -0,0 +1,49 @@
+import re
+from typing import Optional
+
+from fastapi import HTTPException, Query
+
+from app.cores import strings
+
+
+class WaitValidator:
+    """Parse the `wait` query parameter of long-polling endpoints.
+
+    Accepts seconds (`30`, `30s`) or milliseconds (`500ms`) and caps the
+    duration at `max_wait` seconds.
+
+    Raises:
+        HTTPException: If the duration cannot be parsed.
+    """
+
+    PATTERN = re.compile(r'^(\d+(?:\.\d+)?)(ms|s)?$')
+
+    def __init__(self, max_wait: float):
+        self.max_wait = max_wait
+
+    def __call__(
+        self,
+        wait: Optional[str] = Query(
+            None, description="How long to wait for the result, e.g. 30s."),
+    ) -> float:
+        if wait is None:
+            return 0.0
+
+        seconds = self.parse(wait)
+        if seconds is None:
+            raise HTTPException(400, strings.INVALID_WAIT)
+        return min(seconds, self.max_wait)
+
+    @classmethod
+    def parse(cls, duration: str) -> Optional[float]:
+        """
+        Returns:
+            Optional[float]: The duration in seconds, or None if it cannot
+                be parsed.
+        """
+        match = cls.PATTERN.match(duration.strip())
+        if match is None:
+            return None
+
+        value, unit = match.groups()
+        return float(value) / 1000 if unit == 'ms' else float(value)
@@ -0,0 +1,168 @@
+"""
+Measure the end-to-end latency and throughput of a running deployment.
+
+Each simulated client submits an image to `POST /inference/requests`,
+then long-polls its result until a worker completes it. Run the stack
+first, e.g. `docker-compose up -d`, or `benchmarks.stack` to load the API
+alone with a simulated broker, then from `src/server`:
+
+    python -m benchmarks.load --url http://localhost:8000/api \
+        --requests 1000 --concurrency 32 --output load.json
+
+Images are distinct by default, so that the content cache of the API
+does not answer in place of the workers. `--image` sends the same file
+every time instead, to measure cache hits.
+"""
+import argparse
+import asyncio
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Sequence
+
+import httpx
+
+from .report import percentiles, write_report
+from .serialization import synthetic_image
+
+FINAL_STATUSES = ('completed', 'failed')
+
+
+async def run_request(
+    client: httpx.AsyncClient,
+    data: bytes,
+    wait: str,
+    timeout: float,
+) -> Dict:
+    """
+    Submit an image and wait for its result.
+
+    Returns:
+        Dict: The outcome of the request, its submission latency and its
+            end-to-end latency, in milliseconds.
+    """
+    start = time.perf_counter()
+    response = await client.post(
+        '/inference/requests',
+        files={'image': ('image.jpeg', data, 'image/jpeg')})
+    submitted = time.perf_counter()
+    outcome = {'submit_ms': 1000 * (submitted - start)}
+
+    if response.status_code not in (200, 202):
+        return {**outcome, 'status': f'http-{response.status_code}'}
+
+    process = response.json()
+    while process.get('status') not in FINAL_STATUSES:
+        if time.perf_counter() - start > timeout:
+            return {**outcome, 'status': 'timeout'}
+        response = await client.get(
+            f"/inference/requests/{process['request_id']}/result",
+            params={'wait': wait})
+        if response.status_code != 200:
+            return {**outcome, 'status': f'http-{response.status_code}'}
+        process = response.json()
+
+    return {
+        **outcome,
+        'status': process['status'],
+        'end_to_end_ms': 1000 * (time.perf_counter() - start),
+    }
+
+
+async def benchmark(
+    url: str,
+    images: Sequence[bytes],
+    concurrency: int,
+    wait: str,
+    timeout: float,
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+) -> Dict:
+    """
+    Run one request per image, `concurrency` at a time, through
+    `transport` when given, e.g. to call an application in process.
+
+    Returns:
+        Dict: Status counts, throughput and latency percentiles.
+    """
+    outcomes: List[Dict] = []
+    remaining = iter(images)
+
+    async def client_loop(client: httpx.AsyncClient):
+        for data in remaining:
+            try:
+                outcome = await run_request(client, data, wait, timeout)
+            except httpx.HTTPError as e:
+                outcome = {'status': type(e).__name__}
+            outcomes.append(outcome)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(
+            base_url=url, limits=limits, timeout=None,
+            transport=transport) as client:
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(client_loop(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    statuses = Counter(outcome['status'] for outcome in outcomes)
+    completed = [
+        outcome['end_to_end_ms'] for outcome in outcomes
+        if outcome['status'] == 'completed'
+    ]
+    return {
+        'requests': len(outcomes),
+        'statuses': dict(statuses),
+        'seconds': round(elapsed, 3),
+        'images_per_s': round(len(completed) / elapsed, 1),
+        'submit_latency_ms': percentiles([
+            outcome['submit_ms'] for outcome in outcomes
+            if 'submit_ms' in outcome
+        ]),
+        'end_to_end_latency_ms': percentiles(completed),
+    }
+
+
+def load_images(args: argparse.Namespace) -> List[bytes]:
+    if args.image:
+        with open(args.image, 'rb') as f:
+            return [f.read()] * args.requests
+    return [
+        synthetic_image(args.size, args.size, seed=seed)
+        for seed in range(args.requests)
+    ]
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--url', default='http://localhost:8000/api')
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument(
+        '--image', help='Send this image every time instead of distinct '
+        'synthetic ones.')
+    parser.add_argument(
+        '--size', type=int, default=512,
+        help='Width and height of the synthetic images.')
+    parser.add_argument(
+        '--wait', default='30s', help='Long polling duration of a result.')
+    parser.add_argument(
+        '--timeout', type=float, default=120,
+        help='Seconds after which a request counts as timed out.')
+    parser.add_argument('--output', help='Write the report to this file.')
+    options = parser.parse_args(argv)
+
+    result = asyncio.run(benchmark(
+        options.url, load_images(options), options.concurrency, options.wait,
+        options.timeout))
+    write_report({
+        'parameters': {
+            'url': options.url,
+            'concurrency': options.concurrency,
+            'image': options.image,
+            'size': None if options.image else options.size,
+        },
+        **result,
+    }, options.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Measure the sustained publish rate of the API's RabbitMQ client.
+
+Messages are published to a temporary queue of the broker at `AMQP_URL`
+with publisher confirms, the same way the API publishes requests, and the
+rate and confirmation latency are reported as JSON:
+
+    python -m benchmarks.publish --messages 20000 --size 100000 \
+        --concurrency 256 --channels 4
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from aio_pika import Message
+
+from app.services import BrokerUnavailableError, rabbitmq_client
+
+from .report import write_report
+
+
+async def benchmark(
+    messages: int,
+    size: int,
+    concurrency: int,
+) -> Dict:
+    """
+    Publish `messages` messages of `size` bytes, `concurrency` at a time.
+
+    Returns:
+        Dict: Throughput and confirmation latency percentiles.
+    """
+    await rabbitmq_client.connect()
+    queue = await rabbitmq_client.channel.declare_queue(
+        f"benchmark-{uuid.uuid4()}", exclusive=True, auto_delete=True)
+
+    body = os.urandom(size)
+    latencies: List[float] = []
+    errors = 0
+    remaining = iter(range(messages))
+
+    async def publisher():
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                await rabbitmq_client.publish_message(
+                    Message(body), routing_key=queue.name)
+                latencies.append(time.perf_counter() - start)
+            except BrokerUnavailableError:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(publisher() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    await queue.delete(if_unused=False, if_empty=False)
+    await rabbitmq_client.close()
+
+    latencies_ms = 1000 * np.array(latencies or [0.0])
+    return {
+        'messages': messages,
+        'message_bytes': size,
+        'concurrency': concurrency,
+        'channels': len(rabbitmq_client.channels),
+        'errors': errors,
+        'seconds': elapsed,
+        'messages_per_second': len(latencies) / elapsed,
+        'megabytes_per_second': len(latencies) * size / elapsed / 1e6,
+        'latency_ms': {
+            f'p{p}': float(np.percentile(latencies_ms, p))
+            for p in (50, 95, 99)
+        },
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--messages', type=int, default=10000)
+    parser.add_argument('--size', type=int, default=100 * 1024)
+    parser.add_argument('--concurrency', type=int, default=128)
+    parser.add_argument(
+        '--channels', type=int,
+        help='Overrides RABBITMQ_CHANNEL_POOL_SIZE.')
+    parser.add_argument(
+        '--max-pending', type=int,
+        help='Overrides RABBITMQ_MAX_PENDING_PUBLISHES.')
+    parser.add_argument('--output', help='Write the report to this file.')
+    options = parser.parse_args(argv)
+
+    if options.channels:
+        os.environ['RABBITMQ_CHANNEL_POOL_SIZE'] = str(options.channels)
+    if options.max_pending:
+        os.environ['RABBITMQ_MAX_PENDING_PUBLISHES'] = str(options.max_pending)
+
+    logging.getLogger().setLevel(logging.WARNING)
+    result = asyncio.run(
+        benchmark(options.messages, options.size, options.concurrency))
+    write_report(result, options.output)
+
+
+if __name__ == '__main__':
+    main()
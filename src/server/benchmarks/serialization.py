@@ -0,0 +1,130 @@
+"""
+Measure the cost and size of the AMQP payloads published by the API.
+
+Each payload format serializes the same uploaded image: `encoded`
+forwards the file, `raw` resizes and crops it into `uint8` or `float16`
+pixels. Batches of payloads are then framed into a single message the
+way the batch endpoint does. Latency percentiles and payload sizes are
+reported as JSON, from `src/server`:
+
+    python -m benchmarks.serialization --width 2048 --height 2048 \
+        --batch-sizes 1 16 100 --output serialization.json
+"""
+import argparse
+import io
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+import numpy as np
+from PIL import Image
+
+from app.serializers import frame_batch, get_image_serializer
+
+from .report import percentiles, write_report
+
+FORMATS = (('encoded', 'uint8'), ('raw', 'uint8'), ('raw', 'float16'))
+
+T = TypeVar('T')
+
+
+def synthetic_image(
+    width: int,
+    height: int,
+    quality: int = 90,
+    seed: int = 0,
+) -> bytes:
+    """
+    A JPEG of smooth gradients with some noise, compressing roughly like
+    a photograph rather than like flat or random pixels. Each `seed`
+    gives a distinct image.
+    """
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    noise = np.random.default_rng(seed).normal(0, 8, (height, width))
+    channels = [x + 0 * y, y + 0 * x, (x + y) / 2]
+    pixels = np.stack([c + noise for c in channels], axis=-1)
+
+    output = io.BytesIO()
+    Image.fromarray(pixels.clip(0, 255).astype(np.uint8)).save(
+        output, format='JPEG', quality=quality)
+    return output.getvalue()
+
+
+def timed(function: Callable[[], T], repeat: int) -> Tuple[List[float], T]:
+    """
+    Returns:
+        Tuple[List[float], T]: The latency, in milliseconds, of `repeat`
+            calls of `function`, at least one, and the result of the last.
+    """
+    latencies: List[float] = []
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        result = function()
+        latencies.append(1000 * (time.perf_counter() - start))
+    return latencies, result
+
+
+def benchmark(
+    data: bytes,
+    batch_sizes: Sequence[int],
+    repeat: int,
+) -> Dict:
+    """
+    Serialize `data` in every payload format, and frame batches of it.
+
+    Returns:
+        Dict: The latency, in milliseconds, and size of each format, and
+            of the framing of each batch size.
+    """
+    report: Dict[str, Dict] = {
+        'parameters': {'image_bytes': len(data), 'repeat': repeat},
+    }
+
+    for payload_format, dtype in FORMATS:
+        serializer = get_image_serializer(payload_format, dtype)
+        latencies, (body, headers) = timed(
+            lambda: serializer.serialize(data), repeat)
+        payloads = [(body, headers)] * max(batch_sizes)
+
+        framing: Dict[int, Dict] = {}
+        for size in batch_sizes:
+            frame_latencies, (batch_body, _) = timed(
+                lambda: frame_batch(payloads[:size]), repeat)
+            framing[size] = {
+                'message_bytes': len(batch_body),
+                'latency_ms': percentiles(frame_latencies),
+            }
+
+        report[f'{payload_format}-{dtype}'] = {
+            'payload_bytes': len(body),
+            'serialize_latency_ms': percentiles(latencies),
+            'frame_batch': framing,
+        }
+    return report
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument(
+        '--image', help='Image to serialize, a synthetic JPEG by default.')
+    parser.add_argument('--width', type=int, default=1024)
+    parser.add_argument('--height', type=int, default=1024)
+    parser.add_argument(
+        '--batch-sizes', type=int, nargs='+', default=[1, 16, 100])
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--output', help='Write the report to this file.')
+    options = parser.parse_args(argv)
+
+    if options.image:
+        with open(options.image, 'rb') as f:
+            data = f.read()
+    else:
+        data = synthetic_image(options.width, options.height)
+
+    write_report(
+        benchmark(data, sorted(options.batch_sizes), options.repeat),
+        options.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+Serve the API with a simulated broker in place of RabbitMQ and workers.
+
+Published messages are confirmed at once and their requests completed
+after `--service-time` milliseconds, the way a worker completes them: the
+result records are written to Redis and announced on the result channel.
+Everything else runs as deployed: uploads are read, hashed, checked and
+serialized, the content cache is claimed and long polls are answered by
+the result subscription of each process. Start Redis, then from
+`src/server`:
+
+    python -m benchmarks.stack --processes 4 --port 8000
+
+and run `benchmarks.load` against `http://localhost:8000/api`.
+`--fake-redis` serves an in-memory Redis from `fakeredis` in the
+supervisor process instead, when no Redis is at hand; it then shares a
+core with the API, which lowers the throughput measured.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from typing import List, Optional, Sequence, Set
+
+import uvicorn
+from aio_pika import Message
+from fastapi import FastAPI
+
+from app.configs import RedisSettings, ResultSettings
+from app.serializers import MODEL_HEADER, REQUEST_IDS_HEADER
+from app.services import rabbitmq_client, redis_client
+
+SERVICE_TIME_ENV = 'SIMULATED_SERVICE_TIME'
+PROBABILITIES = {'Normal': 0.9, 'Pneumonia': 0.1}
+
+
+class SimulatedBroker():
+    """Stand in for `RabbitMQClient`, completing every request published
+    after `service_time` seconds."""
+
+    def __init__(self, service_time: float):
+        self.service_time = service_time
+        self.tasks: Set[asyncio.Task] = set()
+        self.channel = RedisSettings().REDIS_RESULT_CHANNEL
+        self.ttl = ResultSettings().RESULT_TTL
+
+    async def connect(self):
+        logging.info(
+            f"Simulating a broker, requests complete after "
+            f"{1000 * self.service_time:g} ms")
+
+    async def close(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    async def publish_message(self, message: Message, routing_key: str = ''):
+        headers = message.headers
+        request_ids = headers.get(REQUEST_IDS_HEADER) or [
+            headers['request_id']]
+        task = asyncio.get_event_loop().create_task(
+            self.complete(request_ids, headers.get(MODEL_HEADER)))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def complete(self, request_ids: List[str], model: Optional[str]):
+        await asyncio.sleep(self.service_time)
+        record = {
+            'status': 'completed',
+            'inference_class': 'Normal',
+            'model': model or 'default',
+            'completed_at': int(time.time() * 1000),
+        }
+
+        pipeline = redis_client.client.pipeline(transaction=False)
+        for request_id in request_ids:
+            key = f"result:{request_id}"
+            pipeline.hset(key, mapping={
+                **record, 'probabilities': json.dumps(PROBABILITIES)})
+            pipeline.expire(key, self.ttl)
+            pipeline.publish(self.channel, json.dumps({
+                'request_id': request_id,
+                **record,
+                'probabilities': PROBABILITIES,
+            }))
+        await pipeline.execute()
+
+
+def create_app() -> FastAPI:
+    """
+    The application of a server process, publishing to a simulated broker.
+    Imported by every process that `uvicorn --workers` starts.
+    """
+    from app.main import app
+
+    broker = SimulatedBroker(float(os.getenv(SERVICE_TIME_ENV, '0.02')))
+    rabbitmq_client.connect = broker.connect
+    rabbitmq_client.close = broker.close
+    rabbitmq_client.publish_message = broker.publish_message
+    return app
+
+
+def serve_fake_redis(settings: RedisSettings):
+    from fakeredis import TcpFakeServer
+
+    class FakeRedisServer(TcpFakeServer):
+        # The listen backlog of socketserver, 5, resets connections when
+        # the pools of several processes connect at once.
+        request_queue_size = 1024
+
+    server = FakeRedisServer(
+        (settings.REDIS_HOST, settings.REDIS_PORT), server_type='redis')
+    # Its connection threads would keep the process from exiting.
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logging.info(
+        f"Serving fakeredis on {settings.REDIS_HOST}:{settings.REDIS_PORT}")
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument(
+        '--processes', type=int, default=1,
+        help='Number of server processes, as WEB_CONCURRENCY.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument(
+        '--service-time', type=float, default=20,
+        help='Milliseconds after which a published request completes.')
+    parser.add_argument(
+        '--fake-redis', action='store_true',
+        help='Serve an in-memory Redis at REDIS_HOST and REDIS_PORT.')
+    options = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if options.fake_redis:
+        serve_fake_redis(RedisSettings())
+
+    # Read by the server processes, which import the application anew.
+    os.environ[SERVICE_TIME_ENV] = str(options.service_time / 1000)
+    uvicorn.run(
+        'benchmarks.stack:create_app', factory=True, host=options.host,
+        port=options.port, workers=options.processes, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,16 @@
+#!/bin/sh
+
+# One server process per core, unless WEB_CONCURRENCY says otherwise.
+# Set it explicitly when the container is limited to fewer cores.
+WEB_CONCURRENCY="${WEB_CONCURRENCY:-$(nproc)}"
+
+# The processes write their metrics to this directory, emptied first so
+# that the metrics of a previous run are not reported again.
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+find "$PROMETHEUS_MULTIPROC_DIR" -name '*.db' -delete
+
+echo "Starting $WEB_CONCURRENCY server processes."
+exec uvicorn app.main:app --host 0.0.0.0 --port 8000 \
+  --workers "$WEB_CONCURRENCY" \
+  --timeout-graceful-shutdown "${GRACEFUL_SHUTDOWN_TIMEOUT:-30}"
@@ -1,10 +1,15 @@
 import io
+import json
+import os
 import uuid
+from unittest.mock import AsyncMock, patch
 
 import pytest
-from app.services import redis_client
+import redis
 from dotenv import load_dotenv
 from fastapi.testclient import TestClient
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import \
+    InMemorySpanExporter
 from PIL import Image
 
 
@@ -17,14 +22,25 @@ def load_env():
 def client():
     from app.main import app
 
-    client = TestClient(app)
-    print("FastAPI client created")
-    return client
+    # Redis is connected by the startup hook, RabbitMQ is left out.
+    with patch('app.services.rabbitmq_client.connect', AsyncMock()), \
+            patch('app.services.rabbitmq_client.close', AsyncMock()):
+        with TestClient(app) as client:
+            print("FastAPI client created")
+            yield client
 
 
 @pytest.fixture
-def image_file():
-    img = Image.new('RGB', (60, 30), color=(73, 109, 137))
+def redis_store():
+    return redis.Redis(
+        host=os.getenv('REDIS_HOST', 'localhost'),
+        port=os.getenv('REDIS_PORT', '6379'),
+    )
+
+
+def random_image() -> io.BytesIO:
+    # Random pixels, so that no test hits the content cache of another.
+    img = Image.frombytes('RGB', (60, 30), os.urandom(60 * 30 * 3))
     data = io.BytesIO()
     img.save(data, 'PNG')
     data.seek(0)
@@ -32,7 +48,49 @@ def image_file():
 
 
 @pytest.fixture
-def completed_request_id():
+def image_file():
+    return random_image()
+
+
+@pytest.fixture
+def image_batch():
+    return [random_image().getvalue() for _ in range(3)]
+
+
+@pytest.fixture
+def store_result(redis_store):
+    def store(request_id: str, **fields):
+        # As written by the API on submission and by the workers.
+        redis_store.hset(f"result:{request_id}", mapping={
+            field: json.dumps(value) if isinstance(value, dict) else value
+            for field, value in fields.items()
+        })
+    return store
+
+
+@pytest.fixture
+def completed_request_id(store_result):
     request_id = str(uuid.uuid4())
-    redis_client.set(request_id, 'Normal')
+    store_result(
+        request_id,
+        status='completed',
+        inference_class='Normal',
+        probabilities={'Normal': 0.9, 'Pneumonia': 0.1},
+        model='default',
+        completed_at=1700000000000,
+    )
     return request_id
+
+
+@pytest.fixture(scope='session')
+def finished_spans():
+    from app.cores import setup_tracing
+
+    # The tracer provider is global, it is set once for the session.
+    exporter = InMemorySpanExporter()
+    provider = setup_tracing('inference-api', 1.0, exporter)
+
+    def spans():
+        provider.force_flush()
+        return exporter.get_finished_spans()
+    return spans
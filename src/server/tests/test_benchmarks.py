@@ -0,0 +1,52 @@
+import asyncio
+import json
+from unittest.mock import patch
+
+import httpx
+
+from benchmarks.load import benchmark
+from benchmarks.report import percentiles, write_report
+from benchmarks.serialization import synthetic_image
+from benchmarks.stack import SimulatedBroker
+
+
+def test_percentiles():
+    assert percentiles([]) == {}
+    assert percentiles(range(1, 101)) == {
+        'mean': 50.5, 'p50': 50.5, 'p95': 95.05, 'p99': 99.01}
+
+
+def test_report_describes_the_run(tmp_path):
+    output = tmp_path / 'report.json'
+
+    write_report({'images_per_s': 10.0}, str(output))
+
+    report = json.loads(output.read_text())
+    assert report['images_per_s'] == 10.0
+    assert set(report['metadata']) == {
+        'commit', 'timestamp', 'python', 'platform', 'cpu_count'}
+
+
+def test_load_benchmark_with_simulated_broker():
+    from app.main import app
+    from app.services import rabbitmq_client
+
+    broker = SimulatedBroker(service_time=0.01)
+    images = [synthetic_image(64, 64, seed=seed) for seed in range(8)]
+
+    async def run():
+        async with app.router.lifespan_context(app):
+            return await benchmark(
+                'http://test/api', images, concurrency=4, wait='5s',
+                timeout=10, transport=httpx.ASGITransport(app=app))
+
+    with patch.object(rabbitmq_client, 'connect', broker.connect), \
+            patch.object(rabbitmq_client, 'close', broker.close), \
+            patch.object(
+                rabbitmq_client, 'publish_message', broker.publish_message):
+        result = asyncio.new_event_loop().run_until_complete(run())
+
+    assert result['requests'] == 8
+    assert result['statuses'] == {'completed': 8}
+    assert set(result['end_to_end_latency_ms']) == {
+        'mean', 'p50', 'p95', 'p99'}
@@ -0,0 +1,29 @@
+import asyncio
+import uuid
+
+from app.services import redis_client
+from app.services.cache import ContentCache
+
+
+def test_release_keeps_the_claim_of_another_request(redis_store):
+    cache = ContentCache(redis_client, ttl=60, model_version='1', enabled=True)
+    digest = str(uuid.uuid4())
+
+    async def run():
+        await redis_client.connect()
+        try:
+            await cache.claim(digest, 'first')
+            # The claim expired and another request took it over.
+            redis_store.set(cache.key(digest), 'second')
+            await cache.release(digest, 'first')
+            released = await cache.claim(digest, 'third')
+            await cache.release(digest, 'second')
+            return released, await cache.claim(digest, 'third')
+        finally:
+            await redis_client.close()
+
+    kept, claimed = asyncio.new_event_loop().run_until_complete(run())
+
+    assert kept == 'second'
+    assert claimed is None
+    redis_store.delete(cache.key(digest))
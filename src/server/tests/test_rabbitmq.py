@@ -0,0 +1,88 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from aio_pika import Message
+from prometheus_client import REGISTRY
+
+from app.services import BrokerUnavailableError, rabbitmq_client
+
+
+def make_channel(publish):
+    channel = MagicMock(is_closed=False)
+    channel.default_exchange.publish = publish
+    return channel
+
+
+def published_count(outcome: str) -> float:
+    return REGISTRY.get_sample_value(
+        'rabbitmq_publish_duration_seconds_count',
+        {'outcome': outcome}) or 0
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(rabbitmq_client, 'connection', MagicMock())
+    monkeypatch.setattr(rabbitmq_client, 'publish_timeout', 0.05)
+    return rabbitmq_client
+
+
+def test_publish_spreads_over_channels(client, monkeypatch):
+    channels = [make_channel(AsyncMock()) for _ in range(2)]
+    monkeypatch.setattr(client, 'channels', channels)
+
+    async def scenario():
+        monkeypatch.setattr(client, 'pending', asyncio.Semaphore(4))
+        for _ in range(4):
+            await client.publish_message(Message(b'image'))
+
+    confirmed = published_count('confirmed')
+    asyncio.run(scenario())
+
+    assert [channel.default_exchange.publish.await_count
+            for channel in channels] == [2, 2]
+    assert published_count('confirmed') == confirmed + 4
+
+
+def test_publish_raises_when_not_confirmed(client, monkeypatch):
+    publish = AsyncMock(side_effect=asyncio.TimeoutError())
+    monkeypatch.setattr(client, 'channels', [make_channel(publish)])
+
+    async def scenario():
+        monkeypatch.setattr(client, 'pending', asyncio.Semaphore(1))
+        with pytest.raises(BrokerUnavailableError):
+            await client.publish_message(Message(b'image'))
+        # The pending slot is released after a failure.
+        assert not client.pending.locked()
+
+    asyncio.run(scenario())
+
+
+def test_publish_raises_when_too_many_pending(client, monkeypatch):
+    publish = AsyncMock()
+    monkeypatch.setattr(client, 'channels', [make_channel(publish)])
+
+    async def scenario():
+        monkeypatch.setattr(client, 'pending', asyncio.Semaphore(0))
+        with pytest.raises(BrokerUnavailableError):
+            await client.publish_message(Message(b'image'))
+
+    asyncio.run(scenario())
+
+    publish.assert_not_awaited()
+
+
+def test_connect_raises_once_retries_run_out(monkeypatch):
+    connect_robust = AsyncMock(side_effect=ConnectionError('refused'))
+    monkeypatch.setattr(
+        'app.services.rabbitmq.connect_robust', connect_robust)
+    monkeypatch.setattr('app.services.rabbitmq.asyncio.sleep', AsyncMock())
+    monkeypatch.setattr(rabbitmq_client, 'connection', None)
+    monkeypatch.setattr(rabbitmq_client, 'retry_attempts', 3)
+    monkeypatch.setattr(rabbitmq_client, 'retry_delay', 5)
+
+    with pytest.raises(ConnectionError):
+        asyncio.new_event_loop().run_until_complete(rabbitmq_client.connect())
+
+    assert connect_robust.await_count == 3
+    assert rabbitmq_client.connection is None
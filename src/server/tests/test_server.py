@@ -1,8 +1,18 @@
+import io
+import json
+import os
+import tarfile
+import threading
 import uuid
+import zipfile
 from unittest.mock import patch
 
-from app.models.enums import Status
+import pytest
 from fastapi import status
+from PIL import Image
+
+from app.cores import strings
+from app.models.enums import Status
 
 
 def test_health(client):
@@ -28,6 +38,332 @@ def test_inference(mock_publish_message, client, image_file):
     mock_publish_message.assert_called_once()
 
 
+@patch('app.services.rabbitmq_client.publish_message')
+def test_inference_forwards_encoded_image(
+    mock_publish_message, client, image_file
+):
+    image_bytes = image_file.getvalue()
+    response = client.post(
+        "/api/inference/requests",
+        files={"image": ("image.png", image_file, "image/png")},
+    )
+    message = mock_publish_message.call_args[0][0]
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert message.body == image_bytes
+    assert message.headers["payload-format"] == "encoded"
+    assert message.headers["request_id"] == response.json()["request_id"]
+
+
+@patch('app.services.rabbitmq_client.publish_message')
+def test_inference_priority_and_deadline(
+    mock_publish_message, client, image_file
+):
+    response = client.post(
+        "/api/inference/requests?priority=high&deadline=30s",
+        files={"image": ("image.png", image_file, "image/png")},
+    )
+    message = mock_publish_message.call_args[0][0]
+    submitted_at = message.headers["x-submitted-at"]
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert message.priority == 2
+    assert message.headers["x-deadline"] - submitted_at in range(
+        29_000, 31_000)
+
+
+@patch('app.services.rabbitmq_client.publish_message')
+def test_inference_routes_to_model(mock_publish_message, client, image_file):
+    responses = [
+        client.post(
+            f"/api/inference/requests{query}",
+            files={"image": ("image.png", image_file.getvalue(), "image/png")},
+        )
+        for query in ("", "?model=candidate", "?model=candidate")
+    ]
+    messages = [call[0][0] for call in mock_publish_message.call_args_list]
+    assert [response.status_code for response in responses] == [
+        status.HTTP_202_ACCEPTED] * 3
+    assert len(messages) == 2
+    assert "x-model" not in messages[0].headers
+    assert messages[1].headers["x-model"] == "candidate"
+    assert responses[2].json()["request_id"] == \
+        responses[1].json()["request_id"]
+
+
+def test_inference_invalid_model(client, image_file):
+    response = client.post(
+        "/api/inference/requests?model=../model",
+        files={"image": ("image.png", image_file, "image/png")},
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+@patch('app.services.rabbitmq_client.publish_message')
+def test_inference_invalid_deadline(mock_publish_message, client, image_file):
+    response = client.post(
+        "/api/inference/requests?deadline=soon",
+        files={"image": ("image.png", image_file, "image/png")},
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    mock_publish_message.assert_not_called()
+
+
+@patch('app.services.rabbitmq_client.publish_message')
+def test_inference_rejects_invalid_image(mock_publish_message, client):
+    response = client.post(
+        "/api/inference/requests",
+        files={"image": ("image.png", b"not an image", "image/png")},
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    mock_publish_message.assert_not_called()
+
+
+@patch('app.services.rabbitmq_client.publish_message')
+def test_inference_rejects_oversized_image(
+    mock_publish_message, client, image_file
+):
+    from app.validators import upload_image_validator
+
+    with patch.object(upload_image_validator, 'max_pixels', 60 * 30 - 1):
+        response = client.post(
+            "/api/inference/requests",
+            files={"image": ("image.png", image_file, "image/png")},
+        )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    mock_publish_message.assert_not_called()
+
+
+def test_inference_broker_unavailable(client, image_file, redis_store):
+    from app.services import BrokerUnavailableError
+
+    image_bytes = image_file.getvalue()
+    url = "/api/inference/requests"
+
+    records = set(redis_store.keys('result:*'))
+    with patch('app.services.rabbitmq_client.publish_message',
+               side_effect=BrokerUnavailableError("timeout")):
+        rejected = client.post(
+            url, files={"image": ("a.png", image_bytes, "image/png")})
+    # No record of the rejected request is left processing.
+    assert set(redis_store.keys('result:*')) == records
+    with patch('app.services.rabbitmq_client.publish_message') as publish:
+        accepted = client.post(
+            url, files={"image": ("a.png", image_bytes, "image/png")})
+
+    assert rejected.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert rejected.headers["retry-after"] == "1"
+    # The image was released from the content cache and is queued again.
+    assert accepted.status_code == status.HTTP_202_ACCEPTED
+    publish.assert_called_once()
+
+
+@patch('app.services.rabbitmq_client.publish_message')
+def test_inference_releases_image_that_cannot_be_serialized(
+    mock_publish_message, client, redis_store
+):
+    from app.serializers import RawImageSerializer
+
+    image = Image.frombytes('RGB', (64, 64), os.urandom(64 * 64 * 3))
+    data = io.BytesIO()
+    image.save(data, 'JPEG')
+    # The header is intact, the pixels are cut off.
+    truncated = data.getvalue()[:len(data.getvalue()) // 2]
+    url = "/api/inference/requests"
+
+    records = set(redis_store.keys('result:*'))
+    with patch('app.api.endpoints.inference.image_serializer',
+               RawImageSerializer()), pytest.raises(OSError):
+        client.post(
+            url, files={"image": ("a.jpg", truncated, "image/jpeg")})
+    # No record of the failed request is left processing.
+    assert set(redis_store.keys('result:*')) == records
+    mock_publish_message.assert_not_called()
+
+    # Its claim was released: the image is sent again, not answered with
+    # the failed request.
+    response = client.post(
+        url, files={"image": ("a.jpg", truncated, "image/jpeg")})
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    mock_publish_message.assert_called_once()
+
+
+@patch('app.services.rabbitmq_client.publish_message')
+def test_inference_reuses_request_of_same_image(
+    mock_publish_message, client, image_file, store_result
+):
+    image_bytes = image_file.getvalue()
+    url = "/api/inference/requests"
+
+    first = client.post(
+        url, files={"image": ("a.png", image_bytes, "image/png")})
+    second = client.post(
+        url, files={"image": ("b.png", image_bytes, "image/png")})
+    store_result(
+        first.json()["request_id"],
+        status='completed', inference_class='Normal')
+    third = client.post(
+        url, files={"image": ("c.png", image_bytes, "image/png")})
+
+    mock_publish_message.assert_called_once()
+    assert second.status_code == status.HTTP_202_ACCEPTED
+    assert second.json()["request_id"] == first.json()["request_id"]
+    assert second.json()["status"] == Status.PROCESSING.value
+    assert third.status_code == status.HTTP_200_OK
+    assert third.json()["request_id"] == first.json()["request_id"]
+    assert third.json()["inference_class"] == "Normal"
+    assert "submitted_at" in third.json()
+
+
+@patch('app.services.rabbitmq_client.publish_message')
+def test_inference_reruns_image_after_model_reload(
+    mock_publish_message, client, image_file, store_result, redis_store
+):
+    image_bytes = image_file.getvalue()
+    url = "/api/inference/requests"
+
+    def submit():
+        return client.post(
+            url, files={"image": ("a.png", image_bytes, "image/png")})
+
+    redis_store.hset('models:revisions', '', 'r1')
+    try:
+        first = submit()
+        store_result(
+            first.json()["request_id"], status='completed',
+            inference_class='Normal', model_version='r1')
+        cached = submit()
+        redis_store.hset('models:revisions', '', 'r2')
+        reloaded = submit()
+        # Inferred by the previous revision while the reload rolled out.
+        store_result(
+            reloaded.json()["request_id"], status='completed',
+            inference_class='Normal', model_version='r1')
+        rolled_out = submit()
+    finally:
+        redis_store.delete('models:revisions')
+
+    assert cached.status_code == status.HTTP_200_OK
+    assert cached.json()["request_id"] == first.json()["request_id"]
+    assert reloaded.status_code == status.HTTP_202_ACCEPTED
+    assert reloaded.json()["request_id"] != first.json()["request_id"]
+    assert rolled_out.status_code == status.HTTP_202_ACCEPTED
+    assert rolled_out.json()["request_id"] not in (
+        first.json()["request_id"], reloaded.json()["request_id"])
+    assert mock_publish_message.call_count == 3
+
+
+@patch('app.services.rabbitmq_client.publish_message')
+def test_inference_batch(mock_publish_message, client, image_batch):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w') as f:
+        f.writestr('study/b.png', image_batch[1])
+        f.writestr('study/notes.txt', b'not an image')
+        f.writestr('__MACOSX/study/._c.png', b'metadata')
+        f.writestr('study/c.png', image_batch[2])
+
+    response = client.post(
+        "/api/inference/batches",
+        files=[
+            ("images", ("a.png", image_batch[0], "image/png")),
+            ("images", ("study.zip", archive.getvalue(), "application/zip")),
+        ],
+    )
+    data = response.json()
+    message = mock_publish_message.call_args[0][0]
+    request_ids = [request["request_id"] for request in data["requests"]]
+
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert data["status"] == Status.PROCESSING.value
+    mock_publish_message.assert_called_once()
+    assert message.headers["batch_id"] == data["batch_id"]
+    assert message.headers["request_ids"] == request_ids
+    assert message.headers["payload-sizes"] == [
+        len(image) for image in image_batch]
+    assert message.body == b''.join(image_batch)
+
+
+@patch('app.services.rabbitmq_client.publish_message')
+def test_inference_batch_skips_tar_members_without_content(
+    mock_publish_message, client, image_batch
+):
+    archive = io.BytesIO()
+    with tarfile.open(fileobj=archive, mode='w:gz') as f:
+        image = tarfile.TarInfo('study/a.png')
+        image.size = len(image_batch[0])
+        f.addfile(image, io.BytesIO(image_batch[0]))
+        link = tarfile.TarInfo('study/link.png')
+        link.type, link.linkname = tarfile.SYMTYPE, 'a.png'
+        f.addfile(link)
+        directory = tarfile.TarInfo('study/dir.png')
+        directory.type = tarfile.DIRTYPE
+        f.addfile(directory)
+
+    response = client.post(
+        "/api/inference/batches",
+        files=[("images", ("study.tgz", archive.getvalue(),
+                           "application/gzip"))],
+    )
+
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert len(response.json()["requests"]) == 1
+    assert mock_publish_message.call_args[0][0].body == image_batch[0]
+
+
+@patch('app.services.rabbitmq_client.publish_message')
+def test_inference_batch_result(
+    mock_publish_message, client, image_batch, store_result, redis_store
+):
+    response = client.post(
+        "/api/inference/batches",
+        files=[
+            ("images", (f"{i}.png", image, "image/png"))
+            for i, image in enumerate(image_batch)
+        ],
+    )
+    batch_id = response.json()["batch_id"]
+    request_ids = [
+        request["request_id"] for request in response.json()["requests"]]
+    url = f"/api/inference/batches/{batch_id}/result"
+
+    store_result(
+        request_ids[0], status='completed', inference_class='Normal')
+    partial = client.get(url).json()
+    store_result(
+        request_ids[1], status='completed', inference_class='Pneumonia')
+    redis_store.delete(f"result:{request_ids[2]}")
+    completed = client.get(url).json()
+
+    assert partial["status"] == Status.PROCESSING.value
+    assert partial["requests"][0]["status"] == Status.COMPLETED.value
+    assert partial["requests"][0]["inference_class"] == "Normal"
+    assert partial["requests"][1]["status"] == Status.PROCESSING.value
+    assert completed["status"] == Status.COMPLETED.value
+    assert [request.get("inference_class")
+            for request in completed["requests"]] \
+        == ['Normal', 'Pneumonia', None]
+    # Expired results are reported as failed.
+    assert completed["requests"][2] == {
+        "status": Status.FAILED.value,
+        "request_id": request_ids[2],
+        "error": strings.RESULT_NOT_FOUND,
+    }
+
+
+@patch('app.services.rabbitmq_client.publish_message')
+def test_inference_batch_invalid_file(mock_publish_message, client):
+    response = client.post(
+        "/api/inference/batches",
+        files=[("images", ("notes.txt", b"text", "text/plain"))],
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    mock_publish_message.assert_not_called()
+
+
+def test_inference_batch_result_not_found(client):
+    batch_id = str(uuid.uuid4())
+    response = client.get(f"/api/inference/batches/{batch_id}/result")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
 def test_inference_result_success(client, completed_request_id):
     # Arrange
     url = f"/api/inference/requests/{completed_request_id}/result"
@@ -36,8 +372,13 @@ def test_inference_result_success(client, completed_request_id):
     data = response.json()
     # Assert
     assert response.status_code == status.HTTP_200_OK
-    assert data["status"] == Status.COMPLETED.value
-    assert data["inference_class"] == 'Normal'
+    assert data == {
+        "status": Status.COMPLETED.value,
+        "inference_class": 'Normal',
+        "probabilities": {'Normal': 0.9, 'Pneumonia': 0.1},
+        "model": 'default',
+        "completed_at": 1700000000000,
+    }
 
 
 def test_inference_result_not_found(client):
@@ -47,3 +388,178 @@ def test_inference_result_not_found(client):
     response = client.get(f"/api/inference/requests/{request_id}/result")
     # Assert
     assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_inference_result_waits_for_completion(
+    client, redis_store, store_result
+):
+    # Arrange
+    request_id = str(uuid.uuid4())
+    store_result(request_id, status='processing', submitted_at=1000)
+    event = json.dumps({
+        'request_id': request_id,
+        'status': 'completed',
+        'inference_class': 'Normal',
+    })
+
+    def complete():
+        store_result(
+            request_id, status='completed', inference_class='Normal')
+        redis_store.publish('inference:results', event)
+
+    timer = threading.Timer(0.5, complete)
+    # Act
+    timer.start()
+    response = client.get(
+        f"/api/inference/requests/{request_id}/result?wait=5s")
+    timer.join()
+    # Assert
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "status": Status.COMPLETED.value,
+        "inference_class": 'Normal',
+        "submitted_at": 1000,
+    }
+
+
+def test_inference_result_wait_timeout(client, store_result):
+    # Arrange
+    request_id = str(uuid.uuid4())
+    store_result(request_id, status='processing', submitted_at=1000)
+    # Act
+    response = client.get(
+        f"/api/inference/requests/{request_id}/result?wait=100ms")
+    # Assert
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "status": Status.PROCESSING.value,
+        "submitted_at": 1000,
+    }
+
+
+@patch('app.services.rabbitmq_client.publish_message')
+def test_inference_records_pending_result(
+    mock_publish_message, client, image_file, redis_store
+):
+    response = client.post(
+        "/api/inference/requests",
+        files={"image": ("a.png", image_file, "image/png")},
+    )
+    key = f"result:{response.json()['request_id']}"
+
+    assert redis_store.hget(key, 'status') == b'processing'
+    assert 0 < redis_store.ttl(key) <= 86400
+
+
+def test_inference_events_not_found(client):
+    request_id = str(uuid.uuid4())
+    response = client.get(f"/api/inference/requests/{request_id}/events")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_inference_result_invalid_wait(client, completed_request_id):
+    # Arrange
+    url = f"/api/inference/requests/{completed_request_id}/result?wait=soon"
+    # Act
+    response = client.get(url)
+    # Assert
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_inference_events(client, completed_request_id):
+    # Arrange
+    url = f"/api/inference/requests/{completed_request_id}/events"
+    # Act
+    response = client.get(url)
+    # Assert
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/event-stream")
+    event, data = response.text.strip().split("\n")
+    assert event == "event: result"
+    assert json.loads(data[len("data: "):])["inference_class"] == 'Normal'
+
+
+def test_inference_result_failed(client, store_result):
+    # Arrange
+    request_id = str(uuid.uuid4())
+    store_result(
+        request_id, status='failed', error="cannot identify image file")
+    # Act
+    response = client.get(f"/api/inference/requests/{request_id}/result")
+    # Assert
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "status": Status.FAILED.value,
+        "error": "cannot identify image file",
+    }
+
+
+@patch('app.services.rabbitmq_client.publish_message')
+def test_inference_reruns_failed_image(
+    mock_publish_message, client, image_file, store_result
+):
+    image_bytes = image_file.getvalue()
+    url = "/api/inference/requests"
+
+    first = client.post(
+        url, files={"image": ("a.png", image_bytes, "image/png")})
+    store_result(first.json()["request_id"], status='failed', error="timeout")
+    second = client.post(
+        url, files={"image": ("a.png", image_bytes, "image/png")})
+
+    assert mock_publish_message.call_count == 2
+    assert second.status_code == status.HTTP_202_ACCEPTED
+    assert second.json()["request_id"] != first.json()["request_id"]
+
+
+def test_metrics(client, completed_request_id):
+    client.get(f"/api/inference/requests/{completed_request_id}/result")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == status.HTTP_200_OK
+    # Requests are labeled with their route, not their path.
+    assert (
+        'http_requests_total{method="GET",'
+        'route="/api/inference/requests/{request_id}/result",status="200"}'
+    ) in response.text
+    assert completed_request_id not in response.text
+
+
+def test_metrics_of_every_process(client, tmp_path, monkeypatch):
+    monkeypatch.setenv('PROMETHEUS_MULTIPROC_DIR', str(tmp_path))
+
+    response = client.get("/metrics")
+
+    # Only the metrics written to the shared directory are reported, none
+    # were in this test.
+    assert response.status_code == status.HTTP_200_OK
+    assert 'http_requests_total' not in response.text
+
+
+@patch('app.services.rabbitmq_client.publish_message')
+def test_inference_trace_is_sent_to_the_workers(
+    mock_publish_message, client, image_file, finished_spans,
+):
+    trace_id = uuid.uuid4().hex
+    response = client.post(
+        "/api/inference/requests",
+        files={"image": ("image.png", image_file, "image/png")},
+        headers={"traceparent": f"00-{trace_id}-{'1' * 16}-01"},
+    )
+    assert response.status_code == status.HTTP_202_ACCEPTED
+
+    spans = {
+        span.name: span for span in finished_spans()
+        if format(span.context.trace_id, '032x') == trace_id
+    }
+    request_span = spans["POST /api/inference/requests"]
+    assert request_span.attributes["request_id"] == \
+        response.json()["request_id"]
+    assert {"upload.read", "cache.claim", "payload.serialize"} <= set(spans)
+
+    # The workers continue the trace from the request span.
+    message = mock_publish_message.call_args[0][0]
+    _, sent_trace_id, parent_id, _ = message.headers["traceparent"].split("-")
+    assert sent_trace_id == trace_id
+    assert parent_id == format(request_span.context.span_id, '016x')
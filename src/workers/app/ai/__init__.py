@@ -1,5 +1,10 @@
-from .models import ModelFactory
+from .models import (ModelFactory, ModelRegistry, Prediction,
+                     SessionProfile, TorchProfile)
 
 __all__ = [
     'ModelFactory',
+    'ModelRegistry',
+    'Prediction',
+    'SessionProfile',
+    'TorchProfile',
 ]
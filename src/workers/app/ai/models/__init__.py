@@ -1,9 +1,26 @@
+from .base import Prediction
 from .factory import ModelFactory
 from .onnx_inference_model import ONNXInferenceModel
-from .torch_inference_model import TorchInferenceModel
+from .registry import ModelRegistry, ModelSpec
+from .session import SessionProfile
+from .torch_profile import TorchProfile
 
 __all__ = [
     'ModelFactory',
+    'ModelRegistry',
+    'ModelSpec',
     'ONNXInferenceModel',
+    'Prediction',
+    'SessionProfile',
     'TorchInferenceModel',
+    'TorchProfile',
 ]
+
+
+def __getattr__(name):
+    # torch, torchvision and timm are only imported by workers that
+    # actually use the PyTorch backend.
+    if name == 'TorchInferenceModel':
+        from .torch_inference_model import TorchInferenceModel
+        return TorchInferenceModel
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,27 +1,88 @@
 from abc import ABC, abstractmethod
+from typing import Dict, List, NamedTuple
 
-from PIL import Image
-from torch.autograd import Variable
+import numpy as np
 
-from .functions import ImageTransform
+from .preprocessing import ImageInput, ImagePreprocessor
+from .utils import map_predictions_to_top_k
+
+
+class Prediction(NamedTuple):
+    """
+    The label of an image and the probability of its most likely classes,
+    along with the name and version of the model that predicted them.
+    """
+
+    label: str
+    probabilities: Dict[str, float]
+    model: str = ''
+    version: str = ''
 
 
 class Model(ABC):
+    def __init__(self, fast_decode: bool = False):
+        self.preprocessor = ImagePreprocessor(fast_decode=fast_decode)
+
+    @abstractmethod
+    def forward(self, x: np.ndarray):
+        raise NotImplementedError()
+
     @abstractmethod
-    def forward(self, x: Variable):
+    def forward_batch(self, x: np.ndarray) -> List[str]:
         raise NotImplementedError()
 
-    def preprocess_image(self, image: Image.Image):
+    @abstractmethod
+    def outputs_batch(self, x: np.ndarray) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: The class probabilities of each input, one row per
+                input.
+        """
+        raise NotImplementedError()
+
+    def predict_batch(
+        self,
+        x: np.ndarray,
+        top_k: int = 3,
+    ) -> List[Prediction]:
+        """
+        Forward pass of the model on a batch of inputs, keeping the
+        probabilities of the most likely classes.
+
+        Args:
+            x (np.ndarray): Input data, one row per image.
+            top_k (int): Number of classes to keep the probability of.
+
+        Returns:
+            List[Prediction]: The prediction of each input, in order.
+        """
+        return [
+            Prediction(label, probabilities)
+            for label, probabilities in map_predictions_to_top_k(
+                self.outputs_batch(x), top_k)
+        ]
+
+    def preprocess_image(self, image: ImageInput):
         """
         Preprocesses an image for model inference.
 
         Args:
-            image (str): The data of the image.
+            image (ImageInput): The encoded or decoded image.
+
+        Returns:
+            np.ndarray: The preprocessed image, as a batch of one.
+        """
+        return self.preprocessor([image])
+
+    def preprocess_batch(self, images: List[ImageInput]):
+        """
+        Preprocesses several images into a single batch.
+
+        Args:
+            images (List[ImageInput]): The images to preprocess, encoded
+                bytes, decoded images or resized and cropped pixel arrays.
 
         Returns:
-            torch.Tensor: The preprocessed image tensor.
+            np.ndarray: The preprocessed batch, one row per image.
         """
-        transform = ImageTransform()
-        image_tensor = transform(image).float()
-        image_tensor = image_tensor.unsqueeze_(0)
-        return Variable(image_tensor)
+        return self.preprocessor(images)
@@ -1,16 +1,37 @@
-from .onnx_inference_model import ONNXInferenceModel
-from .torch_inference_model import TorchInferenceModel
+from typing import Dict, Optional
+
+from .onnx_inference_model import MODEL_PATH, QUANTIZED_VARIANTS, variant_path
+from .session import SessionProfile
+from .torch_profile import CHECKPOINT_PATH, FC_CONFIG_PATH, TorchProfile
 
 
 class ModelFactory:
     @staticmethod
-    def create_model(model_type: str = 'onnx'):
+    def create_model(
+        model_type: str = 'onnx',
+        session_profile: Optional[SessionProfile] = None,
+        share_weights: bool = False,
+        torch_profile: Optional[TorchProfile] = None,
+        **kwargs,
+    ):
         """
         Create an instance of the specified model type.
 
+        The backend module is imported on first use so that a worker
+        serving ONNX models never loads torch.
+
         Args:
-            model_type (str): The type of the model to create.
-                Defaults to 'onnx'.
+            model_type (str): The type of the model to create: 'onnx',
+                'pytorch' or a quantized ONNX variant such as 'onnx-int8'
+                or 'onnx-fp16'. Defaults to 'onnx'.
+            session_profile (Optional[SessionProfile]): ONNX Runtime session
+                tuning, only used by the ONNX model types.
+            share_weights (bool): Map the weights from disk so that the
+                processes running the same model share them, see
+                `SessionProfile` and `TorchInferenceModel`.
+            torch_profile (Optional[TorchProfile]): PyTorch model tuning,
+                only used by the 'pytorch' model type.
+            **kwargs: Keyword arguments passed to the model constructor.
 
         Returns:
             An instance of the specified model type.
@@ -18,9 +39,43 @@ class ModelFactory:
         Raises:
             ValueError: If an invalid model type is provided.
         """
+        if share_weights and model_type != 'pytorch':
+            session_profile = (session_profile or SessionProfile()) \
+                .model_copy(update={'share_weights': True})
+
         if model_type == 'onnx':
-            return ONNXInferenceModel()
+            from .onnx_inference_model import ONNXInferenceModel
+            return ONNXInferenceModel(
+                session_profile=session_profile, **kwargs)
+        elif model_type.startswith('onnx-'):
+            from .onnx_inference_model import ONNXInferenceModel
+            variant = model_type[len('onnx-'):]
+            if variant not in QUANTIZED_VARIANTS:
+                raise ValueError(f"Invalid model type: {model_type}")
+            kwargs.setdefault('model_path', variant_path(MODEL_PATH, variant))
+            return ONNXInferenceModel(
+                session_profile=session_profile, **kwargs)
         elif model_type == 'pytorch':
-            return TorchInferenceModel()
+            from .torch_inference_model import TorchInferenceModel
+            return TorchInferenceModel(
+                mmap_weights=share_weights, profile=torch_profile, **kwargs)
         else:
             raise ValueError(f"Invalid model type: {model_type}")
+
+    @staticmethod
+    def default_paths(model_type: str = 'onnx') -> Dict[str, str]:
+        """
+        The files a model of `model_type` is loaded from when its
+        constructor is given none, by keyword argument.
+        """
+        if model_type == 'onnx':
+            return {'model_path': MODEL_PATH}
+        elif model_type.startswith('onnx-'):
+            return {'model_path': variant_path(
+                MODEL_PATH, model_type[len('onnx-'):])}
+        elif model_type == 'pytorch':
+            return {
+                'checkpoint_path': CHECKPOINT_PATH,
+                'fc_config_path': FC_CONFIG_PATH,
+            }
+        return {}
@@ -29,3 +29,18 @@ class ImageTransform:
 
     def __call__(self, image):
         return self.transformation(image).float()
+
+
+def create_layer(layer_type: str, layer_params: dict):
+    if layer_type == 'Linear':
+        return nn.Linear(**layer_params)
+    elif layer_type == 'BatchNorm2d':
+        return nn.BatchNorm2d(**layer_params)
+    elif layer_type == 'Dropout':
+        return nn.Dropout(**layer_params)
+    elif layer_type == 'Swish':
+        return Swish()
+    elif layer_type == 'Softmax':
+        return nn.Softmax(**layer_params)
+    else:
+        raise ValueError(f'Unsupported layer type: {layer_type}')
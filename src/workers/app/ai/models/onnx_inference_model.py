@@ -1,46 +1,128 @@
-import onnxruntime as ort
-import torch
-from torch.autograd import Variable
+import os
+from typing import List, Optional
+
+import numpy as np
 
 from .base import Model
-from .utils import map_prediction_to_class
+from .session import SessionProfile, create_session
+from .utils import map_prediction_to_class, map_predictions_to_classes
+
+MODEL_PATH = './app/ai/checkpoints/EfficientNet_B0_NS_320.onnx'
+QUANTIZED_VARIANTS = ('int8', 'fp16')
+
+
+def variant_path(model_path: str, variant: str) -> str:
+    """
+    Path of a quantized variant of a model, e.g. `model.int8.onnx`.
+    """
+    stem, extension = os.path.splitext(model_path)
+    return f"{stem}.{variant}{extension}"
 
 
 class ONNXInferenceModel(Model):
     def __init__(
         self,
-        model_path: str = './app/ai/checkpoints/EfficientNet_B0_NS_320.onnx'
+        model_path: str = MODEL_PATH,
+        fast_decode: bool = False,
+        session_profile: Optional[SessionProfile] = None,
     ):
+        super().__init__(fast_decode)
         self.model_path = model_path
-        self.session = ort.InferenceSession(
-            model_path, providers=["CPUExecutionProvider"])
+        self.session_profile = session_profile or SessionProfile()
+        self.session = create_session(model_path, self.session_profile)
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        # Graphs exported with a fixed batch dimension only accept batches
+        # of exactly that size, dynamic ones report a symbolic name instead.
+        self.max_batch_size = model_input.shape[0] \
+            if isinstance(model_input.shape[0], int) else None
+        self.warmup()
+
+    def warmup(self):
+        """
+        Run the model on a blank batch so that the first real request
+        does not pay for memory allocation and kernel initialization.
+        """
+        profile = self.session_profile
+        if profile.warmup_runs <= 0:
+            return
+
+        model_input = self.session.get_inputs()[0]
+        batch_size = self.max_batch_size or profile.warmup_batch_size
+        shape = [batch_size] + [
+            dim if isinstance(dim, int) else 1
+            for dim in model_input.shape[1:]
+        ]
+        x = np.zeros(shape, dtype=np.float32)
+        for _ in range(profile.warmup_runs):
+            self.session.run(None, {self.input_name: x})
 
-    def forward(self, x: Variable):
+    def forward(self, x: np.ndarray):
         """
         Forward pass of the model.
 
         Args:
-            x (Variable): Input data.
+            x (np.ndarray): Input data.
 
         Returns:
             str: Predicted label.
         """
-        input_data = {
-            self.session.get_inputs()[0].name: self.to_numpy(x)
-        }
-        output = self.session.run(None, input_data)
-        label = map_prediction_to_class(torch.Tensor(output[0]))
+        label = map_prediction_to_class(self.run(x))
         return label
 
-    def to_numpy(self, tensor: torch.Tensor):
+    def forward_batch(self, x: np.ndarray) -> List[str]:
+        """
+        Forward pass of the model on a batch of inputs.
+
+        Args:
+            x (np.ndarray): Input data, one row per image.
+
+        Returns:
+            List[str]: Predicted labels, in input order.
+        """
+        return map_predictions_to_classes(self.run(x))
+
+    def outputs_batch(self, x: np.ndarray) -> np.ndarray:
+        return self.run(x)
+
+    def run(self, x: np.ndarray) -> np.ndarray:
+        """
+        Run the session on a batch of any size, splitting it when the graph
+        has a fixed batch dimension. The last chunk is then padded up to
+        that dimension, and the outputs of the padding are dropped.
+
+        Args:
+            x (np.ndarray): Input data, one row per image.
+
+        Returns:
+            np.ndarray: The raw model outputs, one row per image.
+        """
+        input_data = self.to_numpy(x)
+        step = self.max_batch_size or len(input_data)
+        outputs = []
+        for i in range(0, len(input_data), step):
+            chunk = input_data[i:i + step]
+            size = len(chunk)
+            if size < step:
+                padding = np.zeros(
+                    (step - size, *chunk.shape[1:]), dtype=chunk.dtype)
+                chunk = np.concatenate([chunk, padding])
+            outputs.append(
+                self.session.run(None, {self.input_name: chunk})[0][:size])
+        return np.concatenate(outputs)
+
+    def to_numpy(self, tensor):
         """
-        Converts a PyTorch tensor to a NumPy array.
+        Converts a PyTorch tensor to a NumPy array, NumPy arrays are
+        returned as is.
 
         Args:
-            tensor (torch.Tensor): The input PyTorch tensor.
+            tensor (Union[np.ndarray, torch.Tensor]): The input data.
 
         Returns:
             numpy.ndarray: The converted NumPy array.
         """
+        if isinstance(tensor, np.ndarray):
+            return tensor
         return tensor.detach().cpu().numpy() if tensor.requires_grad \
             else tensor.cpu().numpy()
@@ -0,0 +1,251 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from .factory import ModelFactory
+from .utils import read_config
+
+logging.basicConfig(level=logging.INFO)
+
+DEFAULT_MODEL = 'default'
+
+
+class ModelSpec(BaseModel):
+    """
+    A named model of the registry: its type, as accepted by
+    `ModelFactory.create_model`, a free-form version and the keyword
+    arguments of its constructor, e.g. `model_path` or `checkpoint_path`.
+    """
+
+    type: str = 'onnx'
+    version: str = ''
+    kwargs: Dict[str, Any] = {}
+
+    def fingerprint(self) -> Tuple:
+        """
+        Identify what the model is loaded from. It changes when the spec
+        does, and when a checkpoint file of its `kwargs` is replaced.
+        """
+        paths = [
+            value for value in self.kwargs.values()
+            if isinstance(value, str) and os.path.isfile(value)
+        ]
+        return (
+            self.type,
+            self.version,
+            tuple(sorted((key, repr(value))
+                         for key, value in self.kwargs.items())),
+            tuple(os.path.getmtime(path) for path in paths),
+        )
+
+
+# The fingerprint, spec and instance of a loaded model.
+ModelEntry = Tuple[Tuple, ModelSpec, Any]
+
+
+def revision(spec: ModelSpec, fingerprint: Tuple) -> str:
+    """
+    Identify a loaded model in its predictions: its version along with a
+    digest of its fingerprint, so that it changes whenever the model is
+    reloaded from another spec or checkpoint.
+    """
+    digest = hashlib.sha256(repr(fingerprint).encode()).hexdigest()[:8]
+    return f"{spec.version}+{digest}" if spec.version else digest
+
+
+class ModelRegistry:
+    """Named models of a worker process, reloaded in the background.
+
+    The models are listed in a YAML file, mapping names to their spec and
+    naming the model used when a message does not ask for one:
+
+        default: efficientnet
+        models:
+          efficientnet:
+            type: onnx
+            version: b0-ns-320
+            kwargs:
+              model_path: ./app/ai/checkpoints/EfficientNet_B0_NS_320.onnx
+          efficientnet-int8:
+            type: onnx-int8
+
+    Without a file, the registry holds a single `default` model of
+    `model_type`. Every `reload_interval` seconds, `refresh` checks the
+    file and the checkpoints in a background thread. Changed models are
+    loaded and warmed up next to the current ones, then all of them are
+    switched at once: a batch always runs on a complete set of models and
+    never waits for a load. When a model or the default one changed,
+    `on_load` is then called with the name of the default model and the
+    revision of each model.
+    """
+
+    def __init__(
+        self,
+        config_path: Optional[str] = None,
+        model_type: str = 'onnx',
+        model_kwargs: Optional[Dict] = None,
+        reload_interval: float = 10.0,
+        on_load: Optional[Callable[[str, Dict[str, str]], None]] = None,
+    ):
+        self.config_path = config_path
+        self.model_type = model_type
+        self.model_kwargs = model_kwargs or {}
+        self.reload_interval = reload_interval
+        self.on_load = on_load
+        # The default name and the entry of each model, replaced as a
+        # whole so that readers need no lock.
+        self.snapshot: Tuple[str, Dict[str, ModelEntry]] = (DEFAULT_MODEL, {})
+        # The name and load time of the models loaded since the last call
+        # to `pop_load_times`.
+        self.load_times: List[Tuple[str, float]] = []
+        self.checked_at = time.monotonic()
+        self.lock = threading.Lock()
+        self.reloading: Optional[threading.Thread] = None
+
+    def read_specs(self) -> Tuple[str, Dict[str, ModelSpec]]:
+        """
+        Returns:
+            Tuple[str, Dict[str, ModelSpec]]: The name of the default model
+                and the spec of each model.
+
+        Raises:
+            ValueError: If the file is missing or its default model is
+                not one of its models.
+        """
+        if self.config_path is None:
+            return DEFAULT_MODEL, {DEFAULT_MODEL: self.resolve(ModelSpec(
+                type=self.model_type))}
+
+        config = read_config(self.config_path)
+        if config is None:
+            raise ValueError(f"Model registry {self.config_path} not found")
+
+        specs = {
+            name: self.resolve(ModelSpec(**(spec or {})))
+            for name, spec in config.get('models', {}).items()
+        }
+        default = config.get('default', next(iter(specs), None))
+        if default not in specs:
+            raise ValueError(f"Invalid default model: {default}")
+        return default, specs
+
+    def resolve(self, spec: ModelSpec) -> ModelSpec:
+        """
+        Add the files a model is loaded from by default to its spec, so
+        that they are fingerprinted and replacing them reloads the model.
+        """
+        paths = {
+            key: self.model_kwargs.get(key, path)
+            for key, path in ModelFactory.default_paths(spec.type).items()
+        }
+        return spec.model_copy(update={'kwargs': {**paths, **spec.kwargs}})
+
+    def load(self):
+        """
+        Load the models that changed since the last load, keeping the
+        others, and switch to the new set at once.
+        """
+        default, specs = self.read_specs()
+        current_default, current_models = self.snapshot
+        current_revisions = self.revisions()
+        models = {}
+        for name, spec in specs.items():
+            fingerprint = spec.fingerprint()
+            current = current_models.get(name)
+            if current is not None and current[0] == fingerprint:
+                models[name] = current
+                continue
+
+            start = time.perf_counter()
+            model = ModelFactory.create_model(
+                spec.type, **{**self.model_kwargs, **spec.kwargs})
+            seconds = time.perf_counter() - start
+            logging.info(
+                f"Loaded {spec.type} model {name} "
+                f"version {spec.version or '-'} in process {os.getpid()} "
+                f"in {seconds:.1f}s")
+            self.load_times.append((name, seconds))
+            models[name] = (fingerprint, spec, model)
+
+        self.snapshot = (default, models)
+        revisions = self.revisions()
+        changed = (default, revisions) != (current_default, current_revisions)
+        if changed and self.on_load is not None:
+            self.on_load(default, revisions)
+
+    def get(self, name: Optional[str] = None):
+        """
+        Args:
+            name (Optional[str]): The name of the model, the default one
+                when None.
+
+        Returns:
+            Model: The current model of that name.
+
+        Raises:
+            ValueError: If there is no such model.
+        """
+        return self.lookup(name)[2]
+
+    def lookup(
+        self,
+        name: Optional[str] = None,
+    ) -> Tuple[str, str, Any]:
+        """
+        Like `get`, along with the actual name and the revision of the
+        model.
+        """
+        default, models = self.snapshot
+        entry = models.get(name or default)
+        if entry is None:
+            raise ValueError(f"Unknown model: {name}")
+        fingerprint, spec, model = entry
+        return name or default, revision(spec, fingerprint), model
+
+    def versions(self) -> Dict[str, str]:
+        _, models = self.snapshot
+        return {name: spec.version for name, (_, spec, _) in models.items()}
+
+    def revisions(self) -> Dict[str, str]:
+        _, models = self.snapshot
+        return {
+            name: revision(spec, fingerprint)
+            for name, (fingerprint, spec, _) in models.items()
+        }
+
+    def pop_load_times(self) -> List[Tuple[str, float]]:
+        """
+        Returns:
+            List[Tuple[str, float]]: The name and load time, in seconds,
+                of the models loaded since the previous call.
+        """
+        load_times, self.load_times = self.load_times, []
+        return load_times
+
+    def refresh(self):
+        """
+        Start a background reload if the last check is older than
+        `reload_interval` and none is running.
+        """
+        if self.reload_interval <= 0 or \
+                time.monotonic() - self.checked_at < self.reload_interval:
+            return
+
+        with self.lock:
+            if self.reloading is not None and self.reloading.is_alive():
+                return
+            self.checked_at = time.monotonic()
+            self.reloading = threading.Thread(target=self.reload, daemon=True)
+            self.reloading.start()
+
+    def reload(self):
+        try:
+            self.load()
+        except Exception as e:
+            # Keep serving the current models until the next check.
+            logging.error(f"Failed to reload models: {e}")
@@ -0,0 +1,235 @@
+import fcntl
+import glob
+import hashlib
+import logging
+import os
+import uuid
+from contextlib import contextmanager
+from typing import Optional
+
+import onnxruntime as ort
+from pydantic import BaseModel
+
+EXECUTION_MODES = {
+    'sequential': ort.ExecutionMode.ORT_SEQUENTIAL,
+    'parallel': ort.ExecutionMode.ORT_PARALLEL,
+}
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    'disable': ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    'basic': ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    'extended': ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    'all': ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+
+class SessionProfile(BaseModel):
+    """
+    Tuning of an ONNX Runtime inference session.
+
+    Thread counts of 0 let ONNX Runtime pick its own defaults. When
+    `cache_optimized_model` is set, the optimized graph is written next to
+    the model, or to `optimized_model_dir`, on the first start and loaded
+    as is on the following ones. A profile is shared by every model of
+    the registry, so each model gets a graph file of its own.
+
+    With `share_weights`, the cached graph keeps its weights in a separate
+    file that ONNX Runtime maps into memory instead of copying it, and
+    weight prepacking, which would make private copies, is disabled. The
+    processes of a host running the same model then share one copy of
+    its weights through the page cache. It requires the optimized model
+    cache.
+    """
+
+    intra_op_num_threads: int = 0
+    inter_op_num_threads: int = 0
+    execution_mode: str = 'sequential'
+    graph_optimization_level: str = 'all'
+    enable_cpu_mem_arena: bool = True
+    enable_mem_pattern: bool = True
+    cache_optimized_model: bool = True
+    optimized_model_dir: Optional[str] = None
+    warmup_runs: int = 1
+    warmup_batch_size: int = 1
+    share_weights: bool = False
+
+    def session_options(self, optimize: bool = True) -> ort.SessionOptions:
+        """
+        Build the session options of the profile.
+
+        Args:
+            optimize (bool): Whether graph optimizations should run. They
+                are disabled when loading an already optimized graph.
+
+        Returns:
+            ort.SessionOptions: The session options.
+
+        Raises:
+            ValueError: If an invalid execution mode or graph optimization
+                level is configured.
+        """
+        if self.execution_mode not in EXECUTION_MODES:
+            raise ValueError(
+                f"Invalid execution mode: {self.execution_mode}")
+        if self.graph_optimization_level not in GRAPH_OPTIMIZATION_LEVELS:
+            raise ValueError(
+                "Invalid graph optimization level: "
+                f"{self.graph_optimization_level}")
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.intra_op_num_threads
+        options.inter_op_num_threads = self.inter_op_num_threads
+        options.execution_mode = EXECUTION_MODES[self.execution_mode]
+        options.enable_cpu_mem_arena = self.enable_cpu_mem_arena
+        options.enable_mem_pattern = self.enable_mem_pattern
+        options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[
+            self.graph_optimization_level if optimize else 'disable']
+        if self.share_weights:
+            options.add_session_config_entry(
+                'session.disable_prepacking', '1')
+        return options
+
+    def optimized_path(self, model_path: str) -> str:
+        """
+        Path of the cached optimized graph of `model_path`. The
+        optimization level and the ONNX Runtime version are part of the
+        name since the saved graph depends on both. In
+        `optimized_model_dir`, the name also carries a digest of the model
+        path, so that models with the same file name in different
+        directories do not share a graph.
+        """
+        stem, _ = os.path.splitext(model_path)
+        if self.optimized_model_dir:
+            digest = hashlib.sha256(
+                os.path.abspath(model_path).encode()).hexdigest()[:8]
+            stem = os.path.join(
+                self.optimized_model_dir,
+                f"{os.path.basename(stem)}.{digest}")
+        shared = '.shared' if self.share_weights else ''
+        return (
+            f"{stem}.{self.graph_optimization_level}"
+            f".ort-{ort.__version__}{shared}.onnx"
+        )
+
+
+@contextmanager
+def file_lock(path: str, shared: bool = False):
+    """
+    Hold a lock on `path` across the processes of the host, shared or
+    exclusive. The lock is taken on a `.lock` file next to it, in a
+    directory created if needed.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(f"{path}.lock", 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def is_up_to_date(optimized_path: str, model_path: str) -> bool:
+    return os.path.exists(optimized_path) and \
+        os.path.getmtime(optimized_path) >= os.path.getmtime(model_path)
+
+
+def create_session(
+    model_path: str,
+    profile: SessionProfile,
+    providers=("CPUExecutionProvider",),
+) -> ort.InferenceSession:
+    """
+    Create an inference session, reusing the cached optimized graph of the
+    model when it is up to date and writing it otherwise.
+
+    Args:
+        model_path (str): The path of the ONNX model.
+        profile (SessionProfile): The session tuning.
+        providers: The execution providers of the session.
+
+    Returns:
+        ort.InferenceSession: The inference session.
+    """
+    providers = list(providers)
+    if not profile.cache_optimized_model:
+        if profile.share_weights:
+            logging.warning(
+                "Weights are only shared with the optimized model cache")
+        return ort.InferenceSession(
+            model_path, profile.session_options(), providers=providers)
+
+    optimized_path = profile.optimized_path(model_path)
+    try:
+        # Several workers may start at once: the first one builds the
+        # graph while the others wait for it, and none reads it while it
+        # is being replaced.
+        with file_lock(optimized_path, shared=True):
+            if is_up_to_date(optimized_path, model_path):
+                return load_optimized(optimized_path, profile, providers)
+        with file_lock(optimized_path):
+            if is_up_to_date(optimized_path, model_path):
+                return load_optimized(optimized_path, profile, providers)
+            return build_optimized(
+                model_path, optimized_path, profile, providers)
+    except Exception as e:
+        logging.error(f"Failed to cache optimized model: {e}")
+        return ort.InferenceSession(
+            model_path, profile.session_options(), providers=providers)
+
+
+def load_optimized(
+    optimized_path: str,
+    profile: SessionProfile,
+    providers,
+) -> ort.InferenceSession:
+    logging.info(f"Loading optimized model {optimized_path}")
+    return ort.InferenceSession(
+        optimized_path,
+        profile.session_options(optimize=False),
+        providers=providers,
+    )
+
+
+def build_optimized(
+    model_path: str,
+    optimized_path: str,
+    profile: SessionProfile,
+    providers,
+) -> ort.InferenceSession:
+    """
+    Optimize a model, save the graph to `optimized_path` and return the
+    session. The complete graph is moved in place atomically.
+    """
+    options = profile.session_options()
+    temporary_path = f"{optimized_path}.{os.getpid()}.tmp"
+    options.optimized_model_filepath = temporary_path
+    if profile.share_weights:
+        # Weights always go to a new file: sessions of running workers
+        # keep mapping the previous one, which must not change under them.
+        weights_name = \
+            f"{os.path.basename(optimized_path)}.{uuid.uuid4().hex[:8]}.data"
+        options.add_session_config_entry(
+            'session.optimized_model_external_initializers_file_name',
+            weights_name)
+        options.add_session_config_entry(
+            'session.optimized_model_external_initializers_min_size_in_bytes',
+            '1024')
+
+    try:
+        session = ort.InferenceSession(
+            model_path, options, providers=providers)
+        os.replace(temporary_path, optimized_path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+    logging.info(f"Saved optimized model to {optimized_path}")
+
+    if not profile.share_weights:
+        return session
+
+    for path in glob.glob(f"{optimized_path}.*.data"):
+        if os.path.basename(path) != weights_name:
+            os.remove(path)
+    # This session holds private copies of the weights, the one loaded
+    # from the saved graph maps them.
+    return load_optimized(optimized_path, profile, providers)
@@ -1,29 +1,51 @@
+import logging
 from collections import OrderedDict
+from contextlib import nullcontext
+from typing import List, Optional
 
+import numpy as np
 import timm
 import torch
 from torch import nn
-from torch.autograd import Variable
 
 from .base import Model
-from .utils import create_layer, map_prediction_to_class, read_config
+from .functions import create_layer
+from .torch_profile import (CHECKPOINT_PATH, FC_CONFIG_PATH, JIT_MODES,
+                            TorchProfile)
+from .utils import (map_prediction_to_class, map_predictions_to_classes,
+                    read_config)
 
 
 class TorchInferenceModel(nn.Module, Model):
+    """
+    EfficientNet classifier served with PyTorch.
+
+    The architecture is built without its ImageNet weights, which the
+    checkpoint replaces anyway, so that loading needs no network access.
+    See `TorchProfile` for the loading and inference options.
+    """
+
     def __init__(
         self,
         model_name: str = 'efficientnet_b0',
-        pretrained: bool = True,
+        pretrained: bool = False,
         drop_rate: float = 0.2,
-        fc_config_path: str = './app/ai/configs/fully_connected.yaml',
-        checkpoint_path: str = (
-            './app/ai/checkpoints/EfficientNet_B0_NS_320.pth'
-        )
+        fc_config_path: str = FC_CONFIG_PATH,
+        checkpoint_path: str = CHECKPOINT_PATH,
+        fast_decode: bool = False,
+        mmap_weights: bool = False,
+        profile: Optional[TorchProfile] = None,
     ):
-        super().__init__()
+        nn.Module.__init__(self)
+        Model.__init__(self, fast_decode)
+        self.mmap_weights = mmap_weights
+        self.profile = profile or TorchProfile()
+        self.channels_last = False
 
         self.build_model(
             model_name, pretrained, drop_rate, fc_config_path, checkpoint_path)
+        self.optimize()
+        self.warmup()
 
     def build_model(
         self,
@@ -47,12 +69,19 @@ class TorchInferenceModel(nn.Module, Model):
         Returns:
             torch.nn.Module: The built model.
         """
-        self.model = timm.create_model(
-            model_name, pretrained=pretrained, drop_rate=drop_rate)
+        meta = self.profile.meta_init and not pretrained
+
+        # On the meta device, layers get no storage and skip their random
+        # initialization: the checkpoint tensors are assigned instead.
+        with torch.device('meta') if meta else nullcontext():
+            self.model = timm.create_model(
+                model_name, pretrained=pretrained, drop_rate=drop_rate)
 
-        self.model.fc = self.build_fully_connected_layers(fc_config_path)
+            self.model.fc = self.build_fully_connected_layers(fc_config_path)
 
-        self.load_checkpoint(checkpoint_path)
+        self.load_checkpoint(checkpoint_path, assign=meta)
+        # Batched inference must not mix statistics across images.
+        self.model.eval()
 
     def build_fully_connected_layers(self, config_path: str):
         """
@@ -84,30 +113,113 @@ class TorchInferenceModel(nn.Module, Model):
         fc = nn.Sequential(layers)
         return fc
 
-    def load_checkpoint(self, checkpoint_path: str):
+    def load_checkpoint(self, checkpoint_path: str, assign: bool = False):
         """
         Loads a checkpoint file and updates the model's state dictionary.
 
+        With `mmap_weights`, the checkpoint is mapped into memory and its
+        tensors become the parameters of the model instead of being copied
+        into them. Processes loading the same checkpoint then share its
+        pages as long as the weights are only read.
+
         Args:
             checkpoint_path (str): The path to the checkpoint file.
+            assign (bool): Make the checkpoint tensors the parameters of
+                the model, required when it was built on the meta device.
 
         Returns:
             None
         """
         checkpoint = torch.load(
-            checkpoint_path, map_location=torch.device('cpu'))
-        self.model.load_state_dict(checkpoint['model_state_dict'])
+            checkpoint_path,
+            map_location=torch.device('cpu'),
+            mmap=self.mmap_weights,
+        )
+        self.model.load_state_dict(
+            checkpoint['model_state_dict'],
+            assign=self.mmap_weights or assign,
+        )
 
-    def forward(self, x: Variable):
+    def optimize(self):
+        """
+        Apply the memory format and compilation options of the profile.
+        """
+        if self.profile.jit not in JIT_MODES:
+            raise ValueError(f"Invalid JIT mode: {self.profile.jit}")
+
+        if self.profile.channels_last and self.mmap_weights:
+            # Converting the weights would copy them out of the mapping.
+            logging.warning("Channels last is disabled with mapped weights")
+        elif self.profile.channels_last:
+            self.model = self.model.to(memory_format=torch.channels_last)
+            self.channels_last = True
+
+        if self.profile.jit == 'trace':
+            example = self.to_tensor(np.zeros((1, 3, 224, 224), np.float32))
+            with torch.no_grad():
+                traced = torch.jit.trace(self.model, example)
+            # Freezing inlines the weights as constants.
+            self.model = torch.jit.freeze(traced)
+        elif self.profile.jit == 'compile':
+            self.model = torch.compile(self.model)
+
+    def warmup(self):
+        """
+        Run the model on blank batches so that the first real request
+        does not pay for allocations, nor for compilation with `jit`.
+        """
+        x = np.zeros(
+            (self.profile.warmup_batch_size, 3, 224, 224), np.float32)
+        for _ in range(self.profile.warmup_runs):
+            self.forward_batch(x)
+
+    def forward(self, x: np.ndarray):
         """
         Forward pass of the model.
 
         Args:
-            x (Variable): Input data.
+            x (np.ndarray): Input data.
 
         Returns:
             str: Predicted label.
         """
-        outputs = self.model(x)
-        label = map_prediction_to_class(outputs)
+        # Gradients are never needed, inference mode also skips version
+        # counting.
+        with torch.inference_mode():
+            outputs = self.model(self.to_tensor(x))
+        label = map_prediction_to_class(outputs.numpy())
         return label
+
+    def forward_batch(self, x: np.ndarray) -> List[str]:
+        """
+        Forward pass of the model on a batch of inputs.
+
+        Args:
+            x (np.ndarray): Input data, one row per image.
+
+        Returns:
+            List[str]: Predicted labels, in input order.
+        """
+        return map_predictions_to_classes(self.outputs_batch(x))
+
+    def outputs_batch(self, x: np.ndarray) -> np.ndarray:
+        with torch.inference_mode():
+            outputs = self.model(self.to_tensor(x))
+        return outputs.numpy()
+
+    def to_tensor(self, x):
+        """
+        Converts a NumPy array to a PyTorch tensor, in the memory format
+        of the model.
+
+        Args:
+            x (Union[np.ndarray, torch.Tensor]): The input data.
+
+        Returns:
+            torch.Tensor: The input as a tensor.
+        """
+        if isinstance(x, np.ndarray):
+            x = torch.from_numpy(x)
+        if self.channels_last:
+            x = x.contiguous(memory_format=torch.channels_last)
+        return x
@@ -0,0 +1,26 @@
+from pydantic import BaseModel
+
+JIT_MODES = ('none', 'trace', 'compile')
+# The files the PyTorch model is loaded from by default, known without
+# importing torch.
+CHECKPOINT_PATH = './app/ai/checkpoints/EfficientNet_B0_NS_320.pth'
+FC_CONFIG_PATH = './app/ai/configs/fully_connected.yaml'
+
+
+class TorchProfile(BaseModel):
+    """
+    Tuning of the PyTorch model.
+
+    With `meta_init`, the architecture is built on the meta device,
+    without allocating or initializing weights, and the checkpoint tensors
+    are assigned to it. `channels_last` stores activations and convolution
+    weights in NHWC order, which the CPU kernels run faster. `jit` traces
+    and freezes the model with TorchScript, or compiles it with
+    `torch.compile`.
+    """
+
+    meta_init: bool = True
+    channels_last: bool = True
+    jit: str = 'none'
+    warmup_runs: int = 1
+    warmup_batch_size: int = 1
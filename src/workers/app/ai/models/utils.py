@@ -1,7 +1,7 @@
-import yaml
-from torch import Tensor, nn
+from typing import Dict, List, Tuple
 
-from .functions import Swish
+import numpy as np
+import yaml
 
 class_mapping = {
     0: "Normal",
@@ -21,21 +21,36 @@ def read_config(config_path: str):
     return config
 
 
-def create_layer(layer_type: str, layer_params: dict):
-    if layer_type == 'Linear':
-        return nn.Linear(**layer_params)
-    elif layer_type == 'BatchNorm2d':
-        return nn.BatchNorm2d(**layer_params)
-    elif layer_type == 'Dropout':
-        return nn.Dropout(**layer_params)
-    elif layer_type == 'Swish':
-        return Swish()
-    elif layer_type == 'Softmax':
-        return nn.Softmax(**layer_params)
-    else:
-        raise ValueError(f'Unsupported layer type: {layer_type}')
+def map_prediction_to_class(outputs: np.ndarray):
+    prediction = int(np.argmax(outputs, axis=1)[0])
+    return class_mapping[prediction]
 
 
-def map_prediction_to_class(outputs: Tensor):
-    prediction = outputs.max(1)[1].item()
-    return class_mapping[prediction]
+def map_predictions_to_classes(outputs: np.ndarray):
+    predictions = np.argmax(outputs, axis=1).tolist()
+    return [class_mapping[prediction] for prediction in predictions]
+
+
+def map_predictions_to_top_k(
+    outputs: np.ndarray,
+    k: int,
+) -> List[Tuple[str, Dict[str, float]]]:
+    """
+    Map model outputs, class probabilities since the model ends with a
+    softmax, to labels.
+
+    Returns:
+        List[Tuple[str, Dict[str, float]]]: The predicted label of each
+            row and the probability of its `k` most likely classes.
+    """
+    top_k = np.argsort(-outputs, axis=1)[:, :max(k, 1)]
+    return [
+        (
+            class_mapping[int(classes[0])],
+            {
+                class_mapping[int(i)]: round(float(probabilities[i]), 4)
+                for i in classes
+            },
+        )
+        for probabilities, classes in zip(outputs, top_k)
+    ]
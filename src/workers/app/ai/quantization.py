@@ -0,0 +1,333 @@
+"""
+Build quantized variants of the ONNX model and compare them with it.
+
+Build the INT8 and FP16 variants next to the FP32 model, calibrating the
+INT8 one on sample images:
+
+    python -m app.ai.quantization build --calibration-dir ./samples
+
+Report the accuracy delta of the variants on a held-out set. Images stored
+in sub-directories named after a class (`Normal`, `Pneumonia`,
+`Tuberculosis`) are scored against that label:
+
+    python -m app.ai.quantization report --eval-dir ./held_out
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from .models.onnx_inference_model import (MODEL_PATH, QUANTIZED_VARIANTS,
+                                          ONNXInferenceModel, variant_path)
+from .models.preprocessing import ImageInput, ImagePreprocessor
+from .models.session import SessionProfile
+from .models.utils import class_mapping
+
+logging.basicConfig(level=logging.INFO)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff')
+
+
+def list_images(directory: str, limit: Optional[int] = None) -> List[str]:
+    """
+    List the images of a directory and its sub-directories.
+
+    Args:
+        directory (str): The directory to search.
+        limit (Optional[int]): Maximum number of images to return.
+
+    Returns:
+        List[str]: The image paths, sorted.
+    """
+    paths = sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(directory)
+        for name in names
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    return paths[:limit] if limit else paths
+
+
+def load_batches(
+    image_paths: Sequence[str],
+    batch_size: int,
+) -> Iterator[np.ndarray]:
+    preprocessor = ImagePreprocessor()
+    for i in range(0, len(image_paths), batch_size):
+        images: List[ImageInput] = []
+        for path in image_paths[i:i + batch_size]:
+            with open(path, 'rb') as f:
+                images.append(f.read())
+        yield preprocessor(images)
+
+
+def create_calibration_reader(
+    image_paths: Sequence[str],
+    input_name: str,
+    batch_size: int = 8,
+):
+    from onnxruntime.quantization import CalibrationDataReader
+
+    class ImageCalibrationDataReader(CalibrationDataReader):
+        def __init__(self):
+            self.batches = load_batches(image_paths, batch_size)
+
+        def get_next(self):
+            batch = next(self.batches, None)
+            return None if batch is None else {input_name: batch}
+
+    return ImageCalibrationDataReader()
+
+
+def quantize_int8(
+    model_path: str,
+    output_path: str,
+    calibration_images: Sequence[str],
+    per_channel: bool = True,
+):
+    """
+    Quantize a model to INT8. Weights and activations are quantized
+    statically when calibration images are given, only the weights of
+    MatMul/Gemm nodes are quantized dynamically otherwise.
+
+    Args:
+        model_path (str): The FP32 model.
+        output_path (str): Where the INT8 model is written.
+        calibration_images (Sequence[str]): Images used to calibrate the
+            activation ranges.
+        per_channel (bool): Quantize weights per output channel.
+    """
+    import onnxruntime as ort
+    from onnxruntime.quantization import (CalibrationMethod, QuantFormat,
+                                          QuantType, quant_pre_process,
+                                          quantize_dynamic, quantize_static)
+
+    if not calibration_images:
+        logging.warning(
+            "No calibration images, falling back to dynamic quantization")
+        quantize_dynamic(model_path, output_path, weight_type=QuantType.QInt8)
+        return
+
+    input_name = ort.InferenceSession(
+        model_path, providers=["CPUExecutionProvider"]
+    ).get_inputs()[0].name
+
+    with tempfile.TemporaryDirectory() as directory:
+        preprocessed_path = os.path.join(directory, 'preprocessed.onnx')
+        quant_pre_process(model_path, preprocessed_path)
+        quantize_static(
+            preprocessed_path,
+            output_path,
+            create_calibration_reader(calibration_images, input_name),
+            quant_format=QuantFormat.QDQ,
+            per_channel=per_channel,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            calibrate_method=CalibrationMethod.MinMax,
+        )
+
+
+def convert_fp16(model_path: str, output_path: str):
+    """
+    Convert a model to FP16, keeping FP32 inputs and outputs so that it is
+    a drop-in replacement.
+
+    Args:
+        model_path (str): The FP32 model.
+        output_path (str): Where the FP16 model is written.
+    """
+    import onnx
+    from onnxruntime.transformers.float16 import convert_float_to_float16
+
+    model = convert_float_to_float16(onnx.load(model_path), keep_io_types=True)
+    onnx.save(model, output_path)
+
+
+def build_variants(
+    model_path: str = MODEL_PATH,
+    variants: Sequence[str] = QUANTIZED_VARIANTS,
+    calibration_dir: Optional[str] = None,
+    calibration_limit: Optional[int] = 200,
+) -> Dict[str, str]:
+    """
+    Build quantized variants of a model.
+
+    Args:
+        model_path (str): The FP32 model.
+        variants (Sequence[str]): The variants to build.
+        calibration_dir (Optional[str]): Sample images calibrating INT8.
+        calibration_limit (Optional[int]): Maximum number of calibration
+            images.
+
+    Returns:
+        Dict[str, str]: The path of each built variant.
+
+    Raises:
+        ValueError: If an invalid variant is requested.
+    """
+    calibration_images = list_images(calibration_dir, calibration_limit) \
+        if calibration_dir else []
+    paths = {}
+
+    for variant in variants:
+        output_path = variant_path(model_path, variant)
+        if variant == 'int8':
+            quantize_int8(model_path, output_path, calibration_images)
+        elif variant == 'fp16':
+            convert_fp16(model_path, output_path)
+        else:
+            raise ValueError(f"Invalid variant: {variant}")
+        logging.info(f"Built {variant} variant {output_path}")
+        paths[variant] = output_path
+
+    return paths
+
+
+def evaluate(
+    model: ONNXInferenceModel,
+    image_paths: Sequence[str],
+    batch_size: int,
+) -> Dict:
+    probabilities, elapsed = [], 0.0
+    for batch in load_batches(image_paths, batch_size):
+        start = time.perf_counter()
+        outputs = model.run(batch)
+        elapsed += time.perf_counter() - start
+        # The model ends with a softmax, its outputs are probabilities.
+        probabilities.append(outputs)
+
+    probabilities = np.concatenate(probabilities)
+    return {
+        'probabilities': probabilities,
+        'predictions': np.argmax(probabilities, axis=1),
+        'latency_ms_per_image': 1000 * elapsed / len(image_paths),
+    }
+
+
+def accuracy(predictions: np.ndarray, labels: List[Optional[int]]):
+    scored = [
+        prediction == label
+        for prediction, label in zip(predictions, labels)
+        if label is not None
+    ]
+    return float(np.mean(scored)) if scored else None
+
+
+def accuracy_report(
+    eval_dir: str,
+    model_path: str = MODEL_PATH,
+    variants: Sequence[str] = QUANTIZED_VARIANTS,
+    batch_size: int = 16,
+) -> Dict:
+    """
+    Compare quantized variants with the FP32 model on a held-out set.
+
+    Args:
+        eval_dir (str): The held-out images.
+        model_path (str): The FP32 model.
+        variants (Sequence[str]): The variants to compare.
+        batch_size (int): Images per forward pass.
+
+    Returns:
+        Dict: Accuracy (when labels are known), agreement with the FP32
+            predictions, probability deltas, latency and size of each
+            variant.
+    """
+    image_paths = list_images(eval_dir)
+    if not image_paths:
+        raise ValueError(f"No images found in {eval_dir}")
+
+    class_ids = {name: class_id for class_id, name in class_mapping.items()}
+    labels = [
+        class_ids.get(os.path.basename(os.path.dirname(path)))
+        for path in image_paths
+    ]
+    profile = SessionProfile(cache_optimized_model=False)
+
+    reference = evaluate(
+        ONNXInferenceModel(model_path, session_profile=profile),
+        image_paths, batch_size)
+    reference_accuracy = accuracy(reference['predictions'], labels)
+    report = {
+        'images': len(image_paths),
+        'labelled_images': sum(label is not None for label in labels),
+        'fp32': {
+            'accuracy': reference_accuracy,
+            'latency_ms_per_image': reference['latency_ms_per_image'],
+            'size_bytes': os.path.getsize(model_path),
+        },
+    }
+
+    for variant in variants:
+        path = variant_path(model_path, variant)
+        result = evaluate(
+            ONNXInferenceModel(path, session_profile=profile),
+            image_paths, batch_size)
+        variant_accuracy = accuracy(result['predictions'], labels)
+        delta = np.abs(result['probabilities'] - reference['probabilities'])
+        report[variant] = {
+            'accuracy': variant_accuracy,
+            'accuracy_delta': None if variant_accuracy is None
+            else variant_accuracy - reference_accuracy,
+            'agreement': float(np.mean(
+                result['predictions'] == reference['predictions'])),
+            'max_probability_delta': float(delta.max()),
+            'mean_probability_delta': float(delta.mean()),
+            'latency_ms_per_image': result['latency_ms_per_image'],
+            'speedup': reference['latency_ms_per_image']
+            / result['latency_ms_per_image'],
+            'size_bytes': os.path.getsize(path),
+        }
+
+    return report
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--model-path', default=MODEL_PATH)
+    common.add_argument(
+        '--variants', nargs='+', default=list(QUANTIZED_VARIANTS),
+        choices=QUANTIZED_VARIANTS)
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = commands.add_parser(
+        'build', parents=[common], help='Build quantized variants.')
+    build_parser.add_argument('--calibration-dir')
+    build_parser.add_argument('--calibration-limit', type=int, default=200)
+
+    report_parser = commands.add_parser(
+        'report', parents=[common],
+        help='Report the accuracy delta against FP32.')
+    report_parser.add_argument('--eval-dir', required=True)
+    report_parser.add_argument('--batch-size', type=int, default=16)
+    report_parser.add_argument(
+        '--output', help='Write the report to this file.')
+
+    options = parser.parse_args(argv)
+
+    if options.command == 'build':
+        build_variants(
+            options.model_path, options.variants,
+            options.calibration_dir, options.calibration_limit)
+        return
+
+    result = json.dumps(
+        accuracy_report(
+            options.eval_dir, options.model_path, options.variants,
+            options.batch_size),
+        indent=2)
+    if options.output:
+        with open(options.output, 'w') as f:
+            f.write(result)
+    print(result)
+
+
+if __name__ == '__main__':
+    main()
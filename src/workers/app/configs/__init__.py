@@ -0,0 +1,3 @@
+from .config import Settings
+
+__all__ = ["Settings"]
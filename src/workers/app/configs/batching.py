@@ -0,0 +1,7 @@
+from pydantic_settings import BaseSettings
+
+
+class BatchingSettings(BaseSettings):
+
+    BATCH_SIZE: int = 16
+    BATCH_TIMEOUT_MS: int = 10
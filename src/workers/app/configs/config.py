@@ -0,0 +1,36 @@
+from .batching import BatchingSettings
+from .consumer import ConsumerSettings
+from .executor import ExecutorSettings
+from .metrics import MetricsSettings
+from .onnx import ONNXSettings
+from .preprocessing import PreprocessingSettings
+from .pytorch import TorchSettings
+from .rabbitmq import RabbitMQSettings
+from .redis import RedisSettings
+from .registry import RegistrySettings
+from .results import ResultSettings
+from .retry import RetrySettings
+from .scheduling import SchedulingSettings
+from .tracing import TracingSettings
+
+
+class Settings(
+    RabbitMQSettings,
+    RedisSettings,
+    BatchingSettings,
+    ExecutorSettings,
+    PreprocessingSettings,
+    ONNXSettings,
+    TorchSettings,
+    ConsumerSettings,
+    RetrySettings,
+    SchedulingSettings,
+    RegistrySettings,
+    MetricsSettings,
+    TracingSettings,
+    ResultSettings,
+):
+
+    class Config:
+        case_sensitive = True
+        env_file = ".env"
@@ -0,0 +1,11 @@
+from typing import Optional
+
+from pydantic_settings import BaseSettings
+
+
+class ConsumerSettings(BaseSettings):
+
+    PREFETCH_COUNT: Optional[int] = None
+    MAX_RSS_MB: Optional[int] = None
+    RSS_RESUME_RATIO: float = 0.8
+    FLOW_CONTROL_INTERVAL: float = 1.0
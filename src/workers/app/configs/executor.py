@@ -0,0 +1,11 @@
+from typing import Optional
+
+from pydantic_settings import BaseSettings
+
+
+class ExecutorSettings(BaseSettings):
+
+    MODEL_TYPE: str = 'onnx'
+    EXECUTOR_BACKEND: str = 'thread'
+    EXECUTOR_WORKERS: Optional[int] = None
+    MODEL_SHARE_WEIGHTS: bool = False
@@ -0,0 +1,6 @@
+from pydantic_settings import BaseSettings
+
+
+class MetricsSettings(BaseSettings):
+
+    METRICS_PORT: int = 9100
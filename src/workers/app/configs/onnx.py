@@ -0,0 +1,16 @@
+from typing import Optional
+
+from pydantic_settings import BaseSettings
+
+
+class ONNXSettings(BaseSettings):
+
+    ONNX_INTRA_OP_THREADS: int = 0
+    ONNX_INTER_OP_THREADS: int = 0
+    ONNX_EXECUTION_MODE: str = 'sequential'
+    ONNX_GRAPH_OPTIMIZATION_LEVEL: str = 'all'
+    ONNX_ENABLE_CPU_MEM_ARENA: bool = True
+    ONNX_ENABLE_MEM_PATTERN: bool = True
+    ONNX_CACHE_OPTIMIZED_MODEL: bool = True
+    ONNX_OPTIMIZED_MODEL_DIR: Optional[str] = None
+    ONNX_WARMUP_RUNS: int = 1
@@ -0,0 +1,6 @@
+from pydantic_settings import BaseSettings
+
+
+class PreprocessingSettings(BaseSettings):
+
+    PREPROCESS_FAST_DECODE: bool = False
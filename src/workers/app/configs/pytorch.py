@@ -0,0 +1,9 @@
+from pydantic_settings import BaseSettings
+
+
+class TorchSettings(BaseSettings):
+
+    TORCH_META_INIT: bool = True
+    TORCH_CHANNELS_LAST: bool = True
+    TORCH_JIT: str = 'none'
+    TORCH_WARMUP_RUNS: int = 1
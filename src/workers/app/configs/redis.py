@@ -0,0 +1,8 @@
+from pydantic_settings import BaseSettings
+
+
+class RedisSettings(BaseSettings):
+
+    REDIS_HOST: str = "localhost"
+    REDIS_PORT: int = 6379
+    REDIS_RESULT_CHANNEL: str = 'inference:results'
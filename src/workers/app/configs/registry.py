@@ -0,0 +1,9 @@
+from typing import Optional
+
+from pydantic_settings import BaseSettings
+
+
+class RegistrySettings(BaseSettings):
+
+    MODEL_REGISTRY_PATH: Optional[str] = None
+    MODEL_RELOAD_INTERVAL: float = 10.0
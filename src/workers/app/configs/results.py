@@ -0,0 +1,7 @@
+from pydantic_settings import BaseSettings
+
+
+class ResultSettings(BaseSettings):
+
+    RESULT_TTL: int = 24 * 60 * 60
+    RESULT_TOP_K: int = 3
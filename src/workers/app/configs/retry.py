@@ -0,0 +1,8 @@
+from typing import List
+
+from pydantic_settings import BaseSettings
+
+
+class RetrySettings(BaseSettings):
+
+    RETRY_DELAYS: List[float] = [2, 8, 32, 128, 512]
@@ -0,0 +1,7 @@
+from pydantic_settings import BaseSettings
+
+
+class SchedulingSettings(BaseSettings):
+
+    QUEUE_MAX_PRIORITY: int = 2
+    LANE_STATS_INTERVAL: float = 60.0
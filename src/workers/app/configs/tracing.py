@@ -0,0 +1,7 @@
+from pydantic_settings import BaseSettings
+
+
+class TracingSettings(BaseSettings):
+
+    TRACING_EXPORTER: str = 'none'
+    TRACING_SAMPLE_RATIO: float = 0.01
@@ -1,62 +1,508 @@
 import asyncio
 import logging
-import pickle
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Tuple, Union
 
-from ai import ModelFactory
-from aio_pika import IncomingMessage, Message
-from services import rabbitmq_client, redis_client
+from ai import Prediction, SessionProfile, TorchProfile
+from aio_pika import IncomingMessage
+from configs import Settings
+from PIL import UnidentifiedImageError
+from prometheus_client import start_http_server
+from serializers import (REQUEST_IDS_HEADER, frame_batch, is_batch,
+                         split_batch)
+from services import (BatchTrace, DeadlineExceeded, FlowControlledConsumer,
+                      InferenceExecutor, LaneStats, MicroBatcher,
+                      ResultWriter, RetryScheduler, completed_record,
+                      create_exporter, failed_record, is_expired, lane_of,
+                      process_rss, publish_revisions, rabbitmq_client,
+                      record_queue_wait, redis_client, setup_tracing)
 
 logging.basicConfig(level=logging.INFO)
-model = ModelFactory.create_model()
-MAX_RETRY = 5
+settings = Settings()
+QUEUE_NAME = "pgdb"
+
+concurrency = InferenceExecutor.concurrency_of(
+    settings.EXECUTOR_BACKEND, settings.EXECUTOR_WORKERS)
+model_kwargs = {
+    'fast_decode': settings.PREPROCESS_FAST_DECODE,
+    'share_weights': settings.MODEL_SHARE_WEIGHTS,
+    'session_profile': SessionProfile(
+        # Split the cores between the executor workers instead of letting
+        # every session spawn one thread per core.
+        intra_op_num_threads=settings.ONNX_INTRA_OP_THREADS or max(
+            1, (os.cpu_count() or 1) // concurrency),
+        inter_op_num_threads=settings.ONNX_INTER_OP_THREADS,
+        execution_mode=settings.ONNX_EXECUTION_MODE,
+        graph_optimization_level=settings.ONNX_GRAPH_OPTIMIZATION_LEVEL,
+        enable_cpu_mem_arena=settings.ONNX_ENABLE_CPU_MEM_ARENA,
+        enable_mem_pattern=settings.ONNX_ENABLE_MEM_PATTERN,
+        cache_optimized_model=settings.ONNX_CACHE_OPTIMIZED_MODEL,
+        optimized_model_dir=settings.ONNX_OPTIMIZED_MODEL_DIR,
+        warmup_runs=settings.ONNX_WARMUP_RUNS,
+        warmup_batch_size=settings.BATCH_SIZE,
+    ),
+    'torch_profile': TorchProfile(
+        meta_init=settings.TORCH_META_INIT,
+        channels_last=settings.TORCH_CHANNELS_LAST,
+        jit=settings.TORCH_JIT,
+        warmup_runs=settings.TORCH_WARMUP_RUNS,
+        warmup_batch_size=settings.BATCH_SIZE,
+    ),
+}
+executor = InferenceExecutor(
+    backend=settings.EXECUTOR_BACKEND,
+    max_workers=concurrency,
+    model_type=settings.MODEL_TYPE,
+    model_kwargs=model_kwargs,
+    registry_path=settings.MODEL_REGISTRY_PATH,
+    reload_interval=settings.MODEL_RELOAD_INTERVAL,
+    top_k=settings.RESULT_TOP_K,
+    on_load=publish_revisions,
+)
+result_writer = ResultWriter(
+    redis_client, settings.REDIS_RESULT_CHANNEL, settings.RESULT_TTL)
+
+
+async def process_batch(messages: List[IncomingMessage]):
+    """
+    Run a single forward pass over a batch of messages.
+
+    Every message is acknowledged on its own once its result is stored,
+    failures are routed through the retry path message by message.
+    Messages whose deadline passed while they were waiting are dropped.
+    """
+    messages = await drop_expired(messages)
+    if not messages:
+        return
+
+    headers = [dict(message.headers) for message in messages]
+    with BatchTrace(headers) as batch_trace:
+        await run_batch(messages, batch_trace)
+
+
+async def run_batch(
+    messages: List[IncomingMessage],
+    batch_trace: BatchTrace,
+):
+    try:
+        results = await executor.run([
+            (message.body, dict(message.headers)) for message in messages
+        ], batch_trace)
+    except Exception as e:
+        await fail_all(messages, e)
+        return
+
+    completed, failed = partition(messages, results)
+    for message, error in failed:
+        await on_failure(message, error)
+
+    try:
+        with batch_trace.stage('store'):
+            await store_results([
+                (message.headers.get("request_id", ""), prediction)
+                for message, prediction in completed
+            ])
+    except Exception as e:
+        await fail_all([message for message, _ in completed], e)
+        return
+
+    with batch_trace.stage('ack'):
+        await acknowledge([message for message, _ in completed])
+
+
+async def process_batch_message(message: IncomingMessage):
+    """
+    Infer the images of a batch message, published by the batch endpoint.
+
+    The images are run in chunks of `BATCH_SIZE` spread over the executor.
+    Once the results are stored the message is acknowledged, the images
+    that failed are retried together as a smaller batch message, apart
+    from those that failed for good which are parked.
+    """
+    if not await drop_expired([message]):
+        return
+
+    with BatchTrace([dict(message.headers)]) as batch_trace:
+        await run_batch_message(message, batch_trace)
+
+
+async def run_batch_message(
+    message: IncomingMessage,
+    batch_trace: BatchTrace,
+):
+    try:
+        payloads = split_batch(message.body, message.headers)
+    except Exception as e:
+        await on_failure(message, e)
+        return
+
+    results = await run_chunks(payloads, batch_trace)
+    completed, failed = partition(payloads, results)
+
+    try:
+        with batch_trace.stage('store'):
+            await store_results([
+                (request_id, prediction)
+                for (request_id, _, _), prediction in completed
+            ])
+    except Exception as e:
+        await on_failure(message, e)
+        return
+
+    lane_stats.record_completed(
+        lane_of(message.priority), message.headers, count=len(completed))
+    if failed:
+        await on_partial_failure(message, failed)
+    else:
+        with batch_trace.stage('ack'):
+            await message.ack()
+
+
+async def run_chunks(
+    payloads: List[Tuple[str, bytes, Dict]],
+    batch_trace: BatchTrace,
+) -> List[Union[Prediction, Exception]]:
+    """
+    Infer the images of a batch message in chunks of `BATCH_SIZE` spread
+    over the executor.
+
+    Returns:
+        List[Union[Prediction, Exception]]: The prediction, or error, of
+            each image in input order. The images of a chunk that could
+            not be run at all share its error.
+    """
+    chunks = [
+        payloads[i:i + settings.BATCH_SIZE]
+        for i in range(0, len(payloads), settings.BATCH_SIZE)
+    ]
+    outcomes = await asyncio.gather(*(
+        executor.run(
+            [(body, headers) for _, body, headers in chunk], batch_trace)
+        for chunk in chunks
+    ), return_exceptions=True)
+
+    results: List[Union[Prediction, Exception]] = []
+    for chunk, outcome in zip(chunks, outcomes):
+        if isinstance(outcome, Exception):
+            results.extend([outcome] * len(chunk))
+        elif isinstance(outcome, BaseException):
+            raise outcome
+        else:
+            results.extend(outcome)
+    return results
+
+
+def partition(items: List, results: List) -> Tuple[List, List]:
+    """
+    Split items by the outcome of their inference.
+
+    Returns:
+        Tuple[List, List]: The `(item, prediction)` pairs of the successful
+            inferences and the `(item, error)` pairs of the failed ones.
+    """
+    completed, failed = [], []
+    for item, result in zip(items, results):
+        if isinstance(result, Exception):
+            failed.append((item, result))
+        else:
+            completed.append((item, result))
+    return completed, failed
+
+
+async def drop_expired(
+    messages: List[IncomingMessage],
+) -> List[IncomingMessage]:
+    """
+    Mark the requests of the messages whose deadline passed as failed, in
+    a single round-trip, and acknowledge them once they are stored. There
+    is no point in inferring or retrying them.
+
+    Returns:
+        List[IncomingMessage]: The messages still within their deadline.
+    """
+    live, expired = [], []
+    for message in messages:
+        if is_expired(message.headers):
+            expired.append((message, request_ids(dict(message.headers))))
+        else:
+            live.append(message)
+    if expired:
+        await expire(expired)
+    return live
+
+
+async def expire(expired: List[Tuple[IncomingMessage, List[str]]]):
+    try:
+        await store_failures(
+            [id_ for _, ids in expired for id_ in ids],
+            DeadlineExceeded("Deadline exceeded"),
+        )
+    except Exception as e:
+        # Nothing was stored: hand the messages back to the broker.
+        logging.error(f"Failed to expire messages: {e}")
+        for message, _ in expired:
+            await message.nack(requeue=True)
+        return
+
+    for message, ids in expired:
+        lane_stats.record_expired(lane_of(message.priority), len(ids))
+        await message.ack()
+
+
+async def acknowledge(messages: List[IncomingMessage]):
+    for message in messages:
+        lane_stats.record_completed(
+            lane_of(message.priority), message.headers)
+        await message.ack()
+
+
+async def fail_all(messages: List[IncomingMessage], error: Exception):
+    for message in messages:
+        await on_failure(message, error)
+
+
+async def store_failures(request_ids: List[str], error: Exception):
+    """
+    Mark requests as failed for good and wake up the clients waiting for
+    them, in a single round-trip.
+
+    Args:
+        request_ids (List[str]): The IDs of the failed requests.
+        error (Exception): The error they failed with.
+    """
+    record = failed_record(error)
+    await result_writer.write(
+        [(request_id, record) for request_id in request_ids])
+
+
+async def store_results(results: List[Tuple[str, Prediction]]):
+    """
+    Store inference results and wake up the clients waiting for them, in
+    a single round-trip.
+
+    Args:
+        results (List[Tuple[str, Prediction]]): The request ID and
+            prediction of each inference.
+    """
+    completed_at = int(time.time() * 1000)
+    for request_id, prediction in results:
+        logging.debug(f"Inference result of {request_id}: {prediction}")
+    await result_writer.write([
+        (request_id, completed_record(prediction, completed_at))
+        for request_id, prediction in results
+    ])
+
+
+batcher = MicroBatcher(
+    process_batch,
+    max_batch_size=settings.BATCH_SIZE,
+    max_wait_ms=settings.BATCH_TIMEOUT_MS,
+    max_concurrency=executor.concurrency,
+)
+
+
+lane_stats = LaneStats()
+
+
+retry_scheduler = RetryScheduler(
+    rabbitmq_client,
+    QUEUE_NAME,
+    settings.RETRY_DELAYS,
+    # Images that cannot be decoded will never succeed.
+    permanent_errors=(ValueError, UnidentifiedImageError),
+)
+
+
+consumer = None
 
 
 async def main():
+    global consumer
+
+    setup_tracing(
+        'inference-worker',
+        settings.TRACING_SAMPLE_RATIO,
+        create_exporter(settings.TRACING_EXPORTER),
+    )
+    if settings.METRICS_PORT:
+        start_http_server(settings.METRICS_PORT)
+        logging.info(f"Serving metrics on port {settings.METRICS_PORT}")
+    try:
+        executor.start()
+    except RuntimeError as e:
+        # Consuming would only fail every message until it is parked.
+        logging.error(e)
+        sys.exit(1)
     await rabbitmq_client.connect()
+    # Keep every executor slot busy plus one batch filling up, the broker
+    # holds back the rest for other workers. The limit applies to each
+    # consumer, so messages go to the replicas that have room for them.
+    await rabbitmq_client.channel.set_qos(
+        prefetch_count=settings.PREFETCH_COUNT
+        or settings.BATCH_SIZE * (executor.concurrency + 1))
     queue = await rabbitmq_client.channel.declare_queue(
-        "pgdb", arguments={
-            'x-message-ttl' : 5000,
-            'x-dead-letter-exchange': 'dlx',
-            'x-dead-letter-routing-key': 'dlq'
-        })
-    await queue.consume(on_message)
-    await queue.bind(exchange='amq.direct', routing_key='pgdb')
+        QUEUE_NAME,
+        durable=True,
+        arguments={'x-max-priority': settings.QUEUE_MAX_PRIORITY},
+    )
+    await retry_scheduler.declare(rabbitmq_client.channel)
+    batcher.start()
+    lane_stats.start(settings.LANE_STATS_INTERVAL)
+    consumer = FlowControlledConsumer(
+        queue,
+        on_message,
+        max_rss=settings.MAX_RSS_MB and settings.MAX_RSS_MB * 1024 * 1024,
+        resume_ratio=settings.RSS_RESUME_RATIO,
+        interval=settings.FLOW_CONTROL_INTERVAL,
+        memory_usage=lambda: process_rss(executor.pids),
+    )
+    await consumer.start()
+    await queue.bind(exchange='amq.direct', routing_key=QUEUE_NAME)
 
 
 async def on_message(message: IncomingMessage):
-    logging.info(f"Received message: {message}")
+    record_queue_wait(lane_of(message.priority), message.headers)
+
+    if is_batch(message.headers):
+        await process_batch_message(message)
+        return
 
     request_id = message.headers.get("request_id", "")
 
     if not request_id:
+        await on_failure(message, ValueError("Missing request_id"))
+        return
+
+    # Checked again once its batch is formed, after waiting for it.
+    if not await drop_expired([message]):
         return
 
-    image = pickle.loads(message.body)
-    x = model.preprocess_image(image)
+    # Urgent messages overtake the ones already waiting for a batch.
+    await batcher.put(message, priority=message.priority or 0)
+
+
+async def on_failure(
+    message: IncomingMessage,
+    error: Exception,
+):
+    """
+    Schedule a retry of a failed message, or park it and mark its
+    requests as failed, then acknowledge it.
+
+    Args:
+        message (IncomingMessage): The failed message.
+        error (Exception): The error it failed with.
+    """
+    logging.error(f"Error in model forward: {error}")
+
     try:
-        label = model.forward(x)
-        logging.info(f"Inference result: {label}")
-        redis_client.set(request_id, label)
-        await message.ack()
+        await schedule_retry(
+            message.body, dict(message.headers), error, message.priority)
     except Exception as e:
-        logging.error(f"Error in model forward: {e}")
-        retry_count = message.headers.get('x-retry-count', 0)
-        retry_count += 1
-
-        if retry_count > MAX_RETRY:
-            logging.info(
-                f"Message {request_id} has reached the maximum retry count.")
-            return
-
-        message.headers['x-retry-count'] = retry_count
-        await rabbitmq_client.publish_message(
-            Message(
-                body=message.body,
-                headers=message.headers,
-                delivery_mode=message.delivery_mode,
-            ),
-            routing_key='dlq'
-        )
+        # Nothing was lost yet: hand the message back to the broker.
+        logging.error(f"Failed to schedule a retry: {e}")
+        await message.nack(requeue=True)
+        return
+
+    await message.ack()
+
+
+async def on_partial_failure(
+    message: IncomingMessage,
+    failed: List[Tuple[Tuple[str, bytes, Dict], Exception]],
+):
+    """
+    Retry the failed images of a batch message as a smaller batch
+    message, park those that failed for good as another one and mark
+    their requests as failed, then acknowledge the message.
+
+    The message is only handed back to the broker when neither copy
+    could be published. Once one was, requeueing would publish it again:
+    the requests of the other one are marked as failed instead.
+
+    Args:
+        message (IncomingMessage): The batch message.
+        failed (List[Tuple[Tuple[str, bytes, Dict], Exception]]): The
+            payload of each failed image and the error it failed with.
+    """
+    groups: Dict[bool, List[Tuple[Tuple[str, bytes, Dict], Exception]]] = {}
+    for payload, error in failed:
+        logging.error(f"Error in model forward: {error}")
+        groups.setdefault(retry_scheduler.is_permanent(error), []).append(
+            (payload, error))
+
+    published, failures = await publish_copies(
+        list(groups.values()), message.priority)
+    if not published:
+        # Nothing was lost yet: hand the message back to the broker.
+        await message.nack(requeue=True)
+        return
+
+    for headers, error in failures:
+        try:
+            await store_failures(request_ids(headers), error)
+        except Exception as e:
+            logging.error(f"Failed to store failures: {e}")
+    await message.ack()
+
+
+async def publish_copies(
+    groups: List[List[Tuple[Tuple[str, bytes, Dict], Exception]]],
+    priority: Optional[int] = None,
+) -> Tuple[int, List[Tuple[Dict, Exception]]]:
+    """
+    Publish a retry or parked copy of each group of failed images,
+    trying every group even when another one could not be published.
+
+    Returns:
+        Tuple[int, List[Tuple[Dict, Exception]]]: The number of copies
+            published, and the headers and error of the groups that will
+            not be retried, parked or not published.
+    """
+    published, failures = 0, []
+    for group in groups:
+        body, headers = frame_batch([payload for payload, _ in group])
+        error = group[-1][1]
+        try:
+            retried = await retry_scheduler.schedule(
+                body, headers, error, priority)
+        except Exception as e:
+            logging.error(f"Failed to schedule a retry: {e}")
+            failures.append((headers, error))
+            continue
+
+        published += 1
+        if not retried:
+            failures.append((headers, error))
+    return published, failures
+
+
+async def schedule_retry(
+    body: bytes,
+    headers: Dict,
+    error: Exception,
+    priority: Optional[int] = None,
+):
+    """
+    Schedule a retry of a failed message, or park it and mark its
+    requests as failed.
+
+    Raises:
+        Exception: If the retry could not be scheduled or the failure
+            stored, the message must then not be acknowledged.
+    """
+    retried = await retry_scheduler.schedule(body, headers, error, priority)
+    if not retried:
+        await store_failures(request_ids(headers), error)
+
+
+def request_ids(headers: Dict) -> List[str]:
+    if is_batch(headers):
+        return list(headers[REQUEST_IDS_HEADER])
+    request_id = headers.get("request_id", "")
+    return [request_id] if request_id else []
 
 
 if __name__ == "__main__":
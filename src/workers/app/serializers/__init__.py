@@ -0,0 +1,21 @@
+from .batch import (BATCH_ID_HEADER, PAYLOAD_SIZES_HEADER, REQUEST_IDS_HEADER,
+                    frame_batch, is_batch, split_batch)
+from .image import (ENCODED_FORMAT, MODEL_HEADER, PAYLOAD_DTYPE_HEADER,
+                    PAYLOAD_FORMAT_HEADER, PAYLOAD_SHAPE_HEADER, RAW_FORMAT,
+                    deserialize_image)
+
+__all__ = [
+    'BATCH_ID_HEADER',
+    'ENCODED_FORMAT',
+    'MODEL_HEADER',
+    'PAYLOAD_DTYPE_HEADER',
+    'PAYLOAD_FORMAT_HEADER',
+    'PAYLOAD_SHAPE_HEADER',
+    'PAYLOAD_SIZES_HEADER',
+    'REQUEST_IDS_HEADER',
+    'RAW_FORMAT',
+    'deserialize_image',
+    'frame_batch',
+    'is_batch',
+    'split_batch',
+]
@@ -0,0 +1,62 @@
+from typing import Dict, List, Tuple
+
+PAYLOAD_SIZES_HEADER = 'payload-sizes'
+REQUEST_IDS_HEADER = 'request_ids'
+BATCH_ID_HEADER = 'batch_id'
+
+
+def is_batch(headers: Dict) -> bool:
+    return REQUEST_IDS_HEADER in headers
+
+
+def split_batch(body: bytes, headers: Dict) -> List[Tuple[str, bytes, Dict]]:
+    """
+    Split a batch message into the payloads of its images.
+
+    Args:
+        body (bytes): The message body, the concatenated image bodies.
+        headers (Dict): The message headers, `payload-sizes` and
+            `request_ids` list the size and request of each image.
+
+    Returns:
+        List[Tuple[str, bytes, Dict]]: The request ID, body and headers of
+            each image, the headers being those of a single image message.
+
+    Raises:
+        ValueError: If the sizes do not match the body or the requests.
+    """
+    sizes = [int(size) for size in headers[PAYLOAD_SIZES_HEADER]]
+    request_ids = list(headers[REQUEST_IDS_HEADER])
+    if len(sizes) != len(request_ids) or sum(sizes) != len(body):
+        raise ValueError("Invalid batch framing")
+
+    image_headers = {
+        key: value for key, value in headers.items()
+        if key not in (PAYLOAD_SIZES_HEADER, REQUEST_IDS_HEADER)
+    }
+    payloads, offset = [], 0
+    for request_id, size in zip(request_ids, sizes):
+        payloads.append(
+            (request_id, body[offset:offset + size], image_headers))
+        offset += size
+    return payloads
+
+
+def frame_batch(
+    payloads: List[Tuple[str, bytes, Dict]],
+) -> Tuple[bytes, Dict]:
+    """
+    Pack image payloads back into a batch message, the inverse of
+    `split_batch`.
+
+    Args:
+        payloads (List[Tuple[str, bytes, Dict]]): The request ID, body and
+            headers of each image, the headers being the same for all.
+
+    Returns:
+        Tuple[bytes, Dict]: The body and headers of the batch message.
+    """
+    headers = dict(payloads[0][2])
+    headers[REQUEST_IDS_HEADER] = [request_id for request_id, _, _ in payloads]
+    headers[PAYLOAD_SIZES_HEADER] = [len(body) for _, body, _ in payloads]
+    return b''.join(body for _, body, _ in payloads), headers
@@ -0,0 +1,47 @@
+import io
+from typing import Dict, Union
+
+import numpy as np
+from PIL import Image
+
+PAYLOAD_FORMAT_HEADER = 'payload-format'
+PAYLOAD_DTYPE_HEADER = 'payload-dtype'
+PAYLOAD_SHAPE_HEADER = 'payload-shape'
+# Name of the registry model a payload is inferred with.
+MODEL_HEADER = 'x-model'
+
+ENCODED_FORMAT = 'encoded'
+RAW_FORMAT = 'raw'
+
+
+def deserialize_image(
+    body: bytes,
+    headers: Dict,
+) -> Union[Image.Image, np.ndarray]:
+    """
+    Rebuild an image from a message body according to its headers.
+
+    Args:
+        body (bytes): The message body.
+        headers (Dict): The message headers, `payload-format` selects
+            how the body is read.
+
+    Returns:
+        Union[Image.Image, np.ndarray]: The lazily opened image for the
+            `encoded` format, its pixels are only decoded during
+            preprocessing, or a read-only NCHW array wrapping the body
+            without a copy for the `raw` format.
+
+    Raises:
+        ValueError: If the payload format is missing or invalid.
+    """
+    payload_format = headers.get(PAYLOAD_FORMAT_HEADER)
+
+    if payload_format == ENCODED_FORMAT:
+        return Image.open(io.BytesIO(body))
+    elif payload_format == RAW_FORMAT:
+        dtype = np.dtype(headers[PAYLOAD_DTYPE_HEADER])
+        shape = tuple(int(dim) for dim in headers[PAYLOAD_SHAPE_HEADER])
+        return np.frombuffer(body, dtype=dtype).reshape(shape)
+    else:
+        raise ValueError(f"Invalid payload format: {payload_format}")
@@ -1,5 +1,36 @@
+from .batcher import MicroBatcher
+from .consumer import FlowControlledConsumer, process_rss
+from .executor import InferenceExecutor
+from .metrics import STAGE_DURATION, record_queue_wait
 from .rabbitmq import rabbitmq_client
 from .redis import redis_client
+from .results import (ResultWriter, completed_record, failed_record,
+                      publish_revisions)
+from .retry import RetryScheduler
+from .scheduling import (DeadlineExceeded, LaneStats, is_expired,
+                         lane_of)
+from .tracing import BatchTrace, create_exporter, setup_tracing
 
 
-__all__ = ["rabbitmq_client", "redis_client"]
+__all__ = [
+    "BatchTrace",
+    "DeadlineExceeded",
+    "FlowControlledConsumer",
+    "InferenceExecutor",
+    "LaneStats",
+    "MicroBatcher",
+    "ResultWriter",
+    "RetryScheduler",
+    "STAGE_DURATION",
+    "completed_record",
+    "create_exporter",
+    "failed_record",
+    "is_expired",
+    "lane_of",
+    "process_rss",
+    "publish_revisions",
+    "rabbitmq_client",
+    "record_queue_wait",
+    "redis_client",
+    "setup_tracing",
+]
@@ -0,0 +1,106 @@
+import asyncio
+import logging
+from itertools import count
+from typing import Any, Awaitable, Callable, List, Optional, Set
+
+logging.basicConfig(level=logging.INFO)
+
+
+class MicroBatcher():
+    """Group incoming items into micro-batches.
+
+    Items are collected until either `max_batch_size` items are waiting
+    or `max_wait_ms` milliseconds have passed since the first item of the
+    batch arrived, then the whole batch is handed to `handler`. Up to
+    `max_concurrency` batches are handled at the same time, the next batch
+    only starts filling once one of them is done.
+
+    Waiting items are taken by decreasing priority, then in arrival order,
+    so urgent items overtake the backlog that piles up while every slot
+    is busy.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[List[Any]], Awaitable[None]],
+        max_batch_size: int = 16,
+        max_wait_ms: int = 10,
+        max_concurrency: int = 1,
+    ):
+        self.handler = handler
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0, max_wait_ms) / 1000
+        self.max_concurrency = max(1, max_concurrency)
+        self.queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self.sequence = count()
+        self.slots = asyncio.Semaphore(self.max_concurrency)
+        self.task: Optional[asyncio.Task] = None
+        self.pending: Set[asyncio.Task] = set()
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.get_event_loop().create_task(self.run())
+        return self.task
+
+    async def stop(self):
+        if self.task is None:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+        if self.pending:
+            await asyncio.wait(self.pending)
+
+    async def put(self, item: Any, priority: int = 0):
+        await self.queue.put((-priority, next(self.sequence), item))
+
+    async def collect(self) -> List[Any]:
+        """
+        Wait for the next batch of items.
+
+        Returns:
+            List[Any]: Between 1 and `max_batch_size` items.
+        """
+        loop = asyncio.get_event_loop()
+        batch = [(await self.queue.get())[-1]]
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait()[-1])
+                continue
+
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(
+                    (await asyncio.wait_for(self.queue.get(), timeout))[-1])
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def run(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            await self.slots.acquire()
+            try:
+                batch = await self.collect()
+            except asyncio.CancelledError:
+                self.slots.release()
+                raise
+            task = loop.create_task(self.dispatch(batch))
+            self.pending.add(task)
+            task.add_done_callback(self.pending.discard)
+
+    async def dispatch(self, batch: List[Any]):
+        try:
+            await self.handler(batch)
+        except Exception as e:
+            logging.error(f"Failed to process batch: {e}")
+        finally:
+            self.slots.release()
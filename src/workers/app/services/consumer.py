@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import os
+from typing import Callable, Iterable, Optional
+
+from aio_pika.abc import AbstractQueue
+
+logging.basicConfig(level=logging.INFO)
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def process_rss(pids: Iterable[int] = ()) -> Optional[int]:
+    """
+    Resident memory of the current process and of `pids`, in bytes.
+
+    Read from `/proc/<pid>/statm`, which is much cheaper than walking
+    `/proc/<pid>/status`. Processes that exited meanwhile are skipped.
+
+    Returns:
+        Optional[int]: The resident memory, None if `/proc` is not
+            available.
+    """
+    total = None
+    for pid in (os.getpid(), *pids):
+        try:
+            with open(f'/proc/{pid}/statm') as f:
+                resident_pages = int(f.read().split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        total = (total or 0) + resident_pages * PAGE_SIZE
+    return total
+
+
+class FlowControlledConsumer():
+    """Consume a queue, pausing while the worker uses too much memory.
+
+    Every `interval` seconds the resident memory reported by
+    `memory_usage` is compared with `max_rss`. Above it the consumer is
+    cancelled: the broker stops delivering to this worker and hands new
+    messages to the other replicas, while the messages already received
+    are still processed and acknowledged. Consuming resumes once memory
+    falls below `resume_ratio * max_rss`.
+
+    Without `max_rss`, the queue is simply consumed.
+    """
+
+    def __init__(
+        self,
+        queue: AbstractQueue,
+        callback: Callable,
+        max_rss: Optional[int] = None,
+        resume_ratio: float = 0.8,
+        interval: float = 1.0,
+        memory_usage: Callable[[], Optional[int]] = process_rss,
+    ):
+        self.queue = queue
+        self.callback = callback
+        self.max_rss = max_rss
+        self.resume_rss = None if max_rss is None else max_rss * resume_ratio
+        self.interval = interval
+        self.memory_usage = memory_usage
+        self.consumer_tag: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def paused(self) -> bool:
+        return self.consumer_tag is None
+
+    async def start(self):
+        await self.resume()
+        if self.max_rss is None:
+            return
+        if self.memory_usage() is None:
+            logging.warning(
+                "Memory usage is not available, flow control is disabled")
+            return
+        self.task = asyncio.get_event_loop().create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        await self.pause()
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except Exception as e:
+                logging.error(f"Flow control check failed: {e}")
+
+    async def check(self):
+        rss = self.memory_usage()
+        if rss is None:
+            return
+
+        if not self.paused and rss > self.max_rss:
+            logging.warning(
+                f"Resident memory {rss >> 20} MB is above "
+                f"{self.max_rss >> 20} MB, pausing consumption")
+            await self.pause()
+        elif self.paused and rss < self.resume_rss:
+            logging.info(
+                f"Resident memory {rss >> 20} MB, resuming consumption")
+            await self.resume()
+
+    async def pause(self):
+        if self.consumer_tag is not None:
+            await self.queue.cancel(self.consumer_tag)
+            self.consumer_tag = None
+
+    async def resume(self):
+        if self.consumer_tag is None:
+            self.consumer_tag = await self.queue.consume(self.callback)
@@ -0,0 +1,341 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from ai import ModelRegistry, Prediction
+from serializers import MODEL_HEADER, deserialize_image
+
+from .metrics import record_batch, timed
+from .tracing import BatchTrace
+
+logging.basicConfig(level=logging.INFO)
+
+THREAD_BACKEND = 'thread'
+PROCESS_BACKEND = 'process'
+
+# One model registry per process: shared by every thread of a thread
+# pool, private to each child of a process pool.
+_registry: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+# Classes whose probability is kept in the predictions.
+_top_k = 3
+# Passed by every thread or process of a pool once its models are
+# loaded, see `InferenceExecutor.start`.
+_loaded: Optional[threading.Barrier] = None
+
+# Predictions, seconds spent in each stage and models loaded since the
+# previous batch. Children of a process pool cannot update the metrics of
+# the worker, they hand them over along with their results instead.
+BatchOutcome = Tuple[
+    List[Union[Prediction, Exception]],
+    Dict[str, float],
+    List[Tuple[str, float]],
+]
+
+
+def load_models(
+    model_type: str,
+    model_kwargs: Dict,
+    registry_path: Optional[str] = None,
+    reload_interval: float = 0,
+    top_k: int = 3,
+    on_load: Optional[Callable[[str, Dict[str, str]], None]] = None,
+):
+    """
+    Load the models of the current process if they are not loaded yet.
+
+    Args:
+        model_type (str): The type of the model to create without a
+            registry file.
+        model_kwargs (Dict): Keyword arguments of every model constructor.
+        registry_path (Optional[str]): The registry file, see
+            `ModelRegistry`.
+        reload_interval (float): Seconds between two checks for changed
+            models, 0 to never reload them.
+        top_k (int): Number of classes to keep the probability of.
+        on_load (Optional[Callable[[str, Dict[str, str]], None]]): Called
+            after every load changing a model, see `ModelRegistry`. It must be a module
+            level function for the `process` backend.
+    """
+    global _registry, _top_k
+    _top_k = top_k
+    with _registry_lock:
+        if _registry is None:
+            registry = ModelRegistry(
+                registry_path, model_type, model_kwargs, reload_interval,
+                on_load)
+            registry.load()
+            _registry = registry
+
+
+def loaded_registry() -> ModelRegistry:
+    """
+    The model registry of the current process, loaded by the initializer
+    of every thread or process of the pool.
+    """
+    if _registry is None:
+        raise RuntimeError("Models are not loaded")
+    return _registry
+
+
+def start_worker(loaded: threading.Barrier, *initargs):
+    """
+    Initializer of the threads and processes of a pool: load the models,
+    or break `loaded` so that the threads waiting on it give up.
+    """
+    global _loaded
+    _loaded = loaded
+    try:
+        load_models(*initargs)
+    except Exception:
+        loaded.abort()
+        raise
+
+
+def start_process(started: multiprocessing.SimpleQueue, *initargs):
+    """
+    Initializer of the children of a process pool: report the ID of the
+    child on `started`, then load its models.
+    """
+    started.put(os.getpid())
+    start_worker(*initargs)
+
+
+def wait_loaded():
+    """
+    Block until every thread or process of the pool has loaded its
+    models, so that each of them runs one of these tasks.
+    """
+    if _loaded is None:
+        raise RuntimeError("Models are not loaded")
+    _loaded.wait()
+
+
+def predict(payloads: List[Tuple[bytes, Dict]]) -> BatchOutcome:
+    """
+    Decode and preprocess a batch of message payloads and run the model
+    on it. If the batch fails, payloads are retried one by one so that a
+    single broken image does not fail the others. Errors are returned in
+    place of the predictions, never raised.
+
+    Args:
+        payloads (List[Tuple[bytes, Dict]]): Message bodies and headers.
+
+    Returns:
+        BatchOutcome: The prediction, or the error raised while handling
+            it, of each payload in input order, along with the timings of
+            the batch and the models loaded before it.
+    """
+    timings: Dict[str, float] = {}
+    results: List[Union[Prediction, Exception]] = []
+    try:
+        results.extend(classify(payloads, timings))
+    except Exception as e:
+        if len(payloads) == 1:
+            results.append(e)
+            return results, timings, loaded_registry().pop_load_times()
+
+        # Only the stages of the retried payloads are reported, so that
+        # the failed batch is not counted twice.
+        timings = {}
+        for payload in payloads:
+            try:
+                results.extend(classify([payload], timings))
+            except Exception as e:
+                results.append(e)
+    return results, timings, loaded_registry().pop_load_times()
+
+
+def classify(
+    payloads: List[Tuple[bytes, Dict]],
+    timings: Dict[str, float],
+) -> List[Prediction]:
+    """
+    Run every payload through the model its `x-model` header names, one
+    forward pass per model, adding the time of each stage to `timings`.
+    """
+    registry = loaded_registry()
+    registry.refresh()
+    groups = defaultdict(list)
+    for i, (_, headers) in enumerate(payloads):
+        groups[headers.get(MODEL_HEADER)].append(i)
+
+    predictions: Dict[int, Prediction] = {}
+    for name, indices in groups.items():
+        model_name, revision, model = registry.lookup(name)
+        with timed(timings, 'deserialize'):
+            images = [deserialize_image(*payloads[i]) for i in indices]
+        with timed(timings, 'preprocess'):
+            batch = model.preprocess_batch(images)
+        with timed(timings, 'forward'):
+            batch_predictions = model.predict_batch(batch, _top_k)
+        for i, prediction in zip(indices, batch_predictions):
+            predictions[i] = prediction._replace(
+                model=model_name, version=revision)
+    return [predictions[i] for i in range(len(payloads))]
+
+
+class InferenceExecutor():
+    """Run model inference away from the asyncio event loop.
+
+    The `thread` backend shares one model registry between its threads
+    and relies on ONNX Runtime releasing the GIL, the `process` backend
+    loads one copy of the models per child process, each reloading them on
+    its own. At most `concurrency` batches are in flight at any time.
+    """
+
+    DEFAULT_WORKERS = {
+        THREAD_BACKEND: 2,
+        PROCESS_BACKEND: os.cpu_count() or 1,
+    }
+
+    def __init__(
+        self,
+        backend: str = THREAD_BACKEND,
+        max_workers: Optional[int] = None,
+        model_type: str = 'onnx',
+        model_kwargs: Optional[Dict] = None,
+        registry_path: Optional[str] = None,
+        reload_interval: float = 0,
+        top_k: int = 3,
+        on_load: Optional[Callable[[str, Dict[str, str]], None]] = None,
+    ):
+        self.backend = backend
+        self.concurrency = self.concurrency_of(backend, max_workers)
+        self.model_type = model_type
+        self.model_kwargs = model_kwargs or {}
+        self.registry_path = registry_path
+        self.reload_interval = reload_interval
+        self.top_k = top_k
+        self.on_load = on_load
+        self.pool: Optional[Executor] = None
+        self.semaphore: Optional[asyncio.Semaphore] = None
+        self.started: Optional[multiprocessing.SimpleQueue] = None
+        self.child_pids: List[int] = []
+
+    @classmethod
+    def concurrency_of(
+        cls,
+        backend: str,
+        max_workers: Optional[int] = None,
+    ) -> int:
+        """
+        Returns:
+            int: The number of batches run at the same time by an executor
+                of `backend`, `max_workers` or the default of the backend.
+
+        Raises:
+            ValueError: If the backend is invalid.
+        """
+        if backend not in cls.DEFAULT_WORKERS:
+            raise ValueError(f"Invalid executor backend: {backend}")
+        return max_workers or cls.DEFAULT_WORKERS[backend]
+
+    def start(self):
+        """
+        Start every thread or process of the pool and wait for each of
+        them to load and warm up its models, so that no batch pays for it
+        and the models are published before any message is consumed.
+
+        Raises:
+            RuntimeError: If the models could not be loaded, the pool is
+                then shut down.
+        """
+        if self.backend == THREAD_BACKEND:
+            self.pool = ThreadPoolExecutor(
+                max_workers=self.concurrency,
+                initializer=start_worker,
+                initargs=(threading.Barrier(self.concurrency),
+                          *self.initargs),
+            )
+        else:
+            context = multiprocessing.get_context('spawn')
+            self.started = context.SimpleQueue()
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.concurrency,
+                mp_context=context,
+                initializer=start_process,
+                initargs=(self.started, context.Barrier(self.concurrency),
+                          *self.initargs),
+            )
+
+        # Pools start their workers on demand: none of these tasks can
+        # complete before every worker took one.
+        futures = [
+            self.pool.submit(wait_loaded) for _ in range(self.concurrency)]
+        try:
+            for future in futures:
+                future.result()
+        except Exception as e:
+            self.shutdown()
+            raise RuntimeError(f"Failed to load the models: {e}") from e
+
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        logging.info(
+            f"Started {self.backend} executor "
+            f"with {self.concurrency} workers")
+
+    @property
+    def initargs(self) -> Tuple:
+        return (
+            self.model_type,
+            self.model_kwargs,
+            self.registry_path,
+            self.reload_interval,
+            self.top_k,
+            self.on_load,
+        )
+
+    @property
+    def pids(self) -> List[int]:
+        """
+        IDs of the child processes of the `process` backend, whose memory
+        adds up to the worker's. Children report their ID once started,
+        those that exited since are still listed.
+        """
+        while self.started is not None and not self.started.empty():
+            self.child_pids.append(self.started.get())
+        return list(self.child_pids)
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+            self.pool = None
+        self.started = None
+        self.child_pids = []
+
+    async def run(
+        self,
+        payloads: List[Tuple[bytes, Dict]],
+        batch_trace: Optional[BatchTrace] = None,
+    ) -> List[Union[Prediction, Exception]]:
+        """
+        Classify a batch of message payloads on the pool.
+
+        Args:
+            payloads (List[Tuple[bytes, Dict]]): Message bodies and headers.
+            batch_trace (Optional[BatchTrace]): Where to report the stages
+                of the batch.
+
+        Returns:
+            List[Union[Prediction, Exception]]: The prediction, or decoding
+                error, of each payload in input order.
+        """
+        if self.semaphore is None:
+            raise RuntimeError("The executor is not started")
+
+        loop = asyncio.get_event_loop()
+        async with self.semaphore:
+            start = time.time_ns()
+            results, timings, loads = await loop.run_in_executor(
+                self.pool, predict, payloads)
+        record_batch(len(payloads), timings, loads)
+        if batch_trace is not None:
+            batch_trace.add_executor_stage(start, time.time_ns(), timings)
+        return results
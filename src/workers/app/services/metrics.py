@@ -0,0 +1,77 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from prometheus_client import Histogram
+
+from .scheduling import SUBMITTED_AT_HEADER
+
+QUEUE_WAIT = Histogram(
+    'worker_queue_wait_seconds',
+    'Time from the submission of a request to its delivery to the worker.',
+    ['lane'],
+    buckets=(.01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60, 300),
+)
+STAGE_DURATION = Histogram(
+    'worker_stage_duration_seconds',
+    'Time spent in each stage of the handling of a batch.',
+    ['stage'],
+)
+BATCH_SIZE = Histogram(
+    'worker_batch_size',
+    'Images per batch run on the executor.',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+MODEL_LOAD = Histogram(
+    'worker_model_load_seconds',
+    'Time to load and warm up a model.',
+    ['model'],
+    buckets=(.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+
+
+@contextmanager
+def timed(timings: Dict[str, float], stage: str):
+    """
+    Add the time spent in the block to `timings[stage]`, in seconds.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + \
+            time.perf_counter() - start
+
+
+def record_batch(
+    size: int,
+    timings: Dict[str, float],
+    loads: List[Tuple[str, float]],
+):
+    """
+    Record a batch run on the executor, with the time spent in each of
+    its stages and the models loaded by the executor meanwhile.
+    """
+    BATCH_SIZE.observe(size)
+    for stage, seconds in timings.items():
+        STAGE_DURATION.labels(stage).observe(seconds)
+    for model, seconds in loads:
+        MODEL_LOAD.labels(model).observe(seconds)
+
+
+def record_queue_wait(
+    lane: str,
+    headers: Dict,
+    now: Optional[float] = None,
+):
+    """
+    Record how long a message waited since its submission to the API,
+    from its `x-submitted-at` header in epoch milliseconds. It includes
+    the delays of its retries, if any.
+    """
+    submitted_at = headers.get(SUBMITTED_AT_HEADER)
+    if submitted_at is None:
+        return
+    wait = (now or time.time()) - int(submitted_at) / 1000
+    # Clocks of the API and worker hosts may drift apart.
+    QUEUE_WAIT.labels(lane).observe(max(wait, 0.0))
@@ -3,7 +3,7 @@ import logging
 import os
 from typing import Callable
 
-from aio_pika import Message, connect, ExchangeType
+from aio_pika import Message, connect
 from aiormq import AMQPConnectionError
 from cores import singleton
 
@@ -24,15 +24,6 @@ class RabbitMQClient():
             try:
                 self.connection = await connect(self.amqp_url)
                 self.channel = await self.connection.channel()
-                self.dlx = await self.channel.declare_exchange(
-                    'dlx', ExchangeType.DIRECT)
-                self.dlq = await self.channel.declare_queue(
-                    'dlq', arguments={
-                        'x-message-ttl': 5000,
-                        'x-dead-letter-exchange': 'amq.direct',
-                        'x-dead-letter-routing-key': 'pgdb'
-                    })
-                await self.dlq.bind(self.dlx, 'dlq')
                 logging.info("Connected to RabbitMQ")
                 break
             except AMQPConnectionError:
@@ -47,14 +38,21 @@ class RabbitMQClient():
         logging.info("Disconnected from RabbitMQ")
 
     async def publish_message(self, message: Message, routing_key: str = "pgdb"):
+        """
+        Publish a message and wait for the broker to confirm it.
+
+        Raises:
+            Exception: If the message was not confirmed.
+        """
         try:
             await self.channel.default_exchange.publish(
                 message,
                 routing_key=routing_key
             )
-            logging.info(f"Message published to {routing_key}")
+            logging.debug(f"Message published to {routing_key}")
         except Exception as e:
             logging.error(f"Failed to publish message: {e}")
+            raise
 
     async def consume_messages(self, queue_name: str, callback: Callable):
         try:
@@ -1,7 +1,20 @@
 import os
+
 import redis
+import redis.asyncio as aioredis
 
-redis_client = redis.Redis(
+redis_client = aioredis.Redis(
     host=os.getenv('REDIS_HOST', 'localhost'),
     port=os.getenv('REDIS_PORT', '6379'),
 )
+
+
+def blocking_client() -> redis.Redis:
+    """
+    A new synchronous client, for the executor threads and processes,
+    which run outside of the event loop.
+    """
+    return redis.Redis(
+        host=os.getenv('REDIS_HOST', 'localhost'),
+        port=os.getenv('REDIS_PORT', '6379'),
+    )
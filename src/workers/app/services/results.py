@@ -0,0 +1,131 @@
+import json
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+from ai import Prediction
+
+from .redis import blocking_client
+
+logging.basicConfig(level=logging.INFO)
+
+COMPLETED = 'completed'
+FAILED = 'failed'
+# The revision of each model, and under an empty name of the default one.
+MODEL_REVISIONS_KEY = 'models:revisions'
+
+
+def result_key(request_id: str) -> str:
+    return f"result:{request_id}"
+
+
+def completed_record(
+    prediction: Prediction,
+    completed_at: Optional[int] = None,
+) -> Dict:
+    """
+    Returns:
+        Dict: The fields of the result record of a completed request.
+    """
+    return {
+        'status': COMPLETED,
+        'inference_class': prediction.label,
+        'probabilities': prediction.probabilities,
+        'model': prediction.model,
+        'model_version': prediction.version,
+        'completed_at': completed_at or int(time.time() * 1000),
+    }
+
+
+def failed_record(
+    error: Exception,
+    completed_at: Optional[int] = None,
+) -> Dict:
+    """
+    Returns:
+        Dict: The fields of the result record of a request that failed
+            for good.
+    """
+    return {
+        'status': FAILED,
+        'error': str(error),
+        'completed_at': completed_at or int(time.time() * 1000),
+    }
+
+
+def publish_revisions(default: str, revisions: Dict[str, str]):
+    """
+    Publish the revision of the models just loaded. The API keys its
+    content cache by the revision of the model serving a request, so that
+    images are inferred again by a reloaded model instead of being
+    answered with the results of the previous one.
+
+    Called by the executor threads or processes after every load that
+    changed a model. A failure is logged, the models are served anyway.
+
+    Args:
+        default (str): The name of the default model.
+        revisions (Dict[str, str]): The revision of each model.
+    """
+    client = blocking_client()
+    try:
+        pipeline = client.pipeline(transaction=True)
+        pipeline.delete(MODEL_REVISIONS_KEY)
+        pipeline.hset(
+            MODEL_REVISIONS_KEY,
+            mapping={'': revisions[default], **revisions})
+        pipeline.execute()
+    except Exception as e:
+        logging.error(f"Failed to publish model revisions: {e}")
+    finally:
+        client.close()
+
+
+class ResultWriter():
+    """Complete the result records of requests.
+
+    The API creates the record of each request, a Redis hash under
+    `result:<ID>`, when it is submitted. The worker adds the outcome to
+    it, renews its expiry to `ttl` seconds and announces it on `channel`,
+    all in a single round-trip for any number of requests. Empty fields
+    are left out, and probabilities are stored as JSON.
+
+    `redis` is an asyncio client, so that writing the results of a batch
+    does not block the event loop delivering and acknowledging messages.
+    """
+
+    def __init__(self, redis, channel: str, ttl: int):
+        self.redis = redis
+        self.channel = channel
+        self.ttl = ttl
+
+    async def write(self, records: List[Tuple[str, Dict]]):
+        """
+        Args:
+            records (List[Tuple[str, Dict]]): The request ID and record
+                fields of each result.
+        """
+        if not records:
+            return
+
+        pipeline = self.redis.pipeline(transaction=False)
+        for request_id, record in records:
+            key = result_key(request_id)
+            fields = {
+                field: value for field, value in record.items()
+                if value not in (None, '')
+            }
+            pipeline.hset(key, mapping=self.encode(fields))
+            pipeline.expire(key, self.ttl)
+            pipeline.publish(
+                self.channel,
+                json.dumps({'request_id': request_id, **fields}),
+            )
+        await pipeline.execute()
+
+    @staticmethod
+    def encode(record: Dict) -> Dict:
+        return {
+            field: json.dumps(value) if isinstance(value, dict) else value
+            for field, value in record.items()
+        }
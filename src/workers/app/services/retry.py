@@ -0,0 +1,129 @@
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Optional, Sequence, Tuple, Type
+
+from aio_pika import DeliveryMode, Message
+from aio_pika.abc import AbstractChannel
+
+logging.basicConfig(level=logging.INFO)
+
+RETRY_COUNT_HEADER = 'x-retry-count'
+LAST_ERROR_HEADER = 'x-last-error'
+PARKED_AT_HEADER = 'x-parked-at'
+
+
+class RetryScheduler():
+    """Retry failed messages with exponential backoff.
+
+    Every delay of `delays` is a queue of the ladder, named after the
+    queue and the delay, whose messages expire after that delay and are
+    dead-lettered back to the work queue. The n-th retry of a message
+    waits in the n-th queue of the ladder. Messages failing once more
+    after the last delay, or with one of `permanent_errors`, are moved to
+    the parking queue where they stay until someone looks at them.
+
+    The work queue itself has no TTL, so the time spent waiting for a
+    worker never counts as a failure. Every queue is durable and the
+    copies are persistent, so a broker restart loses no message waiting
+    for a retry or parked. Copies keep the priority of the message.
+    """
+
+    def __init__(
+        self,
+        client,
+        queue_name: str,
+        delays: Sequence[float],
+        permanent_errors: Tuple[Type[Exception], ...] = (),
+    ):
+        self.client = client
+        self.queue_name = queue_name
+        self.delays = list(delays)
+        self.permanent_errors = permanent_errors
+
+    @property
+    def parking_queue_name(self) -> str:
+        return f"{self.queue_name}.parking"
+
+    def retry_queue_name(self, delay: float) -> str:
+        return f"{self.queue_name}.retry.{int(delay * 1000)}ms"
+
+    def is_permanent(self, error: Exception) -> bool:
+        """
+        Returns:
+            bool: True if a message failing with `error` is parked at once.
+        """
+        return isinstance(error, self.permanent_errors)
+
+    async def declare(self, channel: AbstractChannel):
+        """
+        Declare the queues of the ladder and the parking queue.
+        """
+        for delay in self.delays:
+            await channel.declare_queue(
+                self.retry_queue_name(delay), durable=True, arguments={
+                    'x-message-ttl': int(delay * 1000),
+                    'x-dead-letter-exchange': '',
+                    'x-dead-letter-routing-key': self.queue_name,
+                })
+        await channel.declare_queue(self.parking_queue_name, durable=True)
+
+    async def schedule(
+        self,
+        body: bytes,
+        headers: Dict,
+        error: Exception,
+        priority: Optional[int] = None,
+    ) -> bool:
+        """
+        Publish a copy of a failed message to the next queue of the
+        ladder, or park it.
+
+        Args:
+            body (bytes): The body of the failed message.
+            headers (Dict): Its headers.
+            error (Exception): The error it failed with.
+            priority (Optional[int]): Its priority, kept by the copy.
+
+        Returns:
+            bool: True if the message will be retried, False if it was
+                parked.
+
+        Raises:
+            Exception: If the copy could not be published, the failed
+                message must then not be acknowledged.
+        """
+        retry_count = int(headers.get(RETRY_COUNT_HEADER, 0)) + 1
+        headers = {
+            **headers,
+            RETRY_COUNT_HEADER: retry_count,
+            LAST_ERROR_HEADER: f"{type(error).__name__}: {error}"[:512],
+        }
+
+        if retry_count <= len(self.delays) and not self.is_permanent(error):
+            delay = self.delays[retry_count - 1]
+            await self.client.publish_message(
+                Message(
+                    body,
+                    headers=headers,
+                    delivery_mode=DeliveryMode.PERSISTENT,
+                    priority=priority,
+                ),
+                routing_key=self.retry_queue_name(delay),
+            )
+            logging.warning(
+                f"Retry {retry_count} in {delay}s after error: {error}")
+            return True
+
+        headers[PARKED_AT_HEADER] = datetime.now(timezone.utc).isoformat()
+        await self.client.publish_message(
+            Message(
+                body,
+                headers=headers,
+                delivery_mode=DeliveryMode.PERSISTENT,
+                priority=priority,
+            ),
+            routing_key=self.parking_queue_name,
+        )
+        logging.error(
+            f"Parked message after {retry_count - 1} retries: {error}")
+        return False
@@ -0,0 +1,91 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict, deque
+from typing import Deque, Dict, Optional
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+
+DEADLINE_HEADER = 'x-deadline'
+SUBMITTED_AT_HEADER = 'x-submitted-at'
+
+# Message priorities set by the API, the highest one is the most urgent.
+LANES = ('low', 'normal', 'high')
+
+
+class DeadlineExceeded(Exception):
+    """The request was not inferred before its deadline."""
+
+
+def lane_of(priority: Optional[int]) -> str:
+    return LANES[min(max(priority or 0, 0), len(LANES) - 1)]
+
+
+def is_expired(headers: Dict, now: Optional[float] = None) -> bool:
+    """
+    Whether the deadline of a message, in epoch milliseconds, has passed.
+    Messages without a deadline never expire.
+    """
+    deadline = headers.get(DEADLINE_HEADER)
+    if deadline is None:
+        return False
+    return (now or time.time()) * 1000 > int(deadline)
+
+
+class LaneStats():
+    """End-to-end latency of the requests of each priority lane.
+
+    The latency runs from the submission of a request to the API, taken
+    from the `x-submitted-at` header, to the storage of its result. The
+    last `window` latencies of each lane are kept, along with the number
+    of completed and expired requests, and summarized every `interval`
+    seconds in the logs.
+    """
+
+    def __init__(self, window: int = 1000):
+        self.latencies: Dict[str, Deque[float]] = defaultdict(
+            lambda: deque(maxlen=window))
+        self.completed: Dict[str, int] = defaultdict(int)
+        self.expired: Dict[str, int] = defaultdict(int)
+        self.task: Optional[asyncio.Task] = None
+
+    def record_completed(self, lane: str, headers: Dict, count: int = 1):
+        self.completed[lane] += count
+        submitted_at = headers.get(SUBMITTED_AT_HEADER)
+        if submitted_at is not None:
+            latency = time.time() - int(submitted_at) / 1000
+            self.latencies[lane].extend([latency] * count)
+
+    def record_expired(self, lane: str, count: int = 1):
+        self.expired[lane] += count
+
+    def summary(self) -> Dict[str, Dict]:
+        """
+        Returns:
+            Dict[str, Dict]: For each lane, the number of completed and
+                expired requests and the latency percentiles, in
+                milliseconds, of the recent ones, None without any.
+        """
+        summary = {}
+        for lane in LANES:
+            latencies = 1000 * np.array(self.latencies[lane])
+            summary[lane] = {
+                'completed': self.completed[lane],
+                'expired': self.expired[lane],
+                **{
+                    f'p{p}_ms': round(float(np.percentile(latencies, p)), 1)
+                    if len(latencies) else None
+                    for p in (50, 95, 99)
+                },
+            }
+        return summary
+
+    def start(self, interval: float):
+        self.task = asyncio.get_event_loop().create_task(self.report(interval))
+
+    async def report(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            logging.info(f"Lane latency: {self.summary()}")
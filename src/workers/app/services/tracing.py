@@ -0,0 +1,176 @@
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from opentelemetry import propagate, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import (BatchSpanProcessor,
+                                            ConsoleSpanExporter, SpanExporter)
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+from serializers import BATCH_ID_HEADER
+
+from .metrics import STAGE_DURATION
+from .retry import RETRY_COUNT_HEADER
+from .scheduling import SUBMITTED_AT_HEADER
+
+logging.basicConfig(level=logging.INFO)
+
+EXPORTERS = ('none', 'console', 'otlp')
+
+tracer = trace.get_tracer('inference-worker')
+
+# The name, start and end of a stage, in epoch nanoseconds, and of the
+# stages it is made of.
+Stage = Tuple[str, int, int, List[Tuple[str, int, int]]]
+
+
+def create_exporter(name: str) -> Optional[SpanExporter]:
+    """
+    Args:
+        name (str): `none`, `console` or `otlp`. The OTLP exporter is an
+            optional dependency, configured by the standard `OTEL_EXPORTER_
+            OTLP_*` environment variables.
+
+    Returns:
+        Optional[SpanExporter]: The exporter, None for `none`.
+    """
+    if name not in EXPORTERS:
+        raise ValueError(f"Invalid tracing exporter: {name}")
+    if name == 'console':
+        return ConsoleSpanExporter()
+    if name == 'otlp':
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import \
+            OTLPSpanExporter
+        return OTLPSpanExporter()
+    return None
+
+
+def setup_tracing(
+    service_name: str,
+    sample_ratio: float,
+    exporter: Optional[SpanExporter],
+) -> Optional[TracerProvider]:
+    """
+    Record and export the spans of the traces sampled by the API, and of
+    a ratio of the messages sent without a trace.
+
+    Returns:
+        Optional[TracerProvider]: The provider of the tracers, None when
+            tracing is disabled, without an exporter.
+    """
+    if exporter is None:
+        return None
+
+    provider = TracerProvider(
+        resource=Resource.create({'service.name': service_name}),
+        sampler=ParentBased(TraceIdRatioBased(sample_ratio)),
+    )
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    logging.info(f"Tracing {sample_ratio:.0%} of the messages")
+    return provider
+
+
+class BatchTrace():
+    """Spans of the messages handled together.
+
+    A batch mixes messages of many traces, sent by the API in their
+    `traceparent` header. Its stages are timed once, and `end` reports
+    them in the trace of every message: a `queue.wait` span, from the
+    submission of the message to the start of the batch, retry delays
+    included, then a `worker.batch` span holding a span per stage.
+
+    The stages run in the executor are timed there and handed back as
+    durations, their spans are laid out back to back up to the end of the
+    `executor` span. Stage durations also feed the
+    `worker_stage_duration_seconds` metric.
+    """
+
+    def __init__(self, headers: List[Dict]):
+        self.headers = headers
+        self.started = time.time_ns()
+        self.stages: List[Stage] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.end()
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.time_ns()
+        try:
+            yield
+        finally:
+            end = time.time_ns()
+            STAGE_DURATION.labels(name).observe((end - start) / 1e9)
+            self.stages.append((name, start, end, []))
+
+    def add_executor_stage(
+        self,
+        start: int,
+        end: int,
+        timings: Dict[str, float],
+    ):
+        """
+        Args:
+            start (int): When the batch was handed to the executor, in
+                epoch nanoseconds.
+            end (int): When its results came back.
+            timings (Dict[str, float]): The seconds the executor spent in
+                each of its stages, in the order they ran.
+        """
+        stages: List[Tuple[str, int, int]] = []
+        stage_end = end
+        for name, seconds in reversed(list(timings.items())):
+            stage_start = max(start, stage_end - int(seconds * 1e9))
+            stages.insert(0, (name, stage_start, stage_end))
+            stage_end = stage_start
+        self.stages.append(('executor', start, end, stages))
+
+    def end(self):
+        end = time.time_ns()
+        for headers in self.headers:
+            self.report(headers, end)
+
+    def report(self, headers: Dict, end: int):
+        context = propagate.extract(headers)
+        span = tracer.start_span(
+            'worker.batch',
+            context,
+            kind=trace.SpanKind.CONSUMER,
+            start_time=self.started,
+            attributes={
+                'request_id': headers.get('request_id', ''),
+                'batch_id': headers.get(BATCH_ID_HEADER, ''),
+                'batch.size': len(self.headers),
+                'retries': int(headers.get(RETRY_COUNT_HEADER, 0)),
+            },
+        )
+        if not span.is_recording():
+            # Not sampled, nothing to report.
+            return
+
+        # Traces started here have no submission to measure from.
+        submitted_at = headers.get(SUBMITTED_AT_HEADER)
+        parent = trace.get_current_span(context).get_span_context()
+        if submitted_at is not None and parent.is_valid:
+            tracer.start_span(
+                'queue.wait', context,
+                start_time=min(int(submitted_at) * 10**6, self.started),
+            ).end(end_time=self.started)
+
+        batch_context = trace.set_span_in_context(span)
+        for name, start, stage_end, stages in self.stages:
+            stage = tracer.start_span(name, batch_context, start_time=start)
+            stage_context = trace.set_span_in_context(stage)
+            for child_name, child_start, child_end in stages:
+                tracer.start_span(
+                    child_name, stage_context, start_time=child_start,
+                ).end(end_time=child_end)
+            stage.end(end_time=stage_end)
+        span.end(end_time=end)
@@ -0,0 +1,192 @@
+"""
+Micro-benchmarks of the worker's inference pipeline.
+
+Times the torchvision `ImageTransform`, the NumPy preprocessor on single
+images and batches, the deserialization of each payload format and the
+forward pass of each model backend at several batch sizes. Latency
+percentiles and images per second are reported as JSON, from
+`src/workers`:
+
+    python -m benchmarks.inference --backends onnx pytorch \
+        --batch-sizes 1 8 16 --output inference.json
+"""
+import argparse
+import io
+import logging
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from PIL import Image
+
+from app.ai import ModelFactory, SessionProfile, TorchProfile
+from app.ai.models.preprocessing import ImagePreprocessor
+from app.serializers import (ENCODED_FORMAT, PAYLOAD_DTYPE_HEADER,
+                             PAYLOAD_FORMAT_HEADER, PAYLOAD_SHAPE_HEADER,
+                             RAW_FORMAT, deserialize_image)
+
+from .report import percentiles, write_report
+
+IMAGE_PATH = './tests/test_image.jpeg'
+
+
+def measure(
+    function: Callable[[], object],
+    repeat: int,
+    images: int = 1,
+    warmup: int = 2,
+) -> Dict:
+    """
+    Time `repeat` calls of `function`, after `warmup` untimed ones.
+
+    Args:
+        function (Callable[[], object]): The code to time.
+        repeat (int): Number of timed calls.
+        images (int): Images handled by each call.
+        warmup (int): Number of untimed calls.
+
+    Returns:
+        Dict: Latency percentiles, in milliseconds, and images per second.
+    """
+    for _ in range(warmup):
+        function()
+
+    latencies: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        latencies.append(1000 * (time.perf_counter() - start))
+
+    return {
+        'latency_ms': percentiles(latencies),
+        'images_per_s': round(1000 * images / np.mean(latencies), 1),
+    }
+
+
+def benchmark_preprocessing(
+    data: bytes,
+    batch_sizes: Sequence[int],
+    repeat: int,
+) -> Dict:
+    image = Image.open(io.BytesIO(data)).convert('RGB')
+    preprocessor = ImagePreprocessor()
+    result = {
+        'preprocess_image': measure(lambda: preprocessor([data]), repeat),
+        'preprocess_batch': {
+            size: measure(
+                lambda: preprocessor([data] * size), repeat, images=size)
+            for size in batch_sizes
+        },
+    }
+
+    try:
+        from app.ai.models.functions import ImageTransform
+    except ImportError as e:
+        result['image_transform'] = {'skipped': str(e)}
+    else:
+        # On a decoded image, as the torchvision pipeline receives it.
+        transform = ImageTransform()
+        result['image_transform'] = measure(lambda: transform(image), repeat)
+    return result
+
+
+def benchmark_deserialization(data: bytes, repeat: int) -> Dict:
+    pixels: np.ndarray = np.empty((3, 224, 224), np.uint8)
+    ImagePreprocessor().load(data, pixels)
+    payloads = {
+        ENCODED_FORMAT: (data, {PAYLOAD_FORMAT_HEADER: ENCODED_FORMAT}),
+        RAW_FORMAT: (pixels.tobytes(), {
+            PAYLOAD_FORMAT_HEADER: RAW_FORMAT,
+            PAYLOAD_DTYPE_HEADER: 'uint8',
+            PAYLOAD_SHAPE_HEADER: list(pixels.shape),
+        }),
+    }
+    return {
+        payload_format: {
+            'payload_bytes': len(body),
+            **measure(lambda: deserialize_image(body, headers), repeat),
+        }
+        for payload_format, (body, headers) in payloads.items()
+    }
+
+
+def benchmark_forward(
+    data: bytes,
+    backends: Sequence[str],
+    batch_sizes: Sequence[int],
+    repeat: int,
+    threads: int,
+) -> Dict:
+    if threads and 'pytorch' in backends:
+        import torch
+        torch.set_num_threads(threads)
+
+    result: Dict[str, Dict[int, Dict]] = {}
+    for backend in backends:
+        model = ModelFactory.create_model(
+            backend,
+            session_profile=SessionProfile(intra_op_num_threads=threads),
+            torch_profile=TorchProfile(),
+        )
+        result[backend] = {}
+        for size in batch_sizes:
+            batch = model.preprocess_batch([data] * size)
+            result[backend][size] = measure(
+                lambda: model.forward_batch(batch), repeat, images=size)
+    return result
+
+
+def benchmark(
+    backends: Sequence[str],
+    batch_sizes: Sequence[int],
+    repeat: int,
+    threads: int,
+    image_path: str = IMAGE_PATH,
+) -> Dict:
+    """
+    Run every micro-benchmark on the image at `image_path`.
+
+    Returns:
+        Dict: The results of each stage.
+    """
+    with open(image_path, 'rb') as f:
+        data = f.read()
+
+    return {
+        'parameters': {
+            'image': image_path,
+            'image_bytes': len(data),
+            'repeat': repeat,
+            'threads': threads,
+        },
+        **benchmark_preprocessing(data, batch_sizes, repeat),
+        'deserialize': benchmark_deserialization(data, repeat),
+        'forward': benchmark_forward(
+            data, backends, batch_sizes, repeat, threads),
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument(
+        '--backends', nargs='+', default=['onnx'],
+        help='Model types, e.g. onnx, onnx-int8 or pytorch.')
+    parser.add_argument(
+        '--batch-sizes', type=int, nargs='+', default=[1, 8, 16])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument(
+        '--threads', type=int, default=0,
+        help='Intra-op threads of the models, 0 for the runtime default.')
+    parser.add_argument('--image', default=IMAGE_PATH)
+    parser.add_argument('--output', help='Write the report to this file.')
+    options = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARNING)
+    result = benchmark(
+        options.backends, options.batch_sizes, options.repeat, options.threads,
+        options.image)
+    write_report(result, options.output)
+
+
+if __name__ == '__main__':
+    main()
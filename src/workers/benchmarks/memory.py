@@ -0,0 +1,170 @@
+"""
+Measure the memory of worker processes serving the same model.
+
+Every process loads the model and runs a blank batch through it, the way
+the children of the `process` executor backend do, then the resident
+(RSS) and proportional (PSS) memory of each one is read from the kernel.
+PSS splits shared pages between the processes mapping them, so their sum
+is the memory the processes actually use. Results are reported as JSON,
+from `src/workers`:
+
+    python -m benchmarks.memory --model-type onnx --processes 1 2 4 8
+"""
+import argparse
+import logging
+import multiprocessing
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .report import write_report
+
+MEMORY_FIELDS = {
+    'Rss': 'rss_mb',
+    'Pss': 'pss_mb',
+    'Shared_Clean': 'shared_mb',
+    'Private_Dirty': 'private_dirty_mb',
+}
+
+
+def memory_usage(pid: int) -> Dict[str, float]:
+    """
+    Returns:
+        Dict[str, float]: The RSS, PSS, shared and private dirty memory of
+            a process, in MB.
+    """
+    usage = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            field, value, *_ = line.split()
+            name = MEMORY_FIELDS.get(field.rstrip(':'))
+            if name is not None:
+                usage[name] = int(value) / 1024
+    return usage
+
+
+def serve(
+    model_type: str,
+    share_weights: bool,
+    batch_size: int,
+    ready,
+    done,
+):
+    from app.ai import ModelFactory, SessionProfile
+    logging.getLogger().setLevel(logging.WARNING)
+
+    model = ModelFactory.create_model(
+        model_type,
+        session_profile=SessionProfile(warmup_runs=0),
+        share_weights=share_weights,
+    )
+    model.forward_batch(np.zeros((batch_size, 3, 224, 224), np.float32))
+    ready.set()
+    done.wait()
+
+
+def measure(
+    processes: int,
+    model_type: str,
+    share_weights: bool,
+    batch_size: int,
+) -> Dict:
+    """
+    Start `processes` processes serving the model and measure them once
+    all of them ran a batch.
+
+    Returns:
+        Dict: Total and per process memory, in MB.
+    """
+    context = multiprocessing.get_context('spawn')
+    done = context.Event()
+    workers = []
+    pids: List[int] = []
+    for _ in range(processes):
+        ready = context.Event()
+        worker = context.Process(
+            target=serve,
+            args=(model_type, share_weights, batch_size, ready, done))
+        worker.start()
+        # Set once the process is started.
+        assert worker.pid is not None
+        workers.append((worker, ready))
+        pids.append(worker.pid)
+
+    try:
+        for worker, ready in workers:
+            ready.wait()
+        usages: List[Dict] = [memory_usage(pid) for pid in pids]
+    finally:
+        done.set()
+        for worker, _ in workers:
+            worker.join()
+
+    total = {
+        f'total_{name}': round(sum(usage[name] for usage in usages), 1)
+        for name in MEMORY_FIELDS.values()
+    }
+    return {
+        'processes': processes,
+        **total,
+        'pss_mb_per_process': round(total['total_pss_mb'] / processes, 1),
+    }
+
+
+def benchmark(
+    processes: Sequence[int],
+    model_type: str,
+    batch_size: int,
+    modes: Sequence[str],
+) -> Dict:
+    """
+    Measure every process count with private and shared weights.
+
+    Returns:
+        Dict: The measures of each mode, along with the PSS each process
+            adds past the first one.
+    """
+    report = {'model_type': model_type, 'batch_size': batch_size}
+    for mode in modes:
+        share_weights = mode == 'shared'
+        # Build the cached graph before the processes race to load it.
+        measure(1, model_type, share_weights, batch_size)
+        results = [
+            measure(count, model_type, share_weights, batch_size)
+            for count in processes
+        ]
+        first, last = results[0], results[-1]
+        if last['processes'] > first['processes']:
+            added = (last['total_pss_mb'] - first['total_pss_mb']) / \
+                (last['processes'] - first['processes'])
+        else:
+            added = None
+        report[mode] = {
+            'results': results,
+            'pss_mb_per_additional_process':
+                None if added is None else round(added, 1),
+        }
+    return report
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument(
+        '--processes', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--model-type', default='onnx')
+    parser.add_argument('--batch-size', type=int, default=1)
+    parser.add_argument(
+        '--modes', nargs='+', default=['private', 'shared'],
+        choices=['private', 'shared'])
+    parser.add_argument('--output', help='Write the report to this file.')
+    options = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARNING)
+    result = benchmark(
+        sorted(options.processes), options.model_type, options.batch_size,
+        options.modes)
+    write_report(result, options.output)
+
+
+if __name__ == '__main__':
+    main()
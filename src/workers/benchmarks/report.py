@@ -0,0 +1,60 @@
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+
+def percentiles(values: Sequence[float]) -> Dict[str, float]:
+    """
+    Returns:
+        Dict[str, float]: The mean and the 50th, 95th and 99th percentiles
+            of `values`, rounded.
+    """
+    if not len(values):
+        return {}
+    return {
+        'mean': round(float(np.mean(values)), 3),
+        **{
+            f'p{p}': round(float(np.percentile(values, p)), 3)
+            for p in (50, 95, 99)
+        },
+    }
+
+
+def metadata() -> Dict:
+    """
+    Describe where a benchmark ran, so that reports of different commits
+    and machines are not compared blindly.
+    """
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        'commit': commit,
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def write_report(result: Dict, output: Optional[str] = None):
+    """
+    Print a benchmark result as JSON along with its metadata, and write it
+    to `output` when given.
+    """
+    report = json.dumps({'metadata': metadata(), **result}, indent=2)
+    if output:
+        with open(output, 'w') as f:
+            f.write(report)
+    print(report)
@@ -0,0 +1,108 @@
+import asyncio
+
+from services import MicroBatcher
+
+
+def run(coroutine):
+    return asyncio.new_event_loop().run_until_complete(coroutine)
+
+
+def test_batch_is_flushed_when_full():
+    batches = []
+
+    async def handler(batch):
+        batches.append(batch)
+
+    async def scenario():
+        batcher = MicroBatcher(handler, max_batch_size=3, max_wait_ms=1000)
+        batcher.start()
+        for item in range(7):
+            await batcher.put(item)
+        await asyncio.sleep(0.05)
+        await batcher.stop()
+
+    run(scenario())
+
+    assert batches == [[0, 1, 2], [3, 4, 5]]
+
+
+def test_partial_batch_is_flushed_after_timeout():
+    batches = []
+
+    async def handler(batch):
+        batches.append(batch)
+
+    async def scenario():
+        batcher = MicroBatcher(handler, max_batch_size=8, max_wait_ms=20)
+        batcher.start()
+        await batcher.put('a')
+        await batcher.put('b')
+        await asyncio.sleep(0.1)
+        await batcher.stop()
+
+    run(scenario())
+
+    assert batches == [['a', 'b']]
+
+
+def test_handler_errors_do_not_stop_batcher():
+    batches = []
+
+    async def handler(batch):
+        batches.append(batch)
+        if len(batches) == 1:
+            raise RuntimeError('boom')
+
+    async def scenario():
+        batcher = MicroBatcher(handler, max_batch_size=1, max_wait_ms=0)
+        batcher.start()
+        await batcher.put(1)
+        await batcher.put(2)
+        await asyncio.sleep(0.05)
+        await batcher.stop()
+
+    run(scenario())
+
+    assert batches == [[1], [2]]
+
+
+def test_batches_run_concurrently_up_to_limit():
+    running, peak = [0], [0]
+
+    async def handler(batch):
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.02)
+        running[0] -= 1
+
+    async def scenario():
+        batcher = MicroBatcher(
+            handler, max_batch_size=1, max_wait_ms=0, max_concurrency=2)
+        batcher.start()
+        for item in range(6):
+            await batcher.put(item)
+        await asyncio.sleep(0.1)
+        await batcher.stop()
+
+    run(scenario())
+
+    assert peak[0] == 2
+
+
+def test_higher_priority_items_are_batched_first():
+    batches = []
+
+    async def handler(batch):
+        batches.append(batch)
+
+    async def scenario():
+        batcher = MicroBatcher(handler, max_batch_size=2, max_wait_ms=1000)
+        for item, priority in [('a', 0), ('b', 1), ('c', 2), ('d', 0)]:
+            await batcher.put(item, priority=priority)
+        batcher.start()
+        await asyncio.sleep(0.05)
+        await batcher.stop()
+
+    run(scenario())
+
+    assert batches == [['c', 'b'], ['a', 'd']]
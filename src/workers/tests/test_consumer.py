@@ -0,0 +1,53 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+from services import FlowControlledConsumer, process_rss
+
+
+def run(coroutine):
+    return asyncio.new_event_loop().run_until_complete(coroutine)
+
+
+def make_queue():
+    queue = AsyncMock()
+    queue.consume.side_effect = ['tag-1', 'tag-2']
+    return queue
+
+
+def test_consumption_pauses_and_resumes_with_memory():
+    queue = make_queue()
+    usage = iter([50, 120, 90, 70])
+    consumer = FlowControlledConsumer(
+        queue, AsyncMock(), max_rss=100, resume_ratio=0.8,
+        memory_usage=lambda: next(usage))
+
+    async def scenario():
+        await consumer.start()
+        consumer.task.cancel()
+        states = []
+        for _ in range(3):
+            await consumer.check()
+            states.append(consumer.paused)
+        return states
+
+    # 50 MB at start, then 120 (pause), 90 (still above 80) and 70 (resume).
+    assert run(scenario()) == [True, True, False]
+    queue.cancel.assert_awaited_once_with('tag-1')
+    assert queue.consume.await_count == 2
+    assert consumer.consumer_tag == 'tag-2'
+
+
+def test_consumption_without_limit():
+    queue = make_queue()
+    consumer = FlowControlledConsumer(queue, AsyncMock())
+
+    run(consumer.start())
+
+    assert consumer.task is None
+    assert not consumer.paused
+
+
+def test_process_rss():
+    assert process_rss() > 0
+    # Processes that do not exist are skipped.
+    assert process_rss([2 ** 22 + 1]) > 0
@@ -0,0 +1,97 @@
+import asyncio
+import os
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from ai import Prediction, SessionProfile
+from serializers import ENCODED_FORMAT, PAYLOAD_FORMAT_HEADER
+from services import InferenceExecutor
+from services.executor import predict
+
+
+def test_process_backend_reports_its_children():
+    with open('./tests/test_image.jpeg', 'rb') as f:
+        payloads = [(f.read(), {PAYLOAD_FORMAT_HEADER: ENCODED_FORMAT})]
+    executor = InferenceExecutor(
+        backend='process',
+        max_workers=1,
+        model_kwargs={'session_profile': SessionProfile(
+            cache_optimized_model=False, warmup_runs=0)},
+    )
+
+    executor.start()
+    try:
+        asyncio.new_event_loop().run_until_complete(executor.run(payloads))
+        pids = executor.pids
+    finally:
+        executor.shutdown()
+
+    assert len(pids) == 1
+    assert os.getpid() not in pids
+    assert executor.pids == []
+
+
+def test_failed_batch_is_retried_without_counting_it_twice():
+    def classify(payloads, timings):
+        timings['forward'] = timings.get('forward', 0.0) + 1.0
+        if any(body == b'broken' for body, _ in payloads):
+            raise ValueError('Invalid image')
+        return [Prediction('Normal', {}, 'default', '1') for _ in payloads]
+
+    registry = MagicMock()
+    registry.pop_load_times.return_value = []
+    payloads = [(b'image', {}), (b'broken', {}), (b'image', {})]
+
+    with patch('services.executor._registry', registry), \
+            patch('services.executor.classify', classify):
+        results, timings, loads = predict(payloads)
+
+    assert [type(result) for result in results] == [
+        Prediction, ValueError, Prediction]
+    assert timings == {'forward': 3.0}
+    assert loads == []
+
+
+def test_single_failed_payload_is_returned_as_an_error():
+    def classify(payloads, timings):
+        raise ValueError('Invalid image')
+
+    registry = MagicMock()
+    registry.pop_load_times.return_value = []
+
+    with patch('services.executor._registry', registry), \
+            patch('services.executor.classify', classify):
+        results, _, _ = predict([(b'broken', {})])
+
+    assert [type(result) for result in results] == [ValueError]
+
+
+def test_models_are_loaded_on_start():
+    executor = InferenceExecutor(
+        backend='process',
+        max_workers=2,
+        model_kwargs={'session_profile': SessionProfile(
+            cache_optimized_model=False, warmup_runs=0)},
+    )
+
+    executor.start()
+    try:
+        # Every child reported itself, without any batch to run.
+        pids = executor.pids
+    finally:
+        executor.shutdown()
+
+    assert len(set(pids)) == 2
+
+
+def test_start_fails_when_models_cannot_be_loaded():
+    executor = InferenceExecutor(
+        backend='process',
+        max_workers=2,
+        registry_path='/nonexistent.yaml',
+    )
+
+    with pytest.raises(RuntimeError):
+        executor.start()
+    assert executor.pool is None
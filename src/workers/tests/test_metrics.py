@@ -0,0 +1,57 @@
+import asyncio
+import time
+
+from prometheus_client import REGISTRY
+
+from ai import Prediction, SessionProfile
+from serializers import ENCODED_FORMAT, PAYLOAD_FORMAT_HEADER
+from services import InferenceExecutor, record_queue_wait
+
+
+def sample(name, labels=None):
+    return REGISTRY.get_sample_value(name, labels or {}) or 0
+
+
+def test_executor_records_stage_timings_and_model_loads():
+    with open('./tests/test_image.jpeg', 'rb') as f:
+        payloads = [
+            (f.read(), {PAYLOAD_FORMAT_HEADER: ENCODED_FORMAT})] * 3
+    executor = InferenceExecutor(max_workers=1, model_kwargs={
+        'session_profile': SessionProfile(
+            cache_optimized_model=False, warmup_runs=0),
+    })
+    stages = ('deserialize', 'preprocess', 'forward')
+    before = {
+        stage: sample(
+            'worker_stage_duration_seconds_count', {'stage': stage})
+        for stage in stages
+    }
+    batches = sample('worker_batch_size_sum')
+
+    executor.start()
+    try:
+        predictions = asyncio.new_event_loop().run_until_complete(
+            executor.run(payloads))
+    finally:
+        executor.shutdown()
+
+    assert all(isinstance(p, Prediction) for p in predictions)
+    for stage in stages:
+        assert sample('worker_stage_duration_seconds_count',
+                      {'stage': stage}) == before[stage] + 1
+    assert sample('worker_batch_size_sum') == batches + 3
+    assert sample('worker_model_load_seconds_count', {'model': 'default'})
+
+
+def test_queue_wait_is_measured_from_the_submission():
+    now = time.time()
+    count = sample('worker_queue_wait_seconds_count', {'lane': 'high'})
+    total = sample('worker_queue_wait_seconds_sum', {'lane': 'high'})
+
+    record_queue_wait('high', {'x-submitted-at': int(now * 1000) - 1500}, now)
+    record_queue_wait('high', {}, now)
+
+    assert sample('worker_queue_wait_seconds_count',
+                  {'lane': 'high'}) == count + 1
+    assert abs(sample('worker_queue_wait_seconds_sum', {'lane': 'high'})
+               - total - 1.5) < 0.01
@@ -1,11 +1,20 @@
+import glob
 import os
+import shutil
+import subprocess
+import sys
 
+import numpy as np
 import pytest
-import torch
 from PIL import Image
 
 from app.ai import ModelFactory
-from app.ai.models import ONNXInferenceModel, TorchInferenceModel
+from app.ai.models import (ONNXInferenceModel, SessionProfile,
+                           TorchInferenceModel, TorchProfile)
+from app.ai.models.functions import ImageTransform
+from app.ai.models.onnx_inference_model import variant_path
+from app.ai.models.preprocessing import ImagePreprocessor
+from app.ai.quantization import evaluate
 
 MODEL_PARAMS = [
     (
@@ -46,12 +55,213 @@ class TestInferenceModel:
 
     def test_preprocess_image(self):
         preprocessed_image = self.model.preprocess_image(self.image)
-        assert isinstance(preprocessed_image, torch.Tensor)
+        assert isinstance(preprocessed_image, np.ndarray)
+        assert preprocessed_image.shape == (1, 3, 224, 224)
 
     def test_inference_image(self):
         if self.model_type == 'pytorch':
             self.model.load_checkpoint(self.checkpoint_path)
         preprocessed_image = self.model.preprocess_image(self.image)
         label = self.model.forward(preprocessed_image)
-        assert isinstance(preprocessed_image, torch.Tensor)
+        assert isinstance(preprocessed_image, np.ndarray)
         assert label is not None
+
+    def test_inference_batch(self):
+        images = [self.image, self.image.rotate(90)]
+        batch = self.model.preprocess_batch(images)
+        labels = self.model.forward_batch(batch)
+        assert batch.shape[0] == len(images)
+        assert len(labels) == len(images)
+        assert labels[0] == self.model.forward(
+            self.model.preprocess_image(self.image))
+
+    def test_predict_batch_top_k(self):
+        batch = self.model.preprocess_batch([self.image])
+        prediction, = self.model.predict_batch(batch, top_k=2)
+        assert len(prediction.probabilities) == 2
+        assert max(prediction.probabilities,
+                   key=prediction.probabilities.get) == prediction.label
+        assert prediction.label == self.model.forward_batch(batch)[0]
+
+
+def test_preprocessor_matches_torchvision_pipeline():
+    image_path = './tests/test_image.jpeg'
+    with open(image_path, 'rb') as f:
+        data = f.read()
+    image = Image.open(image_path).convert('RGB')
+    expected = ImageTransform()(image).numpy()
+
+    batch = ImagePreprocessor()([data, image, image.rotate(90)])
+
+    assert batch.dtype == np.float32
+    assert batch.shape == (3, 3, 224, 224)
+    np.testing.assert_allclose(batch[0], expected, atol=1e-6)
+    np.testing.assert_allclose(batch[1], expected, atol=1e-6)
+    np.testing.assert_allclose(
+        batch[2], ImageTransform()(image.rotate(90)).numpy(), atol=1e-6)
+
+
+def test_preprocessor_accepts_cropped_arrays():
+    image = Image.open('./tests/test_image.jpeg').convert('RGB')
+    preprocessor = ImagePreprocessor()
+    expected = preprocessor([image])
+    pixels = np.zeros((1, 3, 224, 224), dtype=np.uint8)
+    preprocessor.load(image, pixels[0])
+
+    batch = preprocessor([pixels, expected.astype(np.float16)])
+
+    np.testing.assert_allclose(batch[0], expected[0], atol=1e-6)
+    np.testing.assert_allclose(batch[1], expected[0], atol=1e-2)
+
+
+def test_onnx_backend_does_not_import_torch():
+    script = (
+        "import sys\n"
+        "from app.ai import ModelFactory\n"
+        "model = ModelFactory.create_model('onnx')\n"
+        "model.forward(model.preprocess_image(open("
+        "'./tests/test_image.jpeg', 'rb').read()))\n"
+        "assert 'torch' not in sys.modules, 'torch was imported'\n"
+    )
+    subprocess.run([sys.executable, '-c', script], check=True)
+
+
+def test_session_profile_caches_optimized_model(tmp_path):
+    model_path = str(tmp_path / 'model.onnx')
+    shutil.copy('./app/ai/checkpoints/EfficientNet_B0_NS_320.onnx', model_path)
+    profile = SessionProfile(
+        intra_op_num_threads=1,
+        execution_mode='sequential',
+        graph_optimization_level='extended',
+    )
+    image = Image.open('./tests/test_image.jpeg').convert('RGB')
+
+    model = ONNXInferenceModel(model_path, session_profile=profile)
+    optimized_path = profile.optimized_path(model_path)
+    modified_at = os.path.getmtime(optimized_path)
+    cached_model = ONNXInferenceModel(model_path, session_profile=profile)
+
+    assert os.path.getmtime(optimized_path) == modified_at
+    assert cached_model.forward(cached_model.preprocess_image(image)) == \
+        model.forward(model.preprocess_image(image))
+
+
+def test_models_sharing_a_cache_directory_keep_their_graphs(tmp_path):
+    profile = SessionProfile(optimized_model_dir=str(tmp_path / 'cache'))
+    paths = []
+    for version in ('v1', 'v2'):
+        os.makedirs(tmp_path / version)
+        paths.append(str(tmp_path / version / 'model.onnx'))
+        shutil.copy(
+            './app/ai/checkpoints/EfficientNet_B0_NS_320.onnx', paths[-1])
+
+    for path in paths:
+        ONNXInferenceModel(path, session_profile=profile)
+
+    optimized_paths = [profile.optimized_path(path) for path in paths]
+    assert optimized_paths[0] != optimized_paths[1]
+    assert all(os.path.exists(path) for path in optimized_paths)
+    assert all(
+        os.path.dirname(path) == str(tmp_path / 'cache')
+        for path in optimized_paths)
+
+
+def test_fixed_batch_graphs_run_partial_batches(tmp_path):
+    import onnx
+    from onnx import TensorProto, helper
+
+    graph = helper.make_graph(
+        [helper.make_node('Identity', ['x'], ['y'])], 'fixed_batch',
+        [helper.make_tensor_value_info('x', TensorProto.FLOAT, [4, 3])],
+        [helper.make_tensor_value_info('y', TensorProto.FLOAT, [4, 3])])
+    model_path = str(tmp_path / 'model.onnx')
+    onnx.save(helper.make_model(
+        graph, ir_version=8, opset_imports=[helper.make_opsetid('', 13)]),
+        model_path)
+    model = ONNXInferenceModel(model_path, session_profile=SessionProfile(
+        cache_optimized_model=False, warmup_runs=0))
+    x = np.random.rand(6, 3).astype(np.float32)
+
+    assert model.max_batch_size == 4
+    np.testing.assert_array_equal(model.run(x), x)
+
+
+def test_shared_weights_are_mapped_from_the_cache(tmp_path):
+    model_path = str(tmp_path / 'model.onnx')
+    shutil.copy('./app/ai/checkpoints/EfficientNet_B0_NS_320.onnx', model_path)
+    image = Image.open('./tests/test_image.jpeg').convert('RGB')
+
+    model = ModelFactory.create_model(
+        'onnx', model_path=model_path, share_weights=True)
+    optimized_path = model.session_profile.optimized_path(model_path)
+    [weights_path] = glob.glob(f"{optimized_path}.*.data")
+    with open('/proc/self/maps') as f:
+        assert weights_path in f.read()
+
+    os.utime(model_path, (0, os.path.getmtime(model_path) + 10))
+    rebuilt = ModelFactory.create_model(
+        'onnx', model_path=model_path, share_weights=True)
+    [rebuilt_path] = glob.glob(f"{optimized_path}.*.data")
+
+    assert '.shared.' in optimized_path
+    assert rebuilt_path != weights_path
+    assert rebuilt.forward(rebuilt.preprocess_image(image)) == \
+        model.forward(model.preprocess_image(image))
+
+
+def test_torch_model_fast_paths_match_reference():
+    image = Image.open('./tests/test_image.jpeg').convert('RGB')
+    reference = TorchInferenceModel(profile=TorchProfile(
+        meta_init=False, channels_last=False, warmup_runs=0))
+    meta = TorchInferenceModel(profile=TorchProfile(warmup_runs=0))
+    traced = TorchInferenceModel(profile=TorchProfile(jit='trace'))
+    batch = reference.preprocess_batch([image, image.rotate(90)])
+    labels = reference.forward_batch(batch)
+
+    assert not any(p.is_meta for p in meta.parameters())
+    assert meta.forward_batch(batch) == labels
+    assert traced.forward_batch(batch) == labels
+    compiled = TorchInferenceModel(
+        profile=TorchProfile(jit='compile', warmup_runs=0))
+    # torch.compile wraps the model, compiling it on the first call.
+    assert hasattr(compiled.model, '_orig_mod')
+    with pytest.raises(ValueError):
+        TorchInferenceModel(profile=TorchProfile(jit='eager'))
+
+
+def test_session_profile_rejects_invalid_options():
+    with pytest.raises(ValueError):
+        SessionProfile(execution_mode='eager').session_options()
+
+
+def test_quantized_variant_paths():
+    model_path = './app/ai/checkpoints/EfficientNet_B0_NS_320.onnx'
+    with pytest.raises(ValueError):
+        ModelFactory.create_model('onnx-int4')
+    assert variant_path(model_path, 'int8') == \
+        './app/ai/checkpoints/EfficientNet_B0_NS_320.int8.onnx'
+
+
+def test_evaluate_reports_the_model_probabilities():
+    class Model():
+        def run(self, batch):
+            return np.tile([[0.7, 0.2, 0.1]], (len(batch), 1))
+
+    report = evaluate(Model(), ['./tests/test_image.jpeg'] * 3, 2)
+
+    # The outputs are probabilities already, not softmaxed again.
+    assert np.allclose(report['probabilities'], [[0.7, 0.2, 0.1]] * 3)
+    assert list(report['predictions']) == [0, 0, 0]
+
+
+def test_torch_model_maps_its_weights():
+    image = Image.open('./tests/test_image.jpeg').convert('RGB')
+    reference = TorchInferenceModel(profile=TorchProfile(
+        meta_init=False, channels_last=False, warmup_runs=0))
+    mapped = TorchInferenceModel(
+        mmap_weights=True, profile=TorchProfile(warmup_runs=0))
+    batch = reference.preprocess_batch([image])
+
+    assert not any(p.is_meta for p in mapped.parameters())
+    assert not mapped.channels_last
+    assert mapped.forward_batch(batch) == reference.forward_batch(batch)
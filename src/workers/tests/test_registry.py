@@ -0,0 +1,111 @@
+import os
+import shutil
+
+import pytest
+import yaml
+
+from app.ai.models import ModelRegistry, SessionProfile
+from app.ai.models.onnx_inference_model import variant_path
+
+MODEL_PATH = './app/ai/checkpoints/EfficientNet_B0_NS_320.onnx'
+
+
+@pytest.fixture
+def registry_path(tmp_path):
+    model_path = str(tmp_path / 'model.onnx')
+    shutil.copy(MODEL_PATH, model_path)
+    path = tmp_path / 'models.yaml'
+    path.write_text(yaml.safe_dump({
+        'default': 'reference',
+        'models': {
+            'reference': {'kwargs': {'model_path': MODEL_PATH}},
+            'candidate': {
+                'version': '1', 'kwargs': {'model_path': model_path}},
+        },
+    }))
+    return str(path)
+
+
+def create_registry(registry_path):
+    profile = SessionProfile(cache_optimized_model=False, warmup_runs=0)
+    registry = ModelRegistry(
+        registry_path, model_kwargs={'session_profile': profile},
+        reload_interval=0.01)
+    registry.load()
+    return registry
+
+
+def test_models_are_routed_by_name(registry_path):
+    registry = create_registry(registry_path)
+
+    assert registry.get() is registry.get('reference')
+    assert registry.get('candidate') is not registry.get('reference')
+    assert registry.versions() == {'reference': '', 'candidate': '1'}
+    with pytest.raises(ValueError):
+        registry.get('missing')
+
+
+def test_changed_models_are_swapped_in_the_background(registry_path):
+    registry = create_registry(registry_path)
+    reference, candidate = registry.get('reference'), registry.get('candidate')
+    model_path = candidate.model_path
+    os.utime(model_path, (0, os.path.getmtime(model_path) + 10))
+
+    registry.checked_at = 0
+    registry.refresh()
+    registry.reloading.join()
+
+    assert registry.get('reference') is reference
+    assert registry.get('candidate') is not candidate
+
+
+def test_failed_reload_keeps_current_models(registry_path):
+    registry = create_registry(registry_path)
+    reference = registry.get()
+    with open(registry_path, 'w') as f:
+        f.write('default: missing\n')
+
+    registry.reload()
+
+    assert registry.get() is reference
+
+
+def test_reloaded_models_get_a_new_revision(registry_path):
+    loads = []
+    profile = SessionProfile(cache_optimized_model=False, warmup_runs=0)
+    registry = ModelRegistry(
+        registry_path, model_kwargs={'session_profile': profile},
+        on_load=lambda default, revisions: loads.append((default, revisions)))
+    registry.load()
+    _, revision, _ = registry.lookup('candidate')
+    model_path = registry.get('candidate').model_path
+    registry.load()
+    os.utime(model_path, (0, os.path.getmtime(model_path) + 10))
+
+    registry.load()
+
+    # Only the loads that changed a revision are reported.
+    (default, first), (_, second) = loads
+    assert default == 'reference'
+    assert revision == first['candidate'] and revision.startswith('1+')
+    assert second['candidate'] != first['candidate']
+    assert second['reference'] == first['reference']
+    assert registry.lookup()[1] == second['reference']
+
+
+def test_default_model_files_are_watched(tmp_path):
+    model_path = str(tmp_path / 'model.onnx')
+    shutil.copy(MODEL_PATH, model_path)
+    profile = SessionProfile(cache_optimized_model=False, warmup_runs=0)
+    registry = ModelRegistry(model_kwargs={
+        'session_profile': profile, 'model_path': model_path})
+    registry.load()
+    _, revision, _ = registry.lookup()
+    os.utime(model_path, (0, os.path.getmtime(model_path) + 10))
+
+    registry.load()
+
+    _, specs = ModelRegistry(model_type='onnx-int8').read_specs()
+    assert registry.lookup()[1] != revision
+    assert specs['default'].kwargs == {
+        'model_path': variant_path(MODEL_PATH, 'int8')}
@@ -0,0 +1,75 @@
+import asyncio
+import json
+
+from ai import Prediction
+from services import ResultWriter, completed_record, failed_record
+
+
+def run(coroutine):
+    return asyncio.new_event_loop().run_until_complete(coroutine)
+
+
+class RecordingRedis():
+    """Record the commands sent through pipelines."""
+
+    def __init__(self):
+        self.executed = []
+
+    def pipeline(self, transaction=True):
+        return RecordingPipeline(self)
+
+
+class RecordingPipeline():
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+        return command
+
+    async def execute(self):
+        self.redis.executed.append(self.commands)
+
+
+def test_results_are_written_in_a_single_round_trip():
+    redis = RecordingRedis()
+    writer = ResultWriter(redis, 'results', ttl=60)
+    prediction = Prediction(
+        'Normal', {'Normal': 0.9, 'Pneumonia': 0.1}, 'default', '1')
+
+    run(writer.write([
+        ('a', completed_record(prediction, completed_at=1000)),
+        ('b', failed_record(ValueError('Invalid image'), completed_at=1000)),
+    ]))
+
+    commands, = redis.executed
+    assert [name for name, _, _ in commands] == [
+        'hset', 'expire', 'publish'] * 2
+
+    _, (key,), kwargs = commands[0]
+    assert key == 'result:a'
+    assert kwargs['mapping'] == {
+        'status': 'completed',
+        'inference_class': 'Normal',
+        'probabilities': '{"Normal": 0.9, "Pneumonia": 0.1}',
+        'model': 'default',
+        'model_version': '1',
+        'completed_at': 1000,
+    }
+    assert commands[1][1] == ('result:a', 60)
+
+    _, (key,), kwargs = commands[3]
+    assert key == 'result:b'
+    assert kwargs['mapping'] == {
+        'status': 'failed', 'error': 'Invalid image', 'completed_at': 1000}
+    channel, event = commands[5][1]
+    assert channel == 'results'
+    assert json.loads(event)['request_id'] == 'b'
+
+
+def test_nothing_is_sent_without_results():
+    redis = RecordingRedis()
+    run(ResultWriter(redis, 'results', ttl=60).write([]))
+    assert redis.executed == []
@@ -0,0 +1,81 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+from aio_pika import DeliveryMode
+
+from services import RetryScheduler
+
+
+def run(coroutine):
+    return asyncio.new_event_loop().run_until_complete(coroutine)
+
+
+def make_scheduler():
+    client = AsyncMock()
+    scheduler = RetryScheduler(
+        client, 'pgdb', [2, 8], permanent_errors=(ValueError,))
+    return client, scheduler
+
+
+def schedule(scheduler, retry_count, error):
+    return run(scheduler.schedule(
+        b'image', {'request_id': 'a', 'x-retry-count': retry_count},
+        error, priority=2))
+
+
+def test_messages_climb_the_ladder():
+    client, scheduler = make_scheduler()
+
+    retried = [
+        schedule(scheduler, retry_count, RuntimeError('busy'))
+        for retry_count in range(3)
+    ]
+
+    routing_keys = [
+        call.kwargs['routing_key']
+        for call in client.publish_message.await_args_list
+    ]
+    assert retried == [True, True, False]
+    assert routing_keys == [
+        'pgdb.retry.2000ms', 'pgdb.retry.8000ms', 'pgdb.parking']
+    copies = [
+        call.args[0] for call in client.publish_message.await_args_list]
+    assert all(
+        copy.delivery_mode == DeliveryMode.PERSISTENT and copy.priority == 2
+        for copy in copies)
+    assert copies[-1].headers['x-retry-count'] == 3
+    assert copies[-1].headers['x-last-error'] == 'RuntimeError: busy'
+
+
+def test_permanent_errors_are_parked():
+    client, scheduler = make_scheduler()
+
+    assert not schedule(scheduler, 0, ValueError('not an image'))
+    assert client.publish_message.await_args.kwargs['routing_key'] \
+        == 'pgdb.parking'
+
+
+def test_ladder_is_declared():
+    _, scheduler = make_scheduler()
+    channel = AsyncMock()
+
+    run(scheduler.declare(channel))
+
+    declared = [call.args[0] for call in channel.declare_queue.await_args_list]
+    assert declared == [
+        'pgdb.retry.2000ms', 'pgdb.retry.8000ms', 'pgdb.parking']
+    assert all(
+        call.kwargs['durable']
+        for call in channel.declare_queue.await_args_list)
+    assert channel.declare_queue.await_args_list[0].kwargs['arguments'] == {
+        'x-message-ttl': 2000,
+        'x-dead-letter-exchange': '',
+        'x-dead-letter-routing-key': 'pgdb',
+    }
+
+
+def test_permanent_errors():
+    _, scheduler = make_scheduler()
+
+    assert scheduler.is_permanent(ValueError('not an image'))
+    assert not scheduler.is_permanent(RuntimeError('busy'))
@@ -0,0 +1,34 @@
+import time
+
+from services import LaneStats, is_expired, lane_of
+
+
+def test_deadline_expiry():
+    now = time.time()
+
+    assert not is_expired({})
+    assert not is_expired({'x-deadline': int(now * 1000) + 5000}, now)
+    assert is_expired({'x-deadline': int(now * 1000) - 1}, now)
+
+
+def test_lanes_from_priority():
+    assert [lane_of(p) for p in (None, 0, 1, 2, 9)] == \
+        ['low', 'low', 'normal', 'high', 'high']
+
+
+def test_lane_stats_summary():
+    stats = LaneStats()
+    submitted_at = int(time.time() * 1000) - 200
+
+    stats.record_completed('high', {'x-submitted-at': submitted_at}, count=3)
+    stats.record_completed('low', {})
+    stats.record_expired('low', 2)
+    summary = stats.summary()
+
+    assert summary['high']['completed'] == 3
+    assert 200 <= summary['high']['p50_ms'] < 1000
+    assert summary['low'] == {
+        'completed': 1, 'expired': 2,
+        'p50_ms': None, 'p95_ms': None, 'p99_ms': None,
+    }
+    assert summary['normal']['completed'] == 0
@@ -0,0 +1,33 @@
+import pytest
+
+from serializers import frame_batch, is_batch, split_batch
+
+
+def test_split_batch():
+    headers = {
+        'batch_id': 'batch',
+        'payload-format': 'encoded',
+        'payload-sizes': [3, 0, 2],
+        'request_ids': ['a', 'b', 'c'],
+    }
+
+    payloads = split_batch(b'abcde', headers)
+
+    assert is_batch(headers)
+    assert [(request_id, body) for request_id, body, _ in payloads] == [
+        ('a', b'abc'), ('b', b''), ('c', b'de')]
+    assert payloads[0][2] == {'batch_id': 'batch', 'payload-format': 'encoded'}
+    assert frame_batch([payloads[0], payloads[2]]) == (b'abcde', {
+        'batch_id': 'batch',
+        'payload-format': 'encoded',
+        'payload-sizes': [3, 2],
+        'request_ids': ['a', 'c'],
+    })
+
+
+def test_split_batch_rejects_invalid_framing():
+    headers = {'payload-sizes': [3, 3], 'request_ids': ['a', 'b']}
+
+    assert not is_batch({'request_id': 'a'})
+    with pytest.raises(ValueError):
+        split_batch(b'abcde', headers)
@@ -0,0 +1,48 @@
+import time
+import uuid
+
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import \
+    InMemorySpanExporter
+
+from services import BatchTrace, setup_tracing
+
+
+def test_batch_stages_are_reported_in_the_trace_of_each_message():
+    exporter = InMemorySpanExporter()
+    provider = setup_tracing('inference-worker', 1.0, exporter)
+    sampled, unsampled = uuid.uuid4().hex, uuid.uuid4().hex
+    submitted_at = int(time.time() * 1000) - 2000
+    headers = [
+        {'request_id': 'a', 'x-submitted-at': submitted_at,
+         'traceparent': f"00-{sampled}-{'1' * 16}-01"},
+        {'request_id': 'b', 'x-submitted-at': submitted_at,
+         'traceparent': f"00-{unsampled}-{'2' * 16}-00"},
+    ]
+
+    with BatchTrace(headers) as batch_trace:
+        start = time.time_ns()
+        time.sleep(0.01)
+        batch_trace.add_executor_stage(
+            start, time.time_ns(), {'preprocess': 0.002, 'forward': 0.005})
+        with batch_trace.stage('store'):
+            pass
+    provider.force_flush()
+
+    spans = {span.name: span for span in exporter.get_finished_spans()}
+    assert {format(span.context.trace_id, '032x')
+            for span in spans.values()} == {sampled}
+    batch = spans['worker.batch']
+    assert batch.parent.span_id == int('1' * 16, 16)
+    assert batch.attributes['request_id'] == 'a'
+    assert spans['queue.wait'].parent.span_id == int('1' * 16, 16)
+    assert spans['queue.wait'].end_time - spans['queue.wait'].start_time \
+        >= 2 * 10**9
+    executor = spans['executor']
+    assert executor.parent.span_id == batch.context.span_id
+    assert spans['store'].parent.span_id == batch.context.span_id
+    # Executor stages end with it, back to back.
+    preprocess, forward = spans['preprocess'], spans['forward']
+    assert preprocess.parent.span_id == executor.context.span_id
+    assert preprocess.end_time == forward.start_time
+    assert forward.end_time == executor.end_time
+    assert forward.end_time - forward.start_time == 5 * 10**6